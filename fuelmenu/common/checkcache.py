@@ -0,0 +1,78 @@
+# Copyright 2016 Mirantis, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import copy
+import logging
+import threading
+import time
+
+from fuelmenu.common import journal
+from fuelmenu.common import network
+
+log = logging.getLogger('fuelmenu.common.checkcache')
+
+# Seconds a successful check is reused for, servers it probed may go away
+CHECK_TTL = 600
+
+
+class CheckCache(object):
+    """Results of successful module checks.
+
+    Checks probing the network (DHCP scan, arping, DNS and NTP servers,
+    repositories) are skipped when inputs of the module and the host
+    network did not change since the check last succeeded. Failed checks
+    are never cached, so their errors are shown again.
+    """
+
+    def __init__(self, ttl=CHECK_TTL, state=None, notify=None):
+        """Creates empty cache.
+
+        :param ttl: seconds a result is reused for
+        :param state: callable returning host state checks depend on,
+                      network.get_state by default
+        :param notify: callable receiving a message when a result is reused
+        """
+        self.ttl = ttl
+        self.state = state or network.get_state
+        self.notify = notify
+        self.lock = threading.Lock()
+        # Latest successful check of every module: (key, result, time)
+        self.entries = {}
+
+    def lookup(self, name, inputs):
+        """Finds result of the previous check of the same inputs.
+
+        :param name: module name
+        :param inputs: JSON serializable data validated by the check
+        :returns: (key, result) tuple, result is None if the check has to
+                  run. The key is passed to store once it succeeds.
+        """
+        key = journal.digest([inputs, self.state()])
+        with self.lock:
+            entry = self.entries.get(name)
+        if entry is None or entry[0] != key or \
+                time.time() - entry[2] >= self.ttl:
+            return key, None
+
+        checked = time.strftime("%H:%M:%S", time.localtime(entry[2]))
+        log.info("Reusing result of %s check made at %s", name, checked)
+        if self.notify:
+            self.notify("No changes since the check at {0}, using its "
+                        "result.".format(checked))
+        return key, copy.deepcopy(entry[1])
+
+    def store(self, name, key, result):
+        """Remembers result of a successful check."""
+        with self.lock:
+            self.entries[name] = (key, copy.deepcopy(result), time.time())
@@ -13,6 +13,9 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import contextlib
+import threading
+
 import six
 import urwid
 import urwid.raw_display
@@ -22,6 +25,8 @@ import fuelmenu.common.urwidwrapper as widget
 
 
 blank = urwid.Divider()
+# Dialogs collected by deferred() in the current thread
+_deferred = threading.local()
 
 
 class ModalDialog(urwid.WidgetWrap):
@@ -57,9 +62,43 @@ class ModalDialog(urwid.WidgetWrap):
 
 
 def display_dialog(self, body, title, escape_key="esc"):
+        collected = getattr(_deferred, 'dialogs', None)
+        if collected is not None:
+            collected.append((self, body, title, escape_key))
+            return None
         filler = urwid.Pile([body])
         dialog = ModalDialog(title, filler, escape_key,
                              self.parent.mainloop.widget,
                              self.parent.mainloop)
         self.parent.mainloop.widget = dialog
         return dialog
+
+
+@contextlib.contextmanager
+def deferred():
+    """Collects dialogs the current thread displays instead of showing them.
+
+    Only the UI thread may show dialogs. Code running in worker threads
+    (e.g. checks of modules, apply tasks) is wrapped with it, the UI
+    thread shows the collected dialogs later with show_deferred.
+
+    :returns: list the dialogs are collected to
+    """
+    previous = getattr(_deferred, 'dialogs', None)
+    collected = []
+    _deferred.dialogs = collected
+    try:
+        yield collected
+    finally:
+        _deferred.dialogs = previous
+
+
+def deferring():
+    """Returns True if dialogs of the current thread are collected."""
+    return getattr(_deferred, 'dialogs', None) is not None
+
+
+def show_deferred(dialogs):
+    """Shows dialogs collected by deferred in the order they came."""
+    for modobj, body, title, escape_key in dialogs:
+        display_dialog(modobj, body, title, escape_key)
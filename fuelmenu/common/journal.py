@@ -0,0 +1,84 @@
+# Copyright 2016 Mirantis, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import errno
+import hashlib
+import json
+import logging
+import os
+
+from fuelmenu.common import utils
+
+log = logging.getLogger('fuelmenu.common.journal')
+
+
+def digest(data):
+    """Returns digest of JSON serializable data (e.g. settings)."""
+    dump = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha1(dump.encode('utf-8')).hexdigest()
+
+
+class SaveJournal(object):
+    """On-disk record of save steps which completed.
+
+    Every step is recorded with digest of its inputs. The journal is kept
+    when a save fails, so the next save skips steps which completed with
+    the same inputs and resumes at the first failed one. It is cleared
+    once the whole save succeeds.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path) as journal_file:
+                self.steps = json.load(journal_file)
+        except (IOError, ValueError) as e:
+            log.debug("Save journal %s is not loaded: %s", path, e)
+            self.steps = {}
+
+    def __contains__(self, step):
+        return step in self.steps
+
+    def completed(self, step, inputs):
+        """Returns True if step completed with the same inputs."""
+        entry = self.steps.get(step)
+        return entry is not None and entry.get('inputs') == inputs
+
+    def details(self, step):
+        """Returns extra data recorded with the step."""
+        return self.steps.get(step, {})
+
+    def record(self, step, inputs, **details):
+        """Records completed step and writes the journal."""
+        details['inputs'] = inputs
+        self.steps[step] = details
+        self._write()
+
+    def clear(self):
+        """Forgets all steps and removes the journal file."""
+        self.steps = {}
+        try:
+            os.remove(self.path)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                log.warning("Unable to remove save journal %s: %s",
+                            self.path, e)
+
+    def _write(self):
+        # Written atomically, a broken journal would skip nothing anyway
+        try:
+            utils.write_json(self.path, self.steps)
+        except (IOError, OSError) as e:
+            log.warning("Unable to write save journal %s: %s",
+                        self.path, e)
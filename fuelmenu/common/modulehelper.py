@@ -16,10 +16,9 @@
 
 
 import collections
+import functools
 import logging
 import netifaces
-import socket
-import struct
 
 import six
 import urwid
@@ -36,6 +35,8 @@ log = logging.getLogger('fuelmenu.modulehelper')
 
 # magic. calculated as 80 (standard terminal width) - 20 (menu size)
 MAX_WIDTH = 60
+# LIST widgets taller than this are scrolled
+LIST_MAX_ROWS = 20
 
 BLANK_KEY = "blank"
 
@@ -116,8 +117,34 @@ class ModuleHelper(object):
             cls.set_setting(newsettings, setting, responses[setting])
         return newsettings
 
+    @classmethod
+    def default_responses(cls, fields, defaults):
+        """Returns responses of a screen showing unchanged defaults.
+
+        Values are the ones widgets created by setup_widgets would return,
+        so settings can be saved without building the screen. Labels,
+        buttons and radio buttons have no response.
+        """
+        responses = {}
+        for key in fields:
+            if key == BLANK_KEY or 'button' in key.lower():
+                continue
+            default_data = defaults.get(key, {})
+            field_type = default_data.get('type', WidgetType.TEXT_FIELD)
+            value = default_data.get('value')
+            if field_type == WidgetType.TEXT_FIELD:
+                responses[key] = value if value is not None else ""
+            elif field_type == WidgetType.CHECKBOX:
+                responses[key] = bool(value)
+            elif field_type == WidgetType.LIST:
+                responses[key] = value or []
+        return responses
+
     @classmethod
     def cancel(cls, modobj, *args):
+        if not hasattr(modobj, 'edits'):
+            # Screen is not built, nothing to reset
+            return
         for index, fieldname in enumerate(modobj.fields):
             if fieldname != BLANK_KEY and "label" not in fieldname:
                 try:
@@ -187,28 +214,86 @@ class ModuleHelper(object):
         elements = default_data.get("value", [])
         scheme = default_data.get("value_scheme", {})
 
-        for e in elements:
-            object_size = 0
-            object_fields = []
-            for key in sorted(scheme):
-                data = dict(scheme[key])
-                data["value"] = e.get(key, "")
-                new_widget = cls._create_widget(key, data, toolbar)
-                object_fields.append(new_widget)
-                object_size += new_widget.rows((MAX_WIDTH,))
-            object_fields.append(blank)
-            object_size += blank.rows((MAX_WIDTH,))
-
-            objects.append(
-                urwid.BoxAdapter(
-                    widget.WalkerStoredListBox(
-                        widget.SimpleListWalker(object_fields)),
-                    object_size))
-            box_size += object_size
+        # Elements are turned into widgets only when they are scrolled
+        # into view, so lists with hundreds of entries are cheap to build
+        item_size = cls._list_item_rows(scheme, toolbar)
+        objects.extend(elements)
+        box_size += item_size * len(elements)
+
+        walker = widget.LazyListWalker(
+            objects, functools.partial(cls._create_list_item, scheme=scheme,
+                                       toolbar=toolbar, rows=item_size))
+        return urwid.BoxAdapter(widget.WalkerStoredListBox(walker),
+                                cls._list_height(box_size, item_size))
+
+    @staticmethod
+    def _list_height(box_size, item_size):
+        # Longer lists are scrolled, but a whole element should fit
+        return min(box_size, max(LIST_MAX_ROWS, item_size))
+
+    @classmethod
+    def _list_item_rows(cls, scheme, toolbar):
+        """Returns number of rows taken by an element of LIST widget.
+
+        Text fields are clipped to a single row, so the height depends only
+        on the scheme and isn't calculated by rendering every element.
+        """
+        rows = blank.rows((MAX_WIDTH,))
+        for key in scheme:
+            data = dict(scheme[key])
+            if data.get('type', WidgetType.TEXT_FIELD) == \
+                    WidgetType.TEXT_FIELD:
+                rows += 1
+            else:
+                rows += cls._create_widget(key, data, toolbar).rows(
+                    (MAX_WIDTH,))
+        return rows
+
+    @classmethod
+    def _create_list_item(cls, element, scheme, toolbar, rows):
+        object_fields = []
+        for key in sorted(scheme):
+            data = dict(scheme[key])
+            data["value"] = element.get(key, "")
+            object_fields.append(cls._create_widget(key, data, toolbar))
+        object_fields.append(blank)
 
         return urwid.BoxAdapter(
-            widget.WalkerStoredListBox(widget.SimpleListWalker(objects)),
-            box_size)
+            widget.WalkerStoredListBox(
+                widget.SimpleListWalker(object_fields)),
+            rows)
+
+    @classmethod
+    def append_list_item(cls, list_widget, element, scheme, toolbar):
+        """Adds element to LIST widget in place.
+
+        :param list_widget: widget created for a LIST field
+        :param element: dict of values of the new element
+        :param scheme: value_scheme of the field
+        """
+        cls.extend_list_items(list_widget, [element], scheme, toolbar)
+
+    @classmethod
+    def extend_list_items(cls, list_widget, elements, scheme, toolbar):
+        """Adds elements to LIST widget in place, resizing it once.
+
+        :param list_widget: widget created for a LIST field
+        :param elements: list of dicts with values of new elements
+        :param scheme: value_scheme of the field
+        """
+        if not elements:
+            return
+        walker = list_widget.original_widget.list_walker
+        first = len(walker)
+        walker.extend(elements)
+        item_size = cls._list_item_rows(scheme, toolbar)
+        box_size = sum(item.rows((MAX_WIDTH,))
+                       if isinstance(item, urwid.Widget) else item_size
+                       for item in walker.contents)
+        list_widget.height = cls._list_height(box_size, item_size)
+        list_widget._invalidate()
+        # Show the first new element
+        walker.set_focus(first)
 
     @classmethod
     def _create_widget(cls, key, default_data, toolbar):
@@ -256,10 +341,17 @@ class ModuleHelper(object):
         return [cls._create_widget(key, defaults.get(key, {}), toolbar)
                 for key in fields]
 
+    @staticmethod
+    def check_button(modobj, button):
+        """Checks module, reporting its network probes when they finish."""
+        with modobj.parent.probes.background():
+            return modobj.check(button)
+
     @staticmethod
     def _get_check_column(modobj, show_all_buttons):
         # Button to check
-        button_check = widget.Button("Check", modobj.check)
+        button_check = widget.Button(
+            "Check", functools.partial(ModuleHelper.check_button, modobj))
 
         if modobj.parent.globalsave and show_all_buttons is False:
             return widget.Columns([button_check])
@@ -368,9 +460,6 @@ class ModuleHelper(object):
     @classmethod
     def get_default_gateway_linux(cls):
         """Read the default gateway directly from /proc."""
-        with open("/proc/net/route") as fh:
-            for line in fh:
-                fields = line.strip().split()
-                if fields[1] != '00000000' or not int(fields[3], 16) & 2:
-                    continue
-                return socket.inet_ntoa(struct.pack("<L", int(fields[2], 16)))
+        route = network.get_default_route()
+        if route is not None:
+            return route[0]
@@ -14,16 +14,31 @@
 
 import json
 import logging
+import math
 import os
+import re
+import socket
+import struct
+import threading
+import time
 
 import netaddr
 import netifaces
+import six
 
 from fuelmenu.common import errors
 from fuelmenu.common.utils import execute
 
 log = logging.getLogger('fuelmenu.common.network')
 
+NTPDATE_SERVER_RE = re.compile(
+    r"^server (?P<address>\S+), stratum (?P<stratum>\d+), "
+    r"offset (?P<offset>-?[\d.]+), delay (?P<delay>-?[\d.]+)$")
+# Stratum 16 means the server is not synchronized itself
+NTP_UNSYNCHRONIZED_STRATUM = 16
+# Seconds result of the gateway check is shared by modules for
+GATEWAY_CHECK_TTL = 30
+
 
 def inSameSubnet(ip1, ip2, netmask_or_cidr):
     if not all([ip1, ip2]):
@@ -78,6 +93,112 @@ def get_physical_ifaces():
     return sorted(filter(is_physical, ifaces))
 
 
+def get_state():
+    """Returns addresses of physical interfaces and default gateways.
+
+    Lets callers notice that network configuration of the host changed.
+    """
+    addresses = dict((iface, netifaces.ifaddresses(iface))
+                     for iface in get_physical_ifaces())
+    return addresses, netifaces.gateways().get('default', {})
+
+
+def get_default_route():
+    """Returns (gateway, interface) of the default route or None."""
+    with open("/proc/net/route") as fh:
+        for line in fh:
+            fields = line.strip().split()
+            # Default destination with the gateway flag set
+            if fields[1] != '00000000' or not int(fields[3], 16) & 2:
+                continue
+            gateway = socket.inet_ntoa(struct.pack("<L", int(fields[2], 16)))
+            return gateway, fields[0]
+    return None
+
+
+def is_on_link(host):
+    """Returns True if host is an address of a directly connected network.
+
+    Such hosts are reachable without the default gateway. Host names are
+    never considered on link.
+    """
+    try:
+        address = netaddr.IPAddress(host)
+    except (netaddr.AddrFormatError, ValueError):
+        return False
+    if address.is_loopback():
+        return True
+    for iface in netifaces.interfaces():
+        for addr in netifaces.ifaddresses(iface).get(netifaces.AF_INET, []):
+            if 'netmask' not in addr:
+                continue
+            if address in netaddr.IPNetwork(
+                    "{0}/{1}".format(addr['addr'], addr['netmask'])):
+                return True
+    return False
+
+
+def gateway_reachable(timeout=1):
+    """Checks that a default route exists and its gateway answers ARP."""
+    route = get_default_route()
+    if route is None:
+        log.warning("No default route configured")
+        return False
+    gateway, iface = route
+    command = ["arping", "-c1", "-w{0}".format(timeout), "-I", iface,
+               gateway]
+    code, _, _ = execute(command)
+    if code != 0:
+        log.warning("Default gateway %s doesn't answer on %s", gateway, iface)
+    return code == 0
+
+
+class GatewayCheck(object):
+    """Shared check that external servers can be reached.
+
+    Modules ask it before probing servers behind the default gateway
+    (DNS, NTP, repositories). Without a working route the probes are
+    skipped at once instead of waiting out their timeouts one after
+    another. The result is shared for ttl seconds while network
+    configuration of the host stays the same, and concurrent callers wait
+    for a single check, so the warning is shown once.
+    """
+
+    def __init__(self, ttl=GATEWAY_CHECK_TTL, warn=None, state=None):
+        """Creates the check.
+
+        :param ttl: seconds the result is reused for
+        :param warn: callable receiving a message if gateway isn't reachable
+        :param state: callable returning host state the result depends on,
+                      get_state by default
+        """
+        self.ttl = ttl
+        self.warn = warn
+        self.state = state or get_state
+        self.lock = threading.Lock()
+        # Latest check: (state, result, time)
+        self.entry = None
+
+    def reachable(self):
+        """Returns True if the default gateway is reachable."""
+        state = self.state()
+        with self.lock:
+            if self.entry is not None and self.entry[0] == state and \
+                    time.time() - self.entry[2] < self.ttl:
+                return self.entry[1]
+            result = gateway_reachable()
+            self.entry = (state, result, time.time())
+            if not result and self.warn:
+                self.warn("The default gateway is not reachable. Checks of "
+                          "external DNS, NTP servers and repositories are "
+                          "skipped. Configure the gateway in Network Setup.")
+            return result
+
+    def can_reach(self, host):
+        """Returns False if host is behind the unreachable gateway."""
+        return is_on_link(host) or self.reachable()
+
+
 def is_interface_has_ip(interface):
     addr = netifaces.ifaddresses(interface)
     return netifaces.AF_INET in addr
@@ -188,6 +309,60 @@ def search_external_dhcp(iface, timeout):
         raise errors.NetworkException('Unable to check DHCP.')
 
 
+def parse_ntpdate(output):
+    """Parses answers of each server address from ntpdate -q output.
+
+    :param output: stdout of ntpdate -q
+    :returns: list of (stratum, offset, delay) tuples
+    """
+    replies = []
+    for line in output.splitlines():
+        match = NTPDATE_SERVER_RE.match(line.strip())
+        if match:
+            replies.append((int(match.group('stratum')),
+                            float(match.group('offset')),
+                            float(match.group('delay'))))
+    return replies
+
+
+def measure_ntp(server, samples=4, timeout=2):
+    """Queries NTP server several times and estimates its quality.
+
+    Offset and delay are taken from the sample with the lowest delay,
+    which is the least affected by network queueing. Jitter is the root
+    mean square of differences between every sample offset and that one.
+
+    :param server: NTP server hostname or IP address
+    :param samples: number of queries to send
+    :param timeout: timeout of every query in seconds
+    :returns: dict with server, offset, delay, jitter (all in seconds) and
+              number of answered samples or None if server never answered
+    """
+    measured = []
+    command = ["ntpdate", "-q", "-p1", "-t{0}".format(timeout), server]
+    for _ in six.moves.range(samples):
+        code, output, _ = execute(command)
+        if code != 0:
+            continue
+        replies = [reply for reply in parse_ntpdate(output)
+                   if reply[0] < NTP_UNSYNCHRONIZED_STRATUM]
+        if replies:
+            measured.append(min(replies, key=lambda reply: reply[2])[1:])
+
+    if not measured:
+        log.warning("NTP server %s did not answer any query", server)
+        return None
+
+    offset, delay = min(measured, key=lambda sample: sample[1])
+    jitter = math.sqrt(sum((sample[0] - offset) ** 2
+                           for sample in measured) / len(measured))
+    return {"server": server,
+            "offset": offset,
+            "delay": delay,
+            "jitter": jitter,
+            "samples": len(measured)}
+
+
 def upIface(iface):
     code, _, _ = execute(["ifconfig", iface, "up"])
     if code != 0:
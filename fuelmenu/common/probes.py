@@ -0,0 +1,127 @@
+# Copyright 2016 Mirantis, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import contextlib
+import logging
+import threading
+
+from fuelmenu.common import timeout
+
+log = logging.getLogger('fuelmenu.common.probes')
+
+
+class ProbeRunner(object):
+    """Runs network probes of module checks.
+
+    Checks are split into two tiers. Local checks (syntax of values,
+    addresses, subnets) run first and report mistakes at once. Probes of
+    the network (DHCP scan, arping, DNS, NTP and repository servers) run
+    only once the local checks pass: in the background when the operator
+    presses Check, synchronously when settings are saved. Quick save
+    skips the probes entirely.
+    """
+
+    def __init__(self, report=None, flush=None):
+        """Creates the runner.
+
+        :param report: callable receiving module name and list of problems
+                       found by a probe which ran in the background
+        :param flush: callable drawing pending changes of the screen before
+                      a probe blocks the calling thread
+        """
+        self.report = report
+        self.flush = flush
+        self.quick = False
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        # Latest background probe of every module: (generation, thread)
+        self.running = {}
+
+    @contextlib.contextmanager
+    def background(self):
+        """Probes run by the current thread within are not waited for."""
+        self.local.background = True
+        try:
+            yield
+        finally:
+            self.local.background = False
+
+    def run(self, name, probe, describe=None):
+        """Runs network probe of a module.
+
+        Probes only return what they found. Running in the background they
+        must not touch the screen, the report callable passes the found
+        problems to the UI thread.
+
+        :param name: module name
+        :param probe: callable returning list of found problems
+        :param describe: callable turning result of the probe into list of
+                         problems to report, by default it is reported as is
+        :returns: result of the probe or None if the probe was skipped or
+                  runs in the background. Results of such checks must not
+                  be taken as complete, e.g. stored in the check cache.
+        """
+        if self.quick:
+            log.info("Quick save, skipping network checks of %s", name)
+            return None
+        if not getattr(self.local, 'background', False):
+            if self.flush:
+                self.flush()
+            return probe()
+
+        with self.lock:
+            generation = self.running.get(name, (0, None))[0] + 1
+            thread = threading.Thread(
+                target=timeout.inherit(self._run_background),
+                args=(name, generation, probe, describe))
+            thread.daemon = True
+            self.running[name] = (generation, thread)
+        log.info("Running network checks of %s in background", name)
+        thread.start()
+        return None
+
+    def _run_background(self, name, generation, probe, describe):
+        try:
+            problems = probe()
+            if describe is not None:
+                problems = describe(problems)
+        except Exception as e:
+            log.exception("Network checks of %s failed", name)
+            problems = ["Network checks failed: {0}".format(e)]
+        with self.lock:
+            # Newer check of the same module replaces results of this one
+            if self.running.get(name, (None, None))[0] != generation:
+                log.debug("Dropping outdated network checks of %s", name)
+                return
+            del self.running[name]
+        if self.report:
+            self.report(name, problems)
+
+    def wait(self, name):
+        """Waits for the background probe of a module to finish."""
+        with self.lock:
+            generation, thread = self.running.get(name, (None, None))
+        if thread is not None:
+            thread.join()
+
+    def wait_all(self):
+        """Waits for background probes of all modules to finish.
+
+        Saving probes the network again, probes started by Check must not
+        run at the same time (e.g. two DHCP scans of the same interface).
+        """
+        with self.lock:
+            names = list(self.running)
+        for name in names:
+            self.wait(name)
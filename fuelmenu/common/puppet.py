@@ -13,10 +13,105 @@
 # under the License.
 
 import logging
+import os
+import re
+import threading
+import time
 
 from fuelmenu.common import utils
 from fuelmenu import consts
 
+log = logging.getLogger('fuelmenu.common.puppet')
+
+# Name of the scheduler job applying merged puppet classes
+CLASSES_JOB = "puppet_classes"
+
+# Puppet runs on the master must never overlap
+_apply_lock = threading.Lock()
+
+# "<date> <time> <tz> <source> (<level>): <message>" written by --logdest
+PUPPET_LOG_RE = re.compile(
+    r'^\S+ \S+ \S+ (?P<source>.+?) \((?P<level>\w+)\): (?P<message>.*)$')
+# Resource reference like Service[nailgun] in a source path
+PUPPET_RESOURCE_RE = re.compile(r'[A-Z][\w:]*\[[^\]]*\]')
+PUPPET_ERROR_LEVELS = ('err', 'alert', 'emerg', 'crit')
+
+
+class PuppetProgress(object):
+    """Tracks progress of a running puppet apply by tailing its log.
+
+    Every call reads only lines appended to the log since the previous
+    call and reports a short status, e.g. to the footer:
+
+        Applying nailgun.pp: Service[nailgun] [42s]
+    """
+
+    def __init__(self, title, report, logfile=consts.PUPPET_LOGFILE):
+        self.title = title
+        self.report = report
+        self.logfile = logfile
+        self.offset = self._size()
+        self.started = time.time()
+        self.phase = "starting"
+        self.resource = None
+        self.errors = []
+        self._partial = ''
+
+    def _size(self):
+        try:
+            return os.path.getsize(self.logfile)
+        except OSError:
+            return 0
+
+    def read_lines(self):
+        """Returns complete lines appended to the log since the last read."""
+        if self._size() < self.offset:
+            # Log was rotated or truncated
+            self.offset = 0
+            self._partial = ''
+        try:
+            with open(self.logfile) as logfile:
+                logfile.seek(self.offset)
+                data = logfile.read()
+                self.offset = logfile.tell()
+        except IOError:
+            return []
+        lines = (self._partial + data).split('\n')
+        self._partial = lines.pop()
+        return lines
+
+    def parse_line(self, line):
+        match = PUPPET_LOG_RE.match(line)
+        if not match:
+            return
+        source, level, message = match.group('source', 'level', 'message')
+        if level in PUPPET_ERROR_LEVELS:
+            self.errors.append(message)
+        if message.startswith("Compiled catalog"):
+            self.phase = "catalog compiled"
+        elif message.startswith("Applying configuration version"):
+            self.phase = "applying catalog"
+        elif message.startswith("Finished catalog run"):
+            self.phase = "finished"
+            self.resource = None
+        resources = PUPPET_RESOURCE_RE.findall(source)
+        if resources:
+            self.resource = resources[-1]
+
+    def status(self):
+        current = self.resource or self.phase
+        msg = "{0}: {1} [{2}s]".format(
+            self.title, current, int(time.time() - self.started))
+        if self.errors:
+            msg += " - {0} error(s), last: {1}".format(
+                len(self.errors), self.errors[-1])
+        return msg
+
+    def __call__(self):
+        for line in self.read_lines():
+            self.parse_line(line)
+        self.report(self.status())
+
 
 def _to_string(value):
     if isinstance(value, bool):
@@ -24,11 +119,27 @@ def _to_string(value):
     return '"{0}",'.format(value)
 
 
-def puppetApply(classes):
+def _execute(command, title, progress, **kwargs):
+    tracker = None
+    if progress is not None:
+        tracker = kwargs['progress'] = PuppetProgress(title, progress)
+    with _apply_lock:
+        result = utils.execute(command, **kwargs)
+    if tracker is not None:
+        # Catch up with lines written right before puppet exited
+        tracker()
+        for error in tracker.errors:
+            log.error("Puppet: %s", error)
+    return result
+
+
+def puppetApply(classes, progress=None):
     """Runs puppet apply
 
     :param classes: list of {'type': 'name': 'params':}. name must be a string
     :type classes: dict or list of dicts
+    :param progress: callable receiving status of the run while puppet
+                     is working (optional)
     """
     log = logging
     log.info("Puppet start")
@@ -62,7 +173,8 @@ def puppetApply(classes):
     stdin = ' '.join(cmd_input)
     log.debug(' '.join(command))
     log.debug(stdin)
-    code, out, err = utils.execute(command, stdin=stdin)
+    code, out, err = _execute(command, "Applying puppet classes", progress,
+                              stdin=stdin)
     if code != 0:
         log.error("Exit code: %d. Error: %s Stdout: %s",
                   code, err, out)
@@ -70,7 +182,7 @@ def puppetApply(classes):
     return True
 
 
-def puppetApplyManifest(manifest):
+def puppetApplyManifest(manifest, progress=None):
     log = logging
     log.info("Start puppet apply with manifest {0}".format(manifest))
 
@@ -78,7 +190,8 @@ def puppetApplyManifest(manifest):
            consts.PUPPET_LOGFILE, manifest]
 
     log.debug(' '.join(cmd))
-    err_code, _, errout = utils.execute(cmd)
+    title = "Applying {0}".format(os.path.basename(manifest))
+    err_code, _, errout = _execute(cmd, title, progress)
 
     if err_code != 0:
         msg = "Puppet apply failed. Check logs for more details."
@@ -88,3 +201,99 @@ def puppetApplyManifest(manifest):
     msg = "Puppet apply successfully executed."
     log.info(msg)
     return True, msg
+
+
+class ApplyScheduler(object):
+    """Collects puppet apply requests from modules and runs them together.
+
+    Several modules may need the same manifest applied during one save
+    (e.g. both feature groups and PXE setup need Nailgun manifest after
+    deployment). Identical manifests are applied only once and all
+    requested puppet classes are merged into a single puppet apply run.
+    """
+
+    def __init__(self):
+        self.manifests = []
+        self.classes = []
+
+    def __len__(self):
+        return len(self.manifests) + int(bool(self.classes))
+
+    def add_manifest(self, manifest):
+        """Request manifest to be applied."""
+        if manifest not in self.manifests:
+            self.manifests.append(manifest)
+
+    def add_classes(self, classes):
+        """Request puppet classes to be applied.
+
+        :param classes: list of {'type': 'name': 'params':}, see puppetApply
+        """
+        for cls in classes:
+            key = self._class_key(cls)
+            for index, queued in enumerate(self.classes):
+                if self._class_key(queued) == key:
+                    if queued != cls:
+                        log.warning("Puppet %s is requested with different "
+                                    "parameters, using the latest ones", key)
+                    self.classes[index] = cls
+                    break
+            else:
+                self.classes.append(cls)
+
+    def discard(self, name):
+        """Drops requests applied by the job with the given name."""
+        if name == CLASSES_JOB:
+            self.classes = []
+        elif name in self.manifests:
+            self.manifests.remove(name)
+
+    def ordered_manifests(self):
+        """Returns requested manifests in the order they should be applied.
+
+        Known manifests are applied in order of consts.PUPPET_MANIFESTS,
+        the rest follow them sorted by path.
+        """
+        def position(manifest):
+            try:
+                return consts.PUPPET_MANIFESTS.index(manifest), manifest
+            except ValueError:
+                return len(consts.PUPPET_MANIFESTS), manifest
+
+        return sorted(self.manifests, key=position)
+
+    def jobs(self, progress=None):
+        """Returns puppet runs needed to apply all requests.
+
+        Every manifest is applied by a separate job named after the
+        manifest path, merged classes are applied by CLASSES_JOB. Jobs are
+        returned in order they should run, a job drops its request once it
+        succeeds, so a failed save can be retried.
+
+        :param progress: callable receiving status of running puppet
+        :returns: list of (name, callable) tuples
+        """
+        def manifest_job(manifest):
+            def job():
+                result, _ = puppetApplyManifest(manifest,
+                                                progress=progress)
+                if result:
+                    self.manifests.remove(manifest)
+                return result
+            return job
+
+        def classes_job():
+            result = puppetApply(self.classes, progress=progress)
+            if result:
+                self.classes = []
+            return result
+
+        jobs = [(manifest, manifest_job(manifest))
+                for manifest in self.ordered_manifests()]
+        if self.classes:
+            jobs.append((CLASSES_JOB, classes_job))
+        return jobs
+
+    @staticmethod
+    def _class_key(cls):
+        return cls['type'], cls.get('class'), cls.get('name')
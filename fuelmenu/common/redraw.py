@@ -0,0 +1,127 @@
+# Copyright 2016 Mirantis, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import collections
+import logging
+import threading
+import time
+
+import urwid
+
+log = logging.getLogger('fuelmenu.common.redraw')
+
+# Minimal interval in seconds between two renders of the screen
+FRAME_INTERVAL = 0.1
+# Interval in seconds render statistics are collected for
+STATS_INTERVAL = 1.0
+
+
+class Footer(urwid.AttrWrap):
+    """Status line of the screen.
+
+    Only the UI thread may change widgets. Text set by other threads is
+    queued and shown by the next render. Text set by the UI thread
+    replaces queued messages, they were posted before it.
+    """
+
+    def __init__(self, text, attr='footer'):
+        super(Footer, self).__init__(urwid.Text(text), attr)
+        self.ui_thread = threading.current_thread()
+        # Latest message posted by other threads
+        self.queued = collections.deque(maxlen=1)
+
+    def set_text(self, text):
+        if threading.current_thread() != self.ui_thread:
+            self.queued.append(text)
+            return
+        self.queued.clear()
+        self.original_widget.set_text(text)
+
+    def show_queued(self):
+        """Shows message posted by other threads, called before render."""
+        try:
+            text = self.queued.pop()
+        except IndexError:
+            return
+        self.original_widget.set_text(text)
+
+
+class RedrawScheduler(object):
+    """Coalesces screen redraw requests.
+
+    The screen is drawn at once if the previous frame is older than the
+    frame interval. Requests coming faster are merged into a single redraw
+    scheduled with an alarm of the main loop. The alarm doesn't fire while
+    the UI thread is blocked, callers draw the pending redraw with flush
+    before blocking work.
+    """
+
+    def __init__(self, loop, draw, interval=FRAME_INTERVAL):
+        self.loop = loop
+        self.draw = draw
+        self.interval = interval
+        self.last_render = None
+        self.alarm = None
+        # Renders and requests since the start of current stats interval
+        self.renders = 0
+        self.requests = 0
+        self.stats_start = time.time()
+        # Renders per second during the last complete stats interval
+        self.rate = 0.0
+
+    def request(self):
+        """Requests redraw of the screen."""
+        self.requests += 1
+        now = time.time()
+        if self.last_render is None or \
+                now - self.last_render >= self.interval:
+            self.render()
+        elif self.alarm is None:
+            self.alarm = self.loop.set_alarm_in(
+                self.interval - (now - self.last_render), self._on_alarm)
+
+    def pending(self):
+        """Returns True if a requested redraw was not drawn yet."""
+        return self.alarm is not None
+
+    def flush(self):
+        """Draws the pending redraw at once."""
+        if self.pending():
+            self.render()
+
+    def _on_alarm(self, loop, user_data):
+        self.alarm = None
+        self.render()
+
+    def render(self):
+        """Draws the screen, cancelling scheduled redraw."""
+        if self.alarm is not None:
+            self.loop.remove_alarm(self.alarm)
+            self.alarm = None
+        self.draw()
+        self.last_render = time.time()
+        self.renders += 1
+        self._update_stats(self.last_render)
+
+    def _update_stats(self, now):
+        elapsed = now - self.stats_start
+        if elapsed < STATS_INTERVAL:
+            return
+        self.rate = self.renders / elapsed
+        log.debug("Rendered %d frames for %d redraw requests in %.1fs "
+                  "(%.1f fps)", self.renders, self.requests, elapsed,
+                  self.rate)
+        self.renders = 0
+        self.requests = 0
+        self.stats_start = now
@@ -0,0 +1,709 @@
+# Copyright 2016 Mirantis, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import base64
+import collections
+import contextlib
+import json
+import logging
+import re
+import socket
+import threading
+import time
+import zlib
+
+import requests
+from requests import adapters
+import six
+
+from fuelmenu.common import timeout
+from fuelmenu.common import utils
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        # Only gzip compressed indexes are used then
+        lzma = None
+
+DECOMPRESS_ERRORS = (zlib.error, EOFError) + \
+    ((lzma.LZMAError,) if lzma is not None else ())
+
+log = logging.getLogger('fuelmenu.common.repos')
+
+# (connect, read) timeouts of a single request in seconds
+REQUEST_TIMEOUT = (3.05, 10)
+# Overall time budget for checking all repositories
+CHECK_DEADLINE = 30
+# Number of hosts probed at the same time
+MAX_HOSTS = 8
+# Seconds an accessible URL is not checked again
+CACHE_TTL = 600
+# Bytes downloaded from every mirror to estimate its throughput
+SAMPLE_SIZE = 1024 * 1024
+# Time budget for benchmarking a single mirror
+BENCHMARK_DEADLINE = 15
+# Architecture of the bootstrap image
+BOOTSTRAP_ARCH = 'amd64'
+# Release file fields needed to validate repository configuration
+RELEASE_FIELDS = ('Suite', 'Codename', 'Components', 'Architectures')
+# Release file fields starting lists of checksums after the header
+RELEASE_CHECKSUM_FIELDS = ('MD5Sum', 'SHA1', 'SHA256', 'SHA512')
+# Time budget for downloading package indexes of all repositories
+SCAN_DEADLINE = 120
+# Priority of a repository without explicit priority, same as in apt
+DEFAULT_PRIORITY = 500
+
+
+def release_url(base_url, suite):
+    return '{base_url}/dists/{suite}/Release'.format(
+        base_url=base_url.rstrip('/'), suite=suite)
+
+
+def split_no_proxy(no_proxy):
+    return [entry.strip() for entry in (no_proxy or '').split(',')
+            if entry.strip()]
+
+
+def bypass_proxy(url, no_proxy):
+    """Returns True if url should be requested directly.
+
+    :param no_proxy: list of host names, domain suffixes, IP addresses or
+                     CIDRs, the same format as NO_PROXY environment variable
+    """
+    host = six.moves.urllib.parse.urlparse(url).hostname or ''
+    for entry in no_proxy:
+        if entry == '*':
+            return True
+        if requests.utils.is_valid_cidr(entry):
+            if requests.utils.is_ipv4_address(host) and \
+                    requests.utils.address_in_network(host, entry):
+                return True
+            continue
+        entry = entry.lstrip('.').split(':')[0]
+        if host == entry or host.endswith('.' + entry):
+            return True
+    return False
+
+
+def sample_url(base_url, suite, section=None):
+    """Returns URL of a reasonably large file of the repository."""
+    component = (section or 'main').split()[0]
+    return '{base_url}/dists/{suite}/{component}/binary-amd64/' \
+           'Packages.gz'.format(base_url=base_url.rstrip('/'), suite=suite,
+                                component=component)
+
+
+def parse_release_header(lines):
+    """Parses header fields of a Release or InRelease file.
+
+    Consumes lines only until all RELEASE_FIELDS are found or checksum
+    lists start, so the rest of a large file is never read.
+
+    :param lines: iterable of lines
+    :returns: dict of found RELEASE_FIELDS
+    """
+    fields = {}
+    for line in lines:
+        if not line or line[0].isspace() or ':' not in line:
+            continue
+        key, value = line.split(':', 1)
+        if key in RELEASE_CHECKSUM_FIELDS:
+            break
+        if key in RELEASE_FIELDS:
+            fields[key] = value.strip()
+            if len(fields) == len(RELEASE_FIELDS):
+                break
+    return fields
+
+
+def validate_release(fields, suite, section=None, arch=BOOTSTRAP_ARCH):
+    """Returns problems of repository configuration found in its Release.
+
+    :param fields: dict returned by parse_release_header
+    :param suite: configured suite
+    :param section: configured space separated components
+    :param arch: architecture which should be in the repository
+    """
+    problems = []
+    served = [fields[key] for key in ('Suite', 'Codename') if key in fields]
+    if served and suite not in served:
+        problems.append("suite {0} is not served, Release file is for "
+                        "{1}".format(suite, served[-1]))
+    if 'Components' in fields:
+        components = fields['Components'].split()
+        for component in (section or '').split():
+            # Debian security lists its components as updates/main
+            if not any(c == component or c.endswith('/' + component)
+                       for c in components):
+                problems.append("component {0} does not exist"
+                                .format(component))
+    if 'Architectures' in fields and \
+            arch not in fields['Architectures'].split():
+        problems.append("architecture {0} is not supported".format(arch))
+    return problems
+
+
+def packages_indexes():
+    """Returns (name, decompressor factory) of Packages index variants.
+
+    Smaller variants go first.
+    """
+    indexes = []
+    if lzma is not None:
+        indexes.append(('Packages.xz', lzma.LZMADecompressor))
+    indexes.append(('Packages.gz',
+                    lambda: zlib.decompressobj(16 + zlib.MAX_WBITS)))
+    indexes.append(('Packages', None))
+    return indexes
+
+
+def iter_lines(chunks, decompressor=None):
+    """Yields lines of a stream of (compressed) chunks."""
+    partial = b''
+    for chunk in chunks:
+        if decompressor is not None:
+            chunk = decompressor.decompress(chunk)
+        lines = (partial + chunk).split(b'\n')
+        partial = lines.pop()
+        for line in lines:
+            yield line
+    if partial:
+        yield partial
+
+
+def parse_packages(lines):
+    """Builds name to version index of a Packages file.
+
+    :param lines: iterable of lines of the file
+    :returns: dict mapping package name to its newest version
+    """
+    index = {}
+    name = version = None
+    for line in lines:
+        if line.startswith(b'Package:'):
+            name = line.split(b':', 1)[1].strip().decode('utf-8')
+        elif line.startswith(b'Version:'):
+            version = line.split(b':', 1)[1].strip().decode('utf-8')
+        elif not line.strip():
+            name = version = None
+        if name and version:
+            if name not in index or \
+                    compare_versions(version, index[name]) > 0:
+                index[name] = version
+            name = version = None
+    return index
+
+
+def _order(char):
+    # dpkg ordering of non-digit characters: ~ first, letters before others
+    if char == '~':
+        return -1
+    if char.isalpha():
+        return ord(char)
+    return ord(char) + 256
+
+
+def _compare_part(left, right):
+    while left or right:
+        left_str = re.match(r'\D*', left).group()
+        right_str = re.match(r'\D*', right).group()
+        for index in six.moves.range(max(len(left_str), len(right_str))):
+            left_order = _order(left_str[index]) \
+                if index < len(left_str) else 0
+            right_order = _order(right_str[index]) \
+                if index < len(right_str) else 0
+            if left_order != right_order:
+                return left_order - right_order
+        left, right = left[len(left_str):], right[len(right_str):]
+        left_num = re.match(r'\d*', left).group()
+        right_num = re.match(r'\d*', right).group()
+        if int(left_num or 0) != int(right_num or 0):
+            return int(left_num or 0) - int(right_num or 0)
+        left, right = left[len(left_num):], right[len(right_num):]
+    return 0
+
+
+def _split_version(version):
+    epoch, _, rest = version.rpartition(':')
+    upstream, _, revision = rest.rpartition('-')
+    if not upstream:
+        upstream, revision = revision, ''
+    return int(epoch or 0), upstream, revision
+
+
+def compare_versions(left, right):
+    """Compares Debian package versions like dpkg does.
+
+    :returns: negative, zero or positive number if left is older, the same
+              or newer than right
+    """
+    left_epoch, left_upstream, left_revision = _split_version(left)
+    right_epoch, right_upstream, right_revision = _split_version(right)
+    if left_epoch != right_epoch:
+        return left_epoch - right_epoch
+    return (_compare_part(left_upstream, right_upstream) or
+            _compare_part(left_revision, right_revision))
+
+
+def resolve_packages(required, indexes):
+    """Finds which repository each required package would be installed from.
+
+    Like apt, the repository with the highest priority wins and the newest
+    version is taken among repositories with the same priority.
+
+    :param required: list of package names
+    :param indexes: list of (repo name, priority, index) tuples, index is
+                    a dict returned by parse_packages
+    :returns: tuple of dict mapping package to (repo name, version) and
+              list of missing packages
+    """
+    resolved = {}
+    missing = []
+    for package in required:
+        candidates = [
+            (DEFAULT_PRIORITY if priority is None else priority,
+             index[package], name)
+            for name, priority, index in indexes if package in index]
+        if not candidates:
+            missing.append(package)
+            continue
+        best = candidates[0]
+        for candidate in candidates[1:]:
+            if candidate[0] > best[0] or (
+                    candidate[0] == best[0] and
+                    compare_versions(candidate[1], best[1]) > 0):
+                best = candidate
+        resolved[package] = (best[2], best[1])
+    return resolved, missing
+
+
+def rank_mirrors(measurements):
+    """Sort mirror measurements from the fastest to the slowest.
+
+    Mirrors are ordered by throughput and then by time to first byte,
+    mirrors which failed to respond go last.
+    """
+    def speed(measurement):
+        if measurement['error']:
+            return (1, 0, 0)
+        return (0, -measurement['throughput'], measurement['ttfb'])
+
+    return sorted(measurements, key=speed)
+
+
+class RepoCache(object):
+    """On-disk cache of accessible repository URLs.
+
+    Every entry keeps time of the last successful check, ETag and
+    Last-Modified of the response and parsed Release header. Within ttl
+    the URL is considered accessible without a request, later it is
+    checked by a conditional request. Inaccessible URLs are never cached.
+    """
+
+    def __init__(self, path, ttl=CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        try:
+            with open(path) as cache_file:
+                self.entries = json.load(cache_file)
+        except (IOError, ValueError) as e:
+            log.debug("Repository cache %s is not loaded: %s", path, e)
+            self.entries = {}
+
+    def fresh(self, url):
+        entry = self.entries.get(url)
+        return (entry is not None and 'release' in entry and
+                time.time() - entry['checked'] < self.ttl)
+
+    def release(self, url):
+        return self.entries.get(url, {}).get('release')
+
+    def headers(self, url):
+        """Returns headers making request for url conditional."""
+        entry = self.entries.get(url, {})
+        headers = {}
+        if entry.get('release') is None:
+            # Nothing to reuse if the file is not modified
+            return headers
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def update(self, url, resp, release=None):
+        with self.lock:
+            if not (resp.ok or resp.status_code == 304):
+                self.entries.pop(url, None)
+                return
+            entry = self.entries.setdefault(url, {})
+            entry['checked'] = time.time()
+            if resp.status_code != 304:
+                entry['etag'] = resp.headers.get('ETag')
+                entry['last_modified'] = resp.headers.get('Last-Modified')
+                entry['release'] = release
+
+    def forget(self, url):
+        with self.lock:
+            self.entries.pop(url, None)
+
+    def save(self):
+        """Writes cache atomically, failures are only logged."""
+        try:
+            with self.lock:
+                utils.write_json(self.path, self.entries)
+        except (IOError, OSError) as e:
+            log.warning("Unable to save repository cache %s: %s",
+                        self.path, e)
+
+
+class RepoChecker(object):
+    """Checks accessibility of repository URLs.
+
+    All requests share one session and its connection pools. URLs are
+    grouped by host: hosts are probed concurrently, URLs of one host one
+    after another, and once a host can't be reached its other URLs are
+    not requested at all. The whole check is bounded by a single deadline.
+
+    With a RepoCache recently checked URLs are not requested again and
+    the rest are requested conditionally.
+
+    Proxies given explicitly are used by this checker only, proxy
+    environment variables are ignored then. Without them the environment
+    is respected as usual.
+    """
+
+    def __init__(self, request_timeout=REQUEST_TIMEOUT,
+                 deadline=CHECK_DEADLINE, max_hosts=MAX_HOSTS, cache=None,
+                 proxies=None, no_proxy=None):
+        self.cache = cache
+        self.proxies = None
+        self.no_proxy = split_no_proxy(no_proxy)
+        self.request_timeout = request_timeout
+        self.deadline = deadline
+        self.max_hosts = max_hosts
+        self.session = requests.Session()
+        self.session.verify = False
+        adapter = adapters.HTTPAdapter(pool_connections=max_hosts)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if proxies is not None:
+            self.session.trust_env = False
+            self.proxies = dict((scheme, proxy)
+                                for scheme, proxy in proxies.items() if proxy)
+
+    def proxy_for(self, url):
+        """Returns proxy URL used to request url or None."""
+        scheme = six.moves.urllib.parse.urlparse(url).scheme
+        if self.proxies is None:
+            if not self.session.trust_env:
+                return None
+            return requests.utils.get_environ_proxies(url).get(scheme)
+        if bypass_proxy(url, self.no_proxy):
+            return None
+        return self.proxies.get(scheme)
+
+    def _get(self, url, **kwargs):
+        if self.proxies is not None:
+            proxy = self.proxy_for(url)
+            kwargs['proxies'] = {'http': proxy, 'https': proxy}
+        kwargs.setdefault('timeout', self._timeout())
+        return self.session.get(url, **kwargs)
+
+    def _timeout(self):
+        left = timeout.remaining()
+        if left is None:
+            return self.request_timeout
+        return tuple(min(t, left) for t in self.request_timeout)
+
+    def fetch_release(self, url):
+        """Returns header fields of the Release file at url.
+
+        The file is streamed and the connection is closed as soon as the
+        header is parsed.
+
+        :returns: dict of fields, None if url is not accessible
+        :raises: requests.exceptions.ConnectionError if the host is not
+                 reachable, timeout.TimeoutError if deadline expired
+        """
+        if self.cache is None:
+            headers = {}
+        elif self.cache.fresh(url):
+            return self.cache.release(url)
+        else:
+            headers = self.cache.headers(url)
+        timeout.check()
+        try:
+            resp = self._get(url, headers=headers, stream=True)
+        except Exception:
+            if self.cache is not None:
+                self.cache.forget(url)
+            raise
+        with contextlib.closing(resp):
+            if resp.status_code == 304:
+                release = self.cache.release(url)
+            elif resp.ok:
+                release = parse_release_header(
+                    resp.iter_lines(chunk_size=1024))
+            else:
+                release = None
+        if self.cache is not None:
+            self.cache.update(url, resp, release)
+        return release
+
+    def _check_host(self, urls):
+        results = []
+        for index, url in enumerate(urls):
+            try:
+                release = self.fetch_release(url)
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout,
+                    timeout.TimeoutError) as e:
+                log.error("Unable to reach %s: %s", url, e)
+                # Don't wait for the same host again
+                results.extend((u, None) for u in urls[index:])
+                break
+            except (requests.exceptions.RequestException,
+                    requests.exceptions.BaseHTTPError) as e:
+                log.error(e)
+                release = None
+            results.append((url, release))
+        return results
+
+    def check(self, urls):
+        """Checks all Release file urls within the deadline.
+
+        :param urls: iterable of URLs
+        :returns: dict mapping every url to its Release header fields or
+                  None if it is not accessible
+        """
+        by_host = collections.OrderedDict()
+        for url in urls:
+            host = six.moves.urllib.parse.urlparse(url).netloc
+            by_host.setdefault(host, []).append(url)
+
+        with timeout.Deadline(self.deadline):
+            checked = utils.parallel_map(self._check_host,
+                                         by_host.values(),
+                                         max_workers=self.max_hosts)
+        if self.cache is not None:
+            self.cache.save()
+        return dict(result for host in checked for result in host)
+
+    def _connect_time(self, url):
+        # Only the connection to a proxy is made if one is used
+        parsed = six.moves.urllib.parse.urlparse(self.proxy_for(url) or url)
+        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        started = time.time()
+        sock = socket.create_connection((parsed.hostname, port),
+                                        timeout=self._timeout()[0])
+        sock.close()
+        return time.time() - started
+
+    def _download_sample(self, url):
+        started = time.time()
+        resp = self._get(url, stream=True)
+        try:
+            ttfb = time.time() - started
+            resp.raise_for_status()
+            size = 0
+            started = time.time()
+            for chunk in resp.iter_content(64 * 1024):
+                size += len(chunk)
+                if size >= SAMPLE_SIZE or timeout.remaining(1) == 0:
+                    break
+            return ttfb, size / max(time.time() - started, 1e-6)
+        finally:
+            resp.close()
+
+    def benchmark(self, base_url, suite, section=None):
+        """Measures connect time, TTFB and throughput of a mirror.
+
+        Throughput is estimated by downloading up to SAMPLE_SIZE bytes of
+        the Packages index, or the Release file if there is no index.
+
+        :returns: dict with uri, connect, ttfb and throughput (bytes per
+                  second) keys, error is set if the mirror failed
+        """
+        result = {'uri': base_url, 'connect': None, 'ttfb': None,
+                  'throughput': None, 'error': None}
+        try:
+            with timeout.Deadline(BENCHMARK_DEADLINE):
+                result['connect'] = self._connect_time(base_url)
+                try:
+                    result['ttfb'], result['throughput'] = \
+                        self._download_sample(
+                            sample_url(base_url, suite, section))
+                except requests.exceptions.HTTPError:
+                    result['ttfb'], result['throughput'] = \
+                        self._download_sample(release_url(base_url, suite))
+        except (requests.exceptions.RequestException,
+                socket.error, timeout.TimeoutError) as e:
+            log.error("Benchmark of %s failed: %s", base_url, e)
+            result['error'] = str(e) or e.__class__.__name__
+        return result
+
+    def benchmark_mirrors(self, mirrors):
+        """Benchmarks mirrors one by one, so they don't share bandwidth.
+
+        :param mirrors: list of (base_url, suite, section) tuples
+        :returns: list of measurements, see benchmark()
+        """
+        return [self.benchmark(*mirror) for mirror in mirrors]
+
+    def fetch_packages(self, base_url, suite, component, arch=BOOTSTRAP_ARCH):
+        """Streams Packages index of a repository component.
+
+        The smallest available variant of the index is decompressed on
+        the fly, the file is never kept in memory as a whole.
+
+        :returns: dict returned by parse_packages, None if there is no index
+        """
+        for name, decompressor in packages_indexes():
+            url = '{0}/dists/{1}/{2}/binary-{3}/{4}'.format(
+                base_url.rstrip('/'), suite, component, arch, name)
+            timeout.check()
+            resp = self._get(url, stream=True)
+            with contextlib.closing(resp):
+                if resp.status_code == 404:
+                    continue
+                resp.raise_for_status()
+                return parse_packages(iter_lines(
+                    resp.iter_content(64 * 1024),
+                    decompressor() if decompressor else None))
+        return None
+
+    def scan_packages(self, apt_repos):
+        """Builds package indexes of all components of repositories.
+
+        Indexes are downloaded concurrently within SCAN_DEADLINE.
+
+        :param apt_repos: list of dicts with name, uri, suite, section and
+                          priority keys
+        :returns: list of (repo name, priority, index) tuples and list of
+                  errors
+        """
+        jobs = [(repo, component) for repo in apt_repos
+                for component in (repo['section'] or 'main').split()]
+
+        def fetch(job):
+            repo, component = job
+            try:
+                return self.fetch_packages(repo['uri'], repo['suite'],
+                                           component), None
+            except (requests.exceptions.RequestException,
+                    requests.exceptions.BaseHTTPError,
+                    timeout.TimeoutError, EnvironmentError) + \
+                    DECOMPRESS_ERRORS as e:
+                log.error("Unable to scan %s %s: %s",
+                          repo['name'], component, e)
+                return None, "Unable to read packages of {0}/{1}: {2}" \
+                    .format(repo['name'], component, e)
+
+        with timeout.Deadline(SCAN_DEADLINE):
+            fetched = utils.parallel_map(fetch, jobs,
+                                         max_workers=self.max_hosts)
+        indexes = []
+        errors = []
+        for (repo, component), (index, error) in zip(jobs, fetched):
+            if error:
+                errors.append(error)
+            elif index is None:
+                errors.append("Repository {0} has no packages index for "
+                              "{1}".format(repo['name'], component))
+            else:
+                indexes.append((repo['name'], repo['priority'], index))
+        return indexes, errors
+
+    def _connect_tunnel(self, proxy, url):
+        """Opens a tunnel to the host of url through proxy with CONNECT."""
+        proxy = six.moves.urllib.parse.urlparse(proxy)
+        target = six.moves.urllib.parse.urlparse(url)
+        address = '{0}:{1}'.format(target.hostname, target.port or 443)
+        request = ['CONNECT {0} HTTP/1.1'.format(address),
+                   'Host: {0}'.format(address)]
+        if proxy.username:
+            credentials = base64.b64encode('{0}:{1}'.format(
+                proxy.username, proxy.password or '').encode('utf-8'))
+            request.append('Proxy-Authorization: Basic {0}'.format(
+                credentials.decode('ascii')))
+        sock = socket.create_connection(
+            (proxy.hostname,
+             proxy.port or (443 if proxy.scheme == 'https' else 80)),
+            timeout=self._timeout()[0])
+        try:
+            sock.settimeout(self._timeout()[1])
+            sock.sendall(('\r\n'.join(request) + '\r\n\r\n').encode('ascii'))
+            status = sock.makefile('rb').readline().decode('latin-1')
+        finally:
+            sock.close()
+        parts = status.split(None, 2)
+        if len(parts) < 2 or parts[1] != '200':
+            raise requests.exceptions.ProxyError(
+                "CONNECT {0} failed: {1}".format(address,
+                                                 status.strip() or
+                                                 'no response'))
+
+    def probe(self, url, proxy=None):
+        """Measures latency of url directly or through proxy.
+
+        HTTPS proxies are probed by opening a CONNECT tunnel, plain HTTP
+        ones by requesting url through them.
+
+        :returns: dict with latency in seconds and error
+        """
+        result = {'proxy': proxy, 'url': url, 'latency': None, 'error': None}
+        started = time.time()
+        try:
+            if proxy and url.startswith('https:'):
+                self._connect_tunnel(proxy, url)
+            else:
+                proxies = {'http': proxy, 'https': proxy}
+                with contextlib.closing(self.session.get(
+                        url, stream=True, proxies=proxies,
+                        timeout=self._timeout())) as resp:
+                    if resp.status_code == 407 or resp.status_code >= 500:
+                        raise requests.exceptions.ProxyError(
+                            "{0} {1}".format(resp.status_code, resp.reason))
+            result['latency'] = time.time() - started
+        except (requests.exceptions.RequestException, socket.error,
+                timeout.TimeoutError) as e:
+            log.error("Probe of %s via %s failed: %s",
+                      url, proxy or 'direct connection', e)
+            result['error'] = str(e) or e.__class__.__name__
+        return result
+
+    def probe_proxies(self, urls):
+        """Probes configured proxies and direct access concurrently.
+
+        :param urls: dict mapping scheme to a URL to probe with
+        :returns: dict mapping (scheme, proxy) to probe result, proxy is
+                  None for direct access
+        """
+        probes = []
+        for scheme, url in urls.items():
+            probes.append((scheme, None, url))
+            proxy = (self.proxies or {}).get(scheme)
+            if proxy and not bypass_proxy(url, self.no_proxy):
+                probes.append((scheme, proxy, url))
+        with timeout.Deadline(self.deadline):
+            results = utils.parallel_map(
+                lambda probe: self.probe(probe[2], probe[1]), probes,
+                max_workers=self.max_hosts)
+        return dict(((scheme, proxy), result)
+                    for (scheme, proxy, _), result in zip(probes, results))
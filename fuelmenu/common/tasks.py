@@ -0,0 +1,161 @@
+# Copyright 2016 Mirantis, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import collections
+import logging
+import threading
+import time
+
+import six
+
+from fuelmenu.common import dialog
+from fuelmenu.common import timeout
+
+log = logging.getLogger('fuelmenu.common.tasks')
+
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+TaskResult = collections.namedtuple('TaskResult',
+                                    ['name', 'outcome', 'duration'])
+
+
+def task_name(task):
+    """Returns name of the task: a string or a (bound) function."""
+    if isinstance(task, six.string_types):
+        return task
+    owner = getattr(task, '__self__', None)
+    if owner is not None:
+        return "{0}.{1}".format(owner.__class__.__name__, task.__name__)
+    return task.__name__
+
+
+class TaskPipeline(object):
+    """Apply tasks with explicit dependencies between them.
+
+    A task is a callable returning True on success. It starts as soon as
+    all tasks it requires have succeeded, independent tasks run
+    concurrently on a pool of worker threads. Requirements which are not
+    in the pipeline are considered satisfied.
+
+    Once a task fails no new tasks are started. Succeeded tasks are
+    removed from the pipeline, so the next run retries only the rest.
+
+    Dialogs opened by tasks (e.g. about their failure) are shown by the
+    thread calling run once all tasks finished, in the order the tasks
+    finished.
+    """
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self.tasks = collections.OrderedDict()
+        # TaskResult for every task of the last run
+        self.results = []
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def __contains__(self, task):
+        return task_name(task) in self.tasks
+
+    def __iter__(self):
+        return (func for func, _ in self.tasks.values())
+
+    def add(self, func, name=None, requires=()):
+        """Adds task to the pipeline.
+
+        :param func: callable without arguments returning True on success
+        :param name: task name, generated from func if omitted
+        :param requires: names or functions of tasks which should succeed
+                         before this one starts
+        """
+        name = name or task_name(func)
+        self.tasks[name] = (func, tuple(task_name(r) for r in requires))
+
+    def discard(self, task):
+        """Removes task from the pipeline, tasks requiring it may start."""
+        self.tasks.pop(task_name(task), None)
+
+    def run(self, wait=None, interval=0.2):
+        """Runs all tasks respecting their dependencies.
+
+        :param wait: callable invoked every interval seconds by the calling
+                     thread while tasks are running (e.g. to redraw screen)
+        :param interval: interval in seconds between wait calls
+        :returns: True if all tasks succeeded
+        """
+        self.results = []
+        pending = collections.OrderedDict(self.tasks)
+        running = set()
+        finished = six.moves.queue.Queue()
+        failed = False
+        dialogs = []
+
+        def execute(name, func):
+            start = time.time()
+            with dialog.deferred() as opened:
+                try:
+                    outcome = SUCCEEDED if func() else FAILED
+                except Exception:
+                    log.exception("Apply task %s raised an exception", name)
+                    outcome = FAILED
+            dialogs.extend(opened)
+            finished.put(TaskResult(name, outcome, time.time() - start))
+
+        while pending or running:
+            for name, (func, requires) in list(pending.items()):
+                if failed or len(running) >= self.max_workers:
+                    break
+                if any(r in self.tasks for r in requires):
+                    continue
+                del pending[name]
+                running.add(name)
+                log.info("Starting apply task %s", name)
+                thread = threading.Thread(target=timeout.inherit(execute),
+                                          args=(name, func))
+                thread.daemon = True
+                thread.start()
+
+            if not running:
+                # Nothing can start: either a task failed or requirements
+                # can't be satisfied (e.g. there is a cycle)
+                if not failed:
+                    log.error("Unable to satisfy requirements of apply "
+                              "tasks: %s", ', '.join(pending))
+                    failed = True
+                self.results.extend(TaskResult(name, SKIPPED, 0.0)
+                                    for name in pending)
+                break
+
+            try:
+                result = finished.get(timeout=interval)
+            except six.moves.queue.Empty:
+                if wait:
+                    wait()
+                continue
+
+            running.discard(result.name)
+            self.results.append(result)
+            log.info("Apply task %s %s in %.2fs",
+                     result.name, result.outcome, result.duration)
+            if result.outcome == SUCCEEDED:
+                del self.tasks[result.name]
+            else:
+                failed = True
+
+        dialog.show_deferred(dialogs)
+        if wait:
+            wait()
+        return not failed
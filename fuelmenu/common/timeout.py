@@ -12,15 +12,121 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import signal
+import sys
+import threading
+import time
+
+import six
+
+# How often a thread waiting for a deadline checks for cancellation
+POLL_INTERVAL = 0.1
+
+_local = threading.local()
 
 
 class TimeoutError(Exception):
     pass
 
 
-def handler(signum, frame):
-    raise TimeoutError('Timeout error')
+def _stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+def current():
+    """Returns the innermost deadline of the calling thread or None."""
+    stack = _stack()
+    return stack[-1] if stack else None
+
+
+class Deadline(object):
+    """Time budget which can be cancelled from any thread.
+
+    Use it as a context manager, deadlines entered inside another one
+    nest: the effective budget is the smallest of all enclosing ones and
+    cancelling an outer deadline cancels all nested ones, e.g.
+
+        with Deadline(60):        # whole save
+            with Deadline(5):     # single probe
+                utils.execute(command)
+
+    Long running code should call check() or remaining(), utils.execute
+    kills the command once the deadline expires.
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self.expires = None if timeout is None else time.time() + timeout
+        self.parent = current()
+        self._cancelled = threading.Event()
+
+    def __enter__(self):
+        _stack().append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _stack().pop()
+
+    def _chain(self):
+        deadline = self
+        while deadline is not None:
+            yield deadline
+            deadline = deadline.parent
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def cancelled(self):
+        return any(d._cancelled.is_set() for d in self._chain())
+
+    def remaining(self):
+        """Returns seconds left or None if there is no time limit."""
+        left = [d.expires - time.time() for d in self._chain()
+                if d.expires is not None]
+        if not left:
+            return None
+        return max(0, min(left))
+
+    def expired(self):
+        return self.cancelled() or self.remaining() == 0
+
+    def check(self):
+        """Raises TimeoutError if the deadline expired or was cancelled."""
+        if self.cancelled():
+            raise TimeoutError('Cancelled')
+        if self.remaining() == 0:
+            raise TimeoutError('Timeout error')
+
+
+def remaining(default=None):
+    """Returns seconds left of the current deadline or default."""
+    deadline = current()
+    left = deadline.remaining() if deadline is not None else None
+    return default if left is None else left
+
+
+def check():
+    """Raises TimeoutError if the current deadline expired."""
+    deadline = current()
+    if deadline is not None:
+        deadline.check()
+
+
+def inherit(func):
+    """Wraps func to run under the deadline of the calling thread.
+
+    Deadlines are kept per thread, so functions passed to worker threads
+    should be wrapped to stay within the budget of the code starting them.
+    """
+    deadline = current()
+    if deadline is None:
+        return func
+
+    def wrapper(*args, **kwargs):
+        with deadline:
+            return func(*args, **kwargs)
+    return wrapper
 
 
 def run_with_timeout(func, args=tuple(),
@@ -32,15 +138,37 @@ def run_with_timeout(func, args=tuple(),
     exceeded function raises TimeoutError exception. If user
     pressed Ctrl-C during this function, it raises
     KeyboardInterrupt.
+
+    The function runs in a separate thread under a Deadline, so this
+    works from any thread and may be nested. On timeout the deadline
+    is cancelled, which kills commands started by the function.
     """
     kwargs = kwargs or dict()
     if not timeout:
         return func(*args, **kwargs)
 
-    signal.signal(signal.SIGALRM, handler)
-    signal.setitimer(signal.ITIMER_REAL, timeout)
+    deadline = Deadline(timeout)
+    result = []
+    failure = []
+
+    def target():
+        try:
+            with deadline:
+                result.append(func(*args, **kwargs))
+        except BaseException:
+            failure.append(sys.exc_info())
+
+    thread = threading.Thread(target=target)
+    thread.daemon = True
+    thread.start()
     try:
-        result = func(*args, **kwargs)
-        return result
-    finally:
-        signal.alarm(0)
+        while thread.is_alive():
+            deadline.check()
+            thread.join(min(POLL_INTERVAL, deadline.remaining()))
+    except BaseException:
+        deadline.cancel()
+        raise
+
+    if failure:
+        six.reraise(*failure[0])
+    return result[0]
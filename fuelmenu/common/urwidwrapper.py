@@ -92,63 +92,210 @@ def SimpleListWalker(contents):
     return urwid.SimpleListWalker(contents)
 
 
+def focused_widget(widget):
+    """Returns the innermost widget in focus inside widget."""
+    while widget is not None and not isinstance(widget, TextWithTip):
+        if isinstance(widget, urwid.WidgetDecoration):
+            widget = widget.original_widget
+        elif isinstance(widget, urwid.WidgetWrap):
+            widget = widget._w
+        elif isinstance(widget, urwid.Widget) and hasattr(widget, 'focus'):
+            widget = widget.focus
+        else:
+            break
+    return widget
+
+
+def show_tooltip(widget):
+    """Shows tooltip of the field in focus inside widget.
+
+    Called when focus moves, the toolbar is left intact if it already
+    shows the tooltip.
+    """
+    field = focused_widget(widget)
+    if not isinstance(field, TextWithTip) or field.toolbar is None:
+        return
+    if field.toolbar.get_text()[0] != field.tip:
+        field.toolbar.set_text(field.tip)
+
+
 class WalkerStoredListBox(urwid.ListBox):
     def __init__(self, list_walker):
         super(WalkerStoredListBox, self).__init__(list_walker)
 
         self.list_walker = list_walker
 
+    def keypress(self, size, key):
+        position = self.focus_position if self.list_walker else None
+        key = super(WalkerStoredListBox, self).keypress(size, key)
+        if self.list_walker and position != self.focus_position:
+            show_tooltip(self)
+        return key
 
-class TabbedGridFlow(urwid.GridFlow):
 
-    def __init__(self, cells, cell_width, h_sep, v_sep, align):
-        urwid.GridFlow.__init__(self, cells=cells, cell_width=cell_width,
-                                h_sep=h_sep, v_sep=v_sep, align=align)
+class LazyListWalker(urwid.ListWalker):
+    """List walker creating widgets only when they are walked to.
 
-    def keypress(self, size, key):
-        if key == 'tab' and self.focus_position < (len(self.contents) - 1)\
-                and self.contents[self.focus_position + 1][0].selectable():
-            self.tab_next(self.focus_position)
-        elif key == 'shift tab' and self.focus_position > 0 \
-                and self.contents[self.focus_position - 1][0].selectable():
-            self.tab_prev(self.focus_position)
-        else:
-            return self.__super.keypress(size, key)
+    Items of contents are either widgets or data passed to factory to get
+    a widget. Created widgets are cached, so user input isn't lost when
+    they are scrolled out of view.
+    """
 
-    def tab_next(self, pos):
-        self.set_focus(pos + 1)
-        maxlen = (len(self.contents) - 1)
-        while pos < maxlen:
-            if self.contents[pos][0].selectable():
-                return
-            else:
-                pos += 1
+    def __init__(self, contents, factory):
+        self.contents = list(contents)
+        self.factory = factory
+        self.focus = 0
+        self._widgets = {}
+
+    def __len__(self):
+        return len(self.contents)
+
+    def __getitem__(self, pos):
+        if pos < 0:
+            pos += len(self.contents)
+        if not 0 <= pos < len(self.contents):
+            raise IndexError(pos)
+        return self._widget(pos)
+
+    def _widget(self, pos):
+        item = self.contents[pos]
+        if isinstance(item, urwid.Widget):
+            return item
+        if pos not in self._widgets:
+            self._widgets[pos] = self.factory(item)
+        return self._widgets[pos]
+
+    def cached(self, pos):
+        """Returns widget at pos or None if it wasn't created yet."""
+        item = self.contents[pos]
+        if isinstance(item, urwid.Widget):
+            return item
+        return self._widgets.get(pos)
+
+    def append(self, item):
+        self.extend([item])
+
+    def extend(self, items):
+        self.contents.extend(items)
+        self._modified()
 
-        if pos >= maxlen:
-            pos = 0
-        self.set_focus(pos)
+    def get_focus(self):
+        if self.contents:
+            return self._widget(self.focus), self.focus
+        return None, None
 
-    def tab_prev(self, pos):
-        self.set_focus(pos - 1)
-        while pos > 0:
-            if self.contents[pos][0].selectable():
+    def set_focus(self, focus):
+        self.focus = focus
+        self._modified()
+
+    def get_next(self, pos):
+        if (pos + 1) >= len(self.contents):
+            return None, None
+        return self._widget(pos + 1), pos + 1
+
+    def get_prev(self, pos):
+        if (pos - 1) < 0:
+            return None, None
+        return self._widget(pos - 1), pos - 1
+
+
+class SelectableIndex(object):
+    """Positions of selectable widgets of a container.
+
+    For every position keeps the nearest selectable positions after and
+    before it (wrapping around), so moving focus with Tab doesn't scan the
+    widgets. Containers drop the index when their contents change, it is
+    rebuilt on the next lookup.
+    """
+
+    def __init__(self, widgets):
+        size = len(widgets)
+        selectable = [pos for pos, item in enumerate(widgets)
+                      if item.selectable()]
+        self.first = selectable[0] if selectable else None
+        self.last = selectable[-1] if selectable else None
+        self.next = [None] * size
+        self.prev = [None] * size
+
+        following = self.first
+        for pos in reversed(range(size)):
+            self.next[pos] = following
+            if selectable and widgets[pos].selectable():
+                following = pos
+        preceding = self.last
+        for pos in range(size):
+            self.prev[pos] = preceding
+            if selectable and widgets[pos].selectable():
+                preceding = pos
+
+
+class TabbedContainer(object):
+    """Tab and Shift-Tab move focus inside urwid container.
+
+    Keys are passed on when focus would wrap around, so the enclosing
+    TabbedListWalker moves to the next or previous row.
+    """
+
+    _tab_index = None
+
+    def _track_contents(self):
+        self.contents.set_modified_callback(self._tab_contents_modified)
+
+    def _tab_contents_modified(self):
+        self._tab_index = None
+        self._invalidate()
+
+    @property
+    def tab_index(self):
+        if self._tab_index is None:
+            self._tab_index = SelectableIndex(
+                [item for item, _ in self.contents])
+        return self._tab_index
+
+    def keypress(self, size, key):
+        position = self.focus_position if self.contents else None
+        key = self._tab_keypress(size, key)
+        # Focus may move between cells of a row, e.g. with Left and Right
+        if self.contents and position != self.focus_position:
+            show_tooltip(self)
+        return key
+
+    def _tab_keypress(self, size, key):
+        if key == 'tab' and self.contents:
+            pos = self.tab_index.next[self.focus_position]
+            if pos is not None and pos > self.focus_position:
+                self.tab_next(self.focus_position)
                 return
-            else:
-                pos -= 1
-        if pos == 0:
-            pos = (len(self.contents) - 1)
+        elif key == 'shift tab' and self.contents:
+            pos = self.tab_index.prev[self.focus_position]
+            if pos is not None and pos < self.focus_position:
+                self.tab_prev(self.focus_position)
+                return
+        return super(TabbedContainer, self).keypress(size, key)
+
+    def tab_next(self, pos):
+        pos = self.tab_index.next[pos]
+        self.set_focus(0 if pos is None else pos)
 
-        self.set_focus(pos)
+    def tab_prev(self, pos):
+        pos = self.tab_index.prev[pos]
+        self.set_focus(len(self.contents) - 1 if pos is None else pos)
 
     def first_selectable(self):
         '''returns index of first selectable widget in contents.'''
-        for pos, item in enumerate(self.contents):
-            if item[0].selectable():
-                return pos
-        return (len(self.contents) - 1)
+        first = self.tab_index.first
+        return len(self.contents) - 1 if first is None else first
 
 
-class TabbedColumns(urwid.Columns):
+class TabbedGridFlow(TabbedContainer, urwid.GridFlow):
+
+    def __init__(self, cells, cell_width, h_sep, v_sep, align):
+        urwid.GridFlow.__init__(self, cells=cells, cell_width=cell_width,
+                                h_sep=h_sep, v_sep=v_sep, align=align)
+        self._track_contents()
+
+
+class TabbedColumns(TabbedContainer, urwid.Columns):
 
     def __init__(self, widget_list, dividechars=0, focus_column=None,
                  min_width=1, box_columns=None):
@@ -157,48 +304,7 @@ class TabbedColumns(urwid.Columns):
                                focus_column=focus_column,
                                min_width=min_width,
                                box_columns=box_columns)
-
-    def keypress(self, size, key):
-        if key == 'tab' and self.focus_position < (len(self.contents) - 1)\
-                and self.widget_list[self.focus_position + 1].selectable():
-            self.tab_next(self.focus_position)
-        elif key == 'shift tab' and self.focus_position > 0 \
-                and self.widget_list[self.focus_position - 1].selectable():
-            self.tab_prev(self.focus_position)
-        else:
-            return self.__super.keypress(size, key)
-
-    def tab_next(self, pos):
-        self.set_focus(pos + 1)
-        maxlen = (len(self.contents) - 1)
-        while pos < maxlen:
-            if self.widget_list[pos].selectable():
-                return
-            else:
-                pos += 1
-
-        if pos >= maxlen:
-            pos = 0
-        self.set_focus(pos)
-
-    def tab_prev(self, pos):
-        self.set_focus(pos - 1)
-        while pos > 0:
-            if self.widget_list[pos].selectable():
-                return
-            else:
-                pos -= 1
-        if pos == 0:
-            pos = (len(self.widget_list) - 1)
-
-        self.set_focus(pos)
-
-    def first_selectable(self):
-        '''returns index of first selectable widget in widget_list.'''
-        for pos, item in enumerate(self.widget_list):
-            if item.selectable():
-                return pos
-        return (len(self.widget_list) - 1)
+        self._track_contents()
 
 
 class TextWithTip(urwid.Edit):
@@ -206,35 +312,38 @@ class TextWithTip(urwid.Edit):
                  mask=None, wrap='space'):
         urwid.Edit.__init__(self, caption=label, edit_text=default_value,
                             mask=mask, wrap=wrap)
+        # Shown in toolbar by show_tooltip when the field gets focus
         self.tip = tooltip
         self.toolbar = toolbar
 
-    def render(self, size, focus=False):
-        if focus:
-            self.toolbar.set_text(self.tip)
-        canv = super(TextWithTip, self).render(size, focus)
-        return canv
-
 
 class TabbedListWalker(urwid.ListWalker):
     def __init__(self, lst):
         self.lst = lst
         self.focus = 0
+        # Rebuilt after insert and remove
+        self._tab_index = None
 
     def _modified(self):
         return urwid.ListWalker._modified(self)
 
+    def _focus_changed(self):
+        if self.lst:
+            show_tooltip(self.lst[self.focus])
+
+    @property
+    def tab_index(self):
+        if self._tab_index is None:
+            self._tab_index = SelectableIndex(self.lst)
+        return self._tab_index
+
     def tab_next(self):
-        item, pos = self.get_next(self.focus)
-        while pos is not None:
-            if item.selectable():
-                break
-            else:
-                item, pos = self.get_next(pos)
-        if pos is None:
-            pos = 0
-        self.focus = pos
+        if not self.lst:
+            return
+        pos = self.tab_index.next[self.focus]
+        self.focus = 0 if pos is None else pos
         self._modified()
+        item = self.lst[self.focus]
         try:
             # Reset focus to first selectable widget in item
             if hasattr(item, 'original_widget'):
@@ -246,20 +355,15 @@ class TabbedListWalker(urwid.ListWalker):
             # Ignore failure. Case only applies to TabbedColumns and
             # TabbedGridFlow. Other items should fail silently.
             pass
+        self._focus_changed()
 
     def tab_prev(self):
-        item, pos = self.get_prev(self.focus)
-        while pos is not None:
-            if item.selectable():
-                break
-            else:
-                item, pos = self.get_prev(pos)
-
-        if pos is None:
-            pos = (len(self.lst) - 1)
-
-        self.focus = pos
+        if not self.lst:
+            return
+        pos = self.tab_index.prev[self.focus]
+        self.focus = len(self.lst) - 1 if pos is None else pos
         self._modified()
+        item = self.lst[self.focus]
         try:
             if hasattr(item, 'original_widget'):
                 item.original_widget.set_focus(
@@ -270,6 +374,29 @@ class TabbedListWalker(urwid.ListWalker):
             # Ignore failure. Case only applies to TabbedColumns and
             # TabbedGridFlow. Other items should fail silently.
             pass
+        self._focus_changed()
+
+    def insert(self, pos, widgets):
+        """Inserts widgets before pos keeping focus on the same widget."""
+        self.lst[pos:pos] = widgets
+        if self.focus >= pos and self.lst:
+            self.focus += len(widgets)
+        self._tab_index = None
+        self._modified()
+
+    def remove(self, pos, count):
+        """Removes count widgets starting from pos.
+
+        Focus moves to the widget before removed ones if it was on one of
+        them.
+        """
+        del self.lst[pos:pos + count]
+        if self.focus >= pos + count:
+            self.focus -= count
+        elif self.focus >= pos:
+            self.focus = max(pos - 1, 0)
+        self._tab_index = None
+        self._modified()
 
     def get_focus(self):
         if self.lst:
@@ -278,7 +405,10 @@ class TabbedListWalker(urwid.ListWalker):
             return None, None
 
     def set_focus(self, focus):
+        changed = focus != self.focus
         self.focus = focus
+        if changed:
+            self._focus_changed()
 
     def get_next(self, pos):
         if (pos + 1) >= len(self.lst):
@@ -13,19 +13,28 @@
 # under the License.
 from __future__ import print_function
 import fcntl
+import json
 import logging
 import os
 import random as _random
+import signal
 import string
 import subprocess
 import sys
+import threading
 
+import six
+
+from fuelmenu.common import timeout
 from fuelmenu import consts
 
 
 log = logging.getLogger('fuelmenu.common.utils')
 random = _random.SystemRandom()
 
+# Seconds a command has to exit after SIGTERM before it gets SIGKILL
+KILL_GRACE_PERIOD = 3
+
 
 def get_deployment_mode():
     """Report post deployment if keys directory exists."""
@@ -61,28 +70,130 @@ def get_fuel_version(versionfile=consts.RELEASE_FILE):
         return ""
 
 
-def execute(command, stdin=None, shell=False):
+def execute(command, stdin=None, shell=False, progress=None, interval=1):
     """Executes commands
 
     :param command: A list of shell lexemes
     :param shell: Specify shell parameter for subprocess.Popen (optional)
     :param stdin: String input for stdin (optional)
+    :param progress: callable invoked every interval seconds while
+                     the command is running (optional)
+    :param interval: interval in seconds between progress calls
 
     :returns: Tuple of (return_code, stdout, stderr)
+    :raises: timeout.TimeoutError if the current deadline expires, the
+             command and its children are killed in this case
     """
 
     log.debug('Executing command: {0}'.format(' '.join(command)))
+    deadline = timeout.current()
+    popen_kwargs = {}
+    if deadline is not None:
+        # Own process group, so that children are killed as well
+        popen_kwargs['preexec_fn'] = os.setsid
     proc = subprocess.Popen(command,
                             stdin=subprocess.PIPE,
                             stdout=subprocess.PIPE,
                             stderr=subprocess.PIPE,
-                            shell=shell)
-    out, err = proc.communicate(input=stdin)
+                            shell=shell,
+                            **popen_kwargs)
+    if progress is None and deadline is None:
+        out, err = proc.communicate(input=stdin)
+    else:
+        output = []
+        reader = threading.Thread(
+            target=lambda: output.extend(proc.communicate(input=stdin)))
+        reader.daemon = True
+        reader.start()
+        while reader.is_alive():
+            if deadline is not None and deadline.expired():
+                _kill_process_group(proc, reader)
+                deadline.check()
+            reader.join(min(interval, timeout.remaining(interval)))
+            if progress is not None and reader.is_alive():
+                progress()
+        if progress is not None:
+            # Final report, also for commands finished before the first one
+            progress()
+        out, err = output or (None, None)
     code = proc.poll()
     log.debug('Command executed with exit code: {0}'.format(str(code)))
     return code, out, err
 
 
+def _kill_process_group(proc, reader):
+    log.warning('Killing command with pid %s, deadline expired', proc.pid)
+    for signum in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(proc.pid, signum)
+        except OSError:
+            return
+        reader.join(KILL_GRACE_PERIOD)
+        if not reader.is_alive():
+            return
+
+
+def parallel_map(func, items, max_workers=8):
+    """Calls func for every item using a bounded pool of threads
+
+    :param func: callable which takes a single item
+    :param items: iterable of items
+    :param max_workers: maximum number of concurrently running calls
+
+    :returns: list of results in the same order as items
+    :raises: the first exception raised by func, once all calls finished
+    """
+    items = list(items)
+    results = [None] * len(items)
+    failures = []
+    pending = six.moves.queue.Queue()
+    for index, item in enumerate(items):
+        pending.put((index, item))
+
+    def worker():
+        while True:
+            try:
+                index, item = pending.get_nowait()
+            except six.moves.queue.Empty:
+                return
+            try:
+                results[index] = func(item)
+            except Exception:
+                failures.append(sys.exc_info())
+
+    threads = [threading.Thread(target=timeout.inherit(worker))
+               for _ in range(min(max_workers, len(items)))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if failures:
+        six.reraise(*failures[0])
+    return results
+
+
+def write_json(path, data):
+    """Writes data as JSON to path atomically.
+
+    Data goes to a temporary file which replaces path once it is on disk,
+    so readers see either the old or the new content. Missing directories
+    are created.
+
+    :raises: IOError or OSError if the file can't be written
+    """
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as tmp_file:
+        json.dump(data, tmp_file)
+        tmp_file.flush()
+        os.fsync(tmp_file.fileno())
+    os.rename(tmp_path, path)
+
+
 def gensalt():
     """Generate SHA-512 salt for crypt.crypt function."""
     letters = string.ascii_letters + string.digits + './'
@@ -20,12 +20,19 @@ PUPPET_LOGFILE = "/var/log/puppet/fuelmenu-puppet.log"
 PUPPET_NAILGUN = "/etc/puppet/modules/fuel/examples/nailgun.pp"
 PUPPET_FUEL_MASTER = "/etc/puppet/modules/fuel/examples/host.pp"
 PUPPET_DHCP_RANGES = "/etc/puppet/modules/fuel/examples/dhcp-ranges.pp"
+# Order in which manifests requested by modules are applied. Nailgun goes
+# first since follow-up apply tasks talk to its API.
+PUPPET_MANIFESTS = (PUPPET_NAILGUN, PUPPET_FUEL_MASTER, PUPPET_DHCP_RANGES)
 
 SETTINGS_FILE = "/etc/fuel/astute.yaml"
 RELEASE_FILE = "/etc/fuel_release"
 HIERA_NET_SETTINGS = "/etc/hiera/networks.yaml"
+RESOLV_CONF = "/etc/resolv.conf"
 
 DEFAULT_LOCK_FILE = "/var/run/fuelmenu.lock"
+REPO_CACHE_FILE = "/var/cache/fuelmenu/repos.json"
+SAVE_JOURNAL_FILE = "/var/lib/fuelmenu/save-journal.json"
+BOOTSTRAP_CLI_CONFIG = "/etc/fuel-bootstrap-cli/fuel_bootstrap_cli.yaml"
 
 PRE_DEPLOYMENT_MODE = "pre"
 POST_DEPLOYMENT_MODE = "post"
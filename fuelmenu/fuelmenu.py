@@ -15,6 +15,7 @@
 
 from __future__ import absolute_import
 
+import collections
 from fuelmenu import consts
 import logging
 
@@ -23,8 +24,14 @@ logging.basicConfig(filename=consts.LOGFILE,
                     format="%(asctime)s %(levelname)s %(message)s",
                     level=logging.DEBUG)
 
+from fuelmenu.common import checkcache
 from fuelmenu.common import dialog
+from fuelmenu.common import journal
 from fuelmenu.common import network
+from fuelmenu.common import probes
+from fuelmenu.common import puppet
+from fuelmenu.common import redraw
+from fuelmenu.common import tasks
 from fuelmenu.common import timeout
 from fuelmenu.common import urwidwrapper as widget
 from fuelmenu.common import utils
@@ -36,6 +43,8 @@ import optparse
 import os
 import signal
 import sys
+import threading
+import time
 import urwid
 import urwid.raw_display
 import urwid.web_display
@@ -43,6 +52,13 @@ import urwid.web_display
 log = logging.getLogger('fuelmenu.loader')
 
 
+class LogFooter(object):
+    """Footer of save-only mode, status messages are only logged."""
+
+    def set_text(self, text):
+        log.debug("Status: %s", text)
+
+
 class FuelSetup(object):
 
     def __init__(self, save_only=False, managed_iface=None):
@@ -55,7 +71,31 @@ class FuelSetup(object):
         # Set to true to move all settings to end
         self.globalsave = True
         # Tasks to be executed on Apply
-        self.apply_tasks = set()
+        self.apply_tasks = tasks.TaskPipeline()
+        # Puppet manifests and classes requested by modules
+        self.puppet_scheduler = puppet.ApplyScheduler()
+        # Results of successful checks of modules
+        self.check_cache = checkcache.CheckCache(notify=self.set_footer)
+        # Checks of external servers are skipped if the gateway is down
+        self.gateway_check = network.GatewayCheck(warn=self.network_warning)
+        # Network probes of checks, the Check button runs them in background
+        self.probes = probes.ProbeRunner(report=self.probe_report,
+                                         flush=self.flushScreen)
+        # Results of background probes waiting to be shown by the UI thread
+        self.probe_reports = collections.deque()
+        # Pipe waking up the main loop to show them
+        self.probe_pipe = None
+        # Steps completed by a failed save, the next one resumes from it.
+        # Save-only mode applies nothing, so it has nothing to resume.
+        self.save_journal = None if save_only else \
+            journal.SaveJournal(consts.SAVE_JOURNAL_FILE)
+        # Apply tasks run in worker threads, only this one may draw
+        self.ui_thread = threading.current_thread()
+        # Menu items by module name and the highlighted one
+        self.menu_buttons = {}
+        self.menu_selected = None
+        # Coalesces refreshScreen calls, set up with the main loop
+        self.redraw = None
         self.version = utils.get_fuel_version()
         self.codename = 'xenial'
 
@@ -75,7 +115,10 @@ class FuelSetup(object):
             consts.SETTINGS_FILE,
             template_kwargs=template_kwargs)
 
-        self.main()
+        if self.save_only:
+            self._save_only()
+        else:
+            self.main()
         self.choices = []
 
     def menu(self, title, choices):
@@ -83,42 +126,31 @@ class FuelSetup(object):
         for c in choices:
             button = urwid.Button(c)
             urwid.connect_signal(button, 'click', self.menu_chosen, c)
-            body.append(urwid.AttrMap(button, None, focus_map='reversed'))
+            item = urwid.AttrMap(button, None, focus_map='reversed')
+            self.menu_buttons[c] = item
+            body.append(item)
         return urwid.ListBox(urwid.SimpleListWalker(body))
         # return urwid.ListBox(urwid.SimpleFocusListWalker(body))
 
     def menu_chosen(self, button, choice):
-        size = self.screen.get_cols_rows()
-        self.screen.draw_screen(size, self.frame.render(size))
-        for item in self.menuitems.body.contents:
-            try:
-                if isinstance(item.base_widget, urwid.Button):
-                    if item.base_widget.get_label() == choice:
-                        item.set_attr_map({None: 'header'})
-                    else:
-                        item.set_attr_map({None: None})
-            except AttributeError:
-                log.exception("Unable to set menu item %s" % item)
+        # Only the previously and newly chosen items change
+        if self.menu_selected in self.menu_buttons:
+            self.menu_buttons[self.menu_selected].set_attr_map({None: None})
+        self.menu_buttons[choice].set_attr_map({None: 'header'})
+        self.menu_selected = choice
         self.setChildScreen(name=choice)
 
     def draw_child_screen(self, child_screen, focus_on_child=False):
+        # The layout is built once in main, only the child is swapped
+        shown = self.childfill.body is child_screen
         self.childpage = child_screen
-        self.childfill = urwid.Filler(self.childpage, 'top', 40)
-        self.childbox = urwid.BoxAdapter(self.childfill, 40)
-        self.cols = urwid.Columns(
-            [
-                ('fixed', 20, urwid.Pile([
-                    urwid.AttrMap(self.menubox, 'body'),
-                    urwid.Divider(" ")])),
-                ('weight', 3, urwid.Pile([
-                    urwid.Divider(" "),
-                    self.childbox,
-                    urwid.Divider(" ")]))
-            ], 1)
+        self.childfill.body = child_screen
         if focus_on_child:
             self.cols.focus_position = 1  # focus on childbox
-        self.child.refresh()
-        self.listwalker[:] = [self.cols]
+        if not shown:
+            self.child.refresh()
+            # Tooltips are shown on focus changes, the first one here
+            widget.show_tooltip(child_screen)
 
     def setChildScreen(self, name=None):
         if name is None:
@@ -129,9 +161,81 @@ class FuelSetup(object):
             self.child.screen = self.child.screenUI()
         self.draw_child_screen(self.child.screen)
 
-    def refreshScreen(self):
+    def set_footer(self, msg):
+        """Shows msg in the footer, may be called from any thread.
+
+        Frequent messages (e.g. progress of puppet) are drawn at most once
+        per frame interval.
+        """
+        self.footer.set_text(msg)
+        if self._can_draw():
+            self.redraw.request()
+
+    def network_warning(self, msg):
+        """Shows warning shared by checks of several modules.
+
+        Background probes call it from their thread, the warning is passed
+        to the UI thread then.
+        """
+        log.warning(msg)
         if self.save_only:
             return
+        if threading.current_thread() == self.ui_thread or \
+                dialog.deferring():
+            dialog.display_dialog(self.child, widget.TextLabel(msg),
+                                  "Network Warning")
+        else:
+            self._queue_report("Network Warning", msg)
+
+    def probe_report(self, name, problems):
+        """Queues result of background probes, called from their thread."""
+        if not problems:
+            self._queue_report(None, "Network checks of %s passed." % name)
+            return
+        msg = "Network checks of {0} found problems:\n\n{1}".format(
+            name, "\n".join(problems))
+        log.warning(msg)
+        self._queue_report("Network Check Warnings", msg)
+
+    def _queue_report(self, title, msg):
+        # Shown as dialog with the title, in the footer without it
+        self.probe_reports.append((title, msg))
+        if self.probe_pipe is not None:
+            os.write(self.probe_pipe, b"\n")
+
+    def _show_probe_reports(self, data):
+        while self.probe_reports:
+            title, msg = self.probe_reports.popleft()
+            if title is None:
+                self.set_footer(msg)
+            else:
+                dialog.display_dialog(self.child, widget.TextLabel(msg),
+                                      title)
+        self.refreshScreen()
+        # Keep the pipe open
+        return True
+
+    def refreshScreen(self):
+        """Requests redraw of the screen, frequent requests are coalesced."""
+        if self._can_draw():
+            self.redraw.request()
+
+    def flushScreen(self):
+        """Draws requested changes at once, called before blocking work.
+
+        Redraws coalesced by refreshScreen and messages queued by other
+        threads are shown only when the main loop runs again otherwise.
+        """
+        if self._can_draw() and (self.footer.queued or
+                                 self.redraw.pending()):
+            self.redraw.render()
+
+    def _can_draw(self):
+        return (not self.save_only and self.redraw is not None and
+                threading.current_thread() == self.ui_thread)
+
+    def _draw(self):
+        self.footer.show_queued()
         size = self.screen.get_cols_rows()
         self.screen.draw_screen(size, self.frame.render(size))
 
@@ -144,17 +248,9 @@ class FuelSetup(object):
 
         # Top and bottom lines of frame
         self.header = urwid.AttrWrap(urwid.Text(text_header), 'header')
-        self.footer = urwid.AttrWrap(urwid.Text(text_footer), 'footer')
-
-        self.children = []
-        for clsobj in modules.__all__:
-            modobj = clsobj(self)
-            self.children.append(modobj)
+        self.footer = redraw.Footer(text_footer)
 
-        self.choices = [m.name for m in self.children]
-
-        if len(self.children) == 0:
-            sys.exit(1)
+        self._load_modules()
 
         # Build list of choices excluding visible
         self.visiblechoices = []
@@ -168,8 +264,8 @@ class FuelSetup(object):
 
         self.child = self.children[0]
         self.childpage = self.child.screenUI()
-        self.childfill = urwid.Filler(self.childpage, 'top', 22)
-        self.childbox = urwid.BoxAdapter(self.childfill, 22)
+        self.childfill = urwid.Filler(self.childpage, 'top', 40)
+        self.childbox = urwid.BoxAdapter(self.childfill, 40)
         self.cols = urwid.Columns(
             [
                 ('fixed', 20, urwid.Pile([
@@ -220,6 +316,8 @@ class FuelSetup(object):
 
         self.mainloop = urwid.MainLoop(self.frame, palette, self.screen,
                                        unhandled_input=unhandled)
+        self.redraw = redraw.RedrawScheduler(self.mainloop, self._draw)
+        self.probe_pipe = self.mainloop.watch_pipe(self._show_probe_reports)
         # Initialize each module completely before any events are handled
         for child in reversed(self.children):
             self.setChildScreen(name=child.name)
@@ -229,8 +327,18 @@ class FuelSetup(object):
 
         dialog.display_dialog(self.child, widget.TextLabel(msg), "WARNING!")
 
-        run_delegate = self._save_only if self.save_only else self.mainloop.run
-        run_delegate()
+        self.mainloop.run()
+
+    def _load_modules(self):
+        self.children = []
+        for clsobj in modules.__all__:
+            modobj = clsobj(self)
+            self.children.append(modobj)
+
+        self.choices = [m.name for m in self.children]
+
+        if len(self.children) == 0:
+            sys.exit(1)
 
     def exit(self, button):
         try:
@@ -262,7 +370,31 @@ class FuelSetup(object):
             log.exception("Save failed for unknown reason:")
         self.exit(None)
 
-    def global_save(self):
+    def global_save(self, quick=False):
+        """Checks and saves all modules.
+
+        :param quick: skip network probes, only local checks are run
+        """
+        if self.probes.running:
+            self.footer.set_text("Waiting for network checks to finish...")
+            self.refreshScreen()
+            self.flushScreen()
+            self.probes.wait_all()
+        self.probes.quick = quick
+        try:
+            return self._global_save()
+        finally:
+            self.probes.quick = False
+
+    def _global_save(self):
+        # Checks of visible modules may take long (e.g. DHCP scan or
+        # probing of repositories), run them concurrently first
+        validated = self._validate_modules()
+        state = self._system_state()
+        # Inputs of a module chain responses of all modules before it, so
+        # only the unchanged beginning of a failed save is skipped
+        inputs = journal.digest([])
+
         # Runs save function for every module
         for module, modulename in zip(self.children, self.choices):
             # Run invisible modules. They may not have screen methods
@@ -279,8 +411,31 @@ class FuelSetup(object):
                     self.footer.set_text("Checking and applying module: %s"
                                          % modulename)
                     self.refreshScreen()
-                    module.refresh()
-                    if self._save_module(module):
+                    if module in validated and \
+                            self._system_state() != state:
+                        # Applied module changed the host (e.g. network
+                        # interfaces), check the rest again as before
+                        log.info("System state changed, discarding "
+                                 "results of concurrent checks")
+                        validated.clear()
+                    if module not in validated:
+                        inputs = None
+                        module.refresh()
+                        saved = self._save_module(module)
+                    else:
+                        responses, dialogs = validated[module]
+                        # Results of the check are shown when the save
+                        # reaches the module, as if it was checked now
+                        dialog.show_deferred(dialogs)
+                        self.refreshScreen()
+                        if inputs is not None:
+                            inputs = journal.digest(
+                                [inputs, modulename, responses])
+                        saved = self._resume_module(module, modulename,
+                                                    responses, inputs) or \
+                            self._apply_module(module, modulename,
+                                               responses, inputs)
+                    if saved:
                         log.info("Saving module: %s" % modulename)
                     else:
                         return False, modulename
@@ -289,21 +444,126 @@ class FuelSetup(object):
                               % (modulename, e))
 
         self.settings.write(outfn=consts.SETTINGS_FILE)
+        written = journal.digest(self.settings)
+
+        # Puppet runs requested by modules go first, one after another
+        previous = ()
+        for name, job in self.puppet_scheduler.jobs(
+                progress=self.set_footer):
+            self.apply_tasks.add(job, name=name, requires=previous)
+            previous = (name,)
+
+        if self.save_journal is not None:
+            # Tasks completed for the same settings are not run again
+            for name in list(self.apply_tasks.tasks):
+                if self.save_journal.completed("apply:" + name, written):
+                    log.info("Apply task %s completed by the previous "
+                             "save, skipping it", name)
+                    self.apply_tasks.discard(name)
+                    self.puppet_scheduler.discard(name)
 
         # Runs tasks for every module, stop on error
-        for apply_task in self.apply_tasks:
-            if not apply_task():
+        if self.apply_tasks:
+            self.footer.set_text("Applying changes...")
+            self.refreshScreen()
+            succeeded = self.apply_tasks.run(wait=self.flushScreen)
+            if self.save_journal is not None:
+                for result in self.apply_tasks.results:
+                    if result.outcome == tasks.SUCCEEDED:
+                        self.save_journal.record("apply:" + result.name,
+                                                 written)
+            if not succeeded:
                 return False, None
 
+        if self.save_journal is not None:
+            self.save_journal.clear()
         return True, None
 
-    def _save_module(self, module):
-        if self.save_only:
-            if hasattr(module, 'check') and hasattr(module, 'save'):
-                resp = module.check(None)
-                module.save(resp)
+    def _resume_module(self, module, modulename, responses, inputs):
+        """Saves settings of a module applied by the previous save.
+
+        :returns: True if settings are saved, False if the module has to
+                  be applied again
+        """
+        step = "save:" + modulename
+        if self.save_journal is None or inputs is None or \
+                not self.save_journal.completed(step, inputs):
+            return False
+        # Tasks the module requested must have completed as well
+        if not all("apply:" + name in self.save_journal
+                   for name in self.save_journal.details(step)["tasks"]):
+            return False
+        log.info("Module %s was applied by the previous save, saving "
+                 "its settings only", modulename)
+        module.save(responses)
+        return True
+
+    def _apply_module(self, module, modulename, responses, inputs):
+        # Applies checked module, recording tasks it requested
+        scheduled = self._scheduled()
+        saved = module.apply(None, responses=responses)
+        if saved and inputs is not None and self.save_journal is not None:
+            self.save_journal.record(
+                "save:" + modulename, inputs,
+                tasks=sorted(self._scheduled() - scheduled))
+        return saved
+
+    def _scheduled(self):
+        # Names of apply tasks and puppet jobs requested by modules
+        names = set(self.apply_tasks.tasks)
+        names.update(name for name, _ in self.puppet_scheduler.jobs())
+        return names
+
+    def _validate_modules(self):
+        """Runs checks of visible modules concurrently.
+
+        :returns: dict with (responses, dialogs) of every checked module,
+                  dialogs are collected to be shown by the UI thread.
+                  Modules missing in it are checked while being saved.
+        """
+        results = {}
+        pipeline = tasks.TaskPipeline()
+        for module, modulename in zip(self.children, self.choices):
+            if not module.visible or not hasattr(module, 'check'):
+                continue
+            try:
+                module.refresh()
+            except AttributeError as e:
+                log.debug("Module %s can't be checked in advance: %s"
+                          % (modulename, e))
+                continue
+            pipeline.add(self._check_task(module, results), name=modulename)
+
+        if pipeline:
+            self.footer.set_text("Checking modules...")
+            self.refreshScreen()
+            started = time.time()
+            pipeline.run(wait=self.flushScreen)
+            log.info("Checked %d modules in %.2fs", len(results),
+                     time.time() - started)
+        return results
+
+    @staticmethod
+    def _check_task(module, results):
+        def check():
+            with dialog.deferred() as dialogs:
+                responses = module.check(None)
+            results[module] = (responses, dialogs)
+            # Failed check is reported by the save phase in module order
             return True
+        return check
 
+    def _system_state(self):
+        # Host configuration the checks of modules depend on
+        try:
+            with open(consts.RESOLV_CONF) as resolv_conf:
+                resolvers = resolv_conf.read()
+        except IOError:
+            resolvers = None
+        return (network.get_state(), resolvers,
+                self.dns_might_have_changed)
+
+    def _save_module(self, module):
         return module.apply(None)
 
     def _save_only(self):
@@ -314,7 +574,11 @@ class FuelSetup(object):
             )
             sys.exit(0)
 
-        success, module_name = self.global_save()
+        # Settings are saved straight from defaults of modules, neither
+        # screens nor the main loop are built
+        self.footer = LogFooter()
+        self._load_modules()
+        success, module_name = self._save_defaults()
         if not success:
             msg = ("Problems with module '{}'."
                    " Settings have not been saved.".format(module_name))
@@ -322,14 +586,74 @@ class FuelSetup(object):
             sys.stderr.write(msg + '\n')
             sys.exit(1)
 
-    def reload_modules(self):
-        for child in self.children:
-            if hasattr(child, 'load') and callable(child.load):
-                child.load()
-                child.screen = child.screenUI()
-                self.draw_child_screen(child.screen)
+    def _save_defaults(self):
+        started = time.time()
+        for module, modulename in zip(self.children, self.choices):
+            # Other modules save nothing in this mode (e.g. passwords of
+            # the system are not changed)
+            if not hasattr(module, 'default_responses'):
+                continue
+            try:
+                responses = module.default_responses()
+                # Network is not probed, local checks are cheap
+                errors = module.check_responses(responses) \
+                    if hasattr(module, 'check_responses') else []
+                if errors:
+                    log.error("Default settings of module %s are not "
+                              "valid: %s", modulename, errors)
+                    return False, modulename
+                module.save(responses)
+            except Exception as e:
+                if not module.visible:
+                    log.error("Unable to save module %s: %s"
+                              % (modulename, e))
+                    continue
+                log.exception("Unable to save module %s" % modulename)
+                return False, modulename
 
+        self.settings.write(outfn=consts.SETTINGS_FILE)
+        log.info("Saved settings of %d modules in %.2fs",
+                 len(self.children), time.time() - started)
+        return True, None
+
+    def reload_modules(self, changed_keys=None):
+        """Reloads modules from settings after they were replaced.
+
+        :param changed_keys: settings keys (e.g. 'ADMIN_NETWORK/netmask')
+                             which changed, only modules using them are
+                             reloaded. All modules are reloaded if None.
+        """
+        started = time.time()
+        reloaded = 0
+        for child in self.children:
+            if not (hasattr(child, 'load') and callable(child.load)):
+                continue
+            if changed_keys is not None and \
+                    not self._uses_settings(child, changed_keys):
+                continue
+            child.load()
+            child.screen = child.screenUI()
+            reloaded += 1
+
+        # Only the visible module is drawn, others are shown when chosen
+        if self.child.screen is not self.childpage:
+            self.draw_child_screen(self.child.screen)
         self.refreshScreen()
+        log.info("Reloaded %d of %d modules in %.2fs", reloaded,
+                 len(self.children), time.time() - started)
+
+    @staticmethod
+    def _uses_settings(module, keys):
+        # Modules list settings their load reads beyond the defaults
+        # (e.g. the whole section) in settings_keys
+        fields = getattr(module, 'settings_keys', None) or \
+            getattr(module, 'defaults', None)
+        if fields is None:
+            # Unknown settings, reload to be safe
+            return True
+        return any(field == key or field.startswith(key + '/') or
+                   key.startswith(field + '/')
+                   for field in fields for key in keys)
 
 
 def setup(**kwargs):
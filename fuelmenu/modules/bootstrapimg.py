@@ -12,25 +12,34 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
-import copy
+import collections
 import logging
 import os
 import re
-import requests
 import types
 import urlparse
+import yaml
 
 import urwid
 import urwid.raw_display
 import urwid.web_display
 
+from fuelmenu.common import dialog
 from fuelmenu.common import modulehelper
+from fuelmenu.common import repos
+import fuelmenu.common.urwidwrapper as widget
 from fuelmenu.common import utils
+from fuelmenu import consts
 
 log = logging.getLogger('fuelmenu.mirrors')
 blank = urwid.Divider()
 
 localhost_pattern = re.compile(r'(127.0.0.1|localhost)')
+# Repository in sources.list format: "deb uri suite [component ...]"
+repo_entry_pattern = re.compile(r"(?P<type>\w+) (?P<uri>[^\s]+) "
+                                r"(?P<suite>[^\s]+)( (?P<section>[\w\s]*))?")
+# Options of sources.list entry, e.g. "[arch=amd64 trusted=yes]"
+apt_options_pattern = re.compile(r"\s+\[[^\]]*\]")
 
 
 BOOTSTRAP_HTTP_PROXY_KEY = "BOOTSTRAP/http_proxy"
@@ -38,8 +47,28 @@ BOOTSTRAP_HTTPS_PROXY_KEY = "BOOTSTRAP/https_proxy"
 BOOTSTRAP_NO_PROXY_KEY = "BOOTSTRAP/no_proxy"
 BOOTSTRAP_REPOS_KEY = "BOOTSTRAP/repos"
 BOOTSTRAP_SKIP_BUILD_KEY = "BOOTSTRAP/skip_default_img_build"
+BOOTSTRAP_ALT_MIRRORS_KEY = "alternate_mirrors"
+# Not a setting, only the source of repositories to import
+IMPORT_SOURCES_KEY = 'import_sources'
+# Inputs of the screen actions, they are not saved to settings
+SCREEN_ONLY_KEYS = (IMPORT_SOURCES_KEY, BOOTSTRAP_ALT_MIRRORS_KEY)
 
 ADD_REPO_BUTTON_KEY = 'add_repo_button'
+IMPORT_REPOS_BUTTON_KEY = 'import_repos_button'
+PROBE_PROXIES_BUTTON_KEY = 'probe_proxies_button'
+BENCHMARK_BUTTON_KEY = 'benchmark_mirrors_button'
+VERIFY_PACKAGES_BUTTON_KEY = 'verify_packages_button'
+
+# Packages the bootstrap builder installs if its config is not available
+BOOTSTRAP_PACKAGES = (
+    "daemonize", "fuel-agent", "hwloc", "i40e-dkms", "linux-firmware",
+    "linux-headers-generic", "live-boot", "live-boot-initramfs-tools",
+    "mcollective", "mcollective-lib", "msmtp-mta", "multipath-tools",
+    "multipath-tools-boot", "nailgun-agent", "nailgun-mcagents",
+    "network-checker", "ntp", "openssh-client", "openssh-server",
+    "puppet", "squashfs-tools", "ubuntu-minimal", "vim", "wget",
+    "xz-utils",
+)
 
 
 class BootstrapImage(urwid.WidgetWrap):
@@ -61,9 +90,16 @@ class BootstrapImage(urwid.WidgetWrap):
             BOOTSTRAP_HTTP_PROXY_KEY,
             BOOTSTRAP_HTTPS_PROXY_KEY,
             BOOTSTRAP_NO_PROXY_KEY,
+            PROBE_PROXIES_BUTTON_KEY,
             modulehelper.BLANK_KEY,
             BOOTSTRAP_REPOS_KEY,
-            ADD_REPO_BUTTON_KEY
+            ADD_REPO_BUTTON_KEY,
+            IMPORT_SOURCES_KEY,
+            IMPORT_REPOS_BUTTON_KEY,
+            modulehelper.BLANK_KEY,
+            BOOTSTRAP_ALT_MIRRORS_KEY,
+            BENCHMARK_BUTTON_KEY,
+            VERIFY_PACKAGES_BUTTON_KEY
         )
 
         self.fields = self._common_fields
@@ -107,6 +143,11 @@ class BootstrapImage(urwid.WidgetWrap):
                 "label": "Bypass proxy for",
                 "tooltip": "Bypass proxy for domains from this list",
                 "value": ""},
+            PROBE_PROXIES_BUTTON_KEY: {
+                "label": "Probe proxies",
+                "type": modulehelper.WidgetType.BUTTON,
+                "callback": self.probe_proxies
+            },
             BOOTSTRAP_REPOS_KEY: {
                 "label": "List of repositories",
                 "type": modulehelper.WidgetType.LIST,
@@ -117,6 +158,30 @@ class BootstrapImage(urwid.WidgetWrap):
                 "label": "Add repository",
                 "type": modulehelper.WidgetType.BUTTON,
                 "callback": self.add_repo
+            },
+            IMPORT_SOURCES_KEY: {
+                "label": "Import from",
+                "tooltip": "APT sources.list file or directory with them",
+                "value": "/etc/apt/sources.list.d"},
+            IMPORT_REPOS_BUTTON_KEY: {
+                "label": "Import repositories",
+                "type": modulehelper.WidgetType.BUTTON,
+                "callback": self.import_repos
+            },
+            BOOTSTRAP_ALT_MIRRORS_KEY: {
+                "label": "Alternate mirrors",
+                "tooltip": "Space separated mirrors of the first repository "
+                           "to compare with",
+                "value": ""},
+            BENCHMARK_BUTTON_KEY: {
+                "label": "Benchmark mirrors",
+                "type": modulehelper.WidgetType.BUTTON,
+                "callback": self.benchmark_mirrors
+            },
+            VERIFY_PACKAGES_BUTTON_KEY: {
+                "label": "Verify packages",
+                "type": modulehelper.WidgetType.BUTTON,
+                "callback": self.verify_packages
             }
         }
         self.load()
@@ -126,7 +191,7 @@ class BootstrapImage(urwid.WidgetWrap):
     def responses(self):
         ret = dict()
         for index, fieldname in enumerate(self.fields):
-            if (fieldname == modulehelper.BLANK_KEY or
+            if (fieldname in (modulehelper.BLANK_KEY, IMPORT_SOURCES_KEY) or
                     'button' in fieldname.lower()):
                 pass
             elif fieldname == BOOTSTRAP_REPOS_KEY:
@@ -138,6 +203,18 @@ class BootstrapImage(urwid.WidgetWrap):
                 ret[fieldname] = self.edits[index].get_edit_text()
         return ret
 
+    def default_responses(self):
+        """Returns responses without building the screen, see responses."""
+        self._select_fields_to_show(self.defaults)
+        ret = modulehelper.ModuleHelper.default_responses(self.fields,
+                                                          self.defaults)
+        ret.pop(IMPORT_SOURCES_KEY, None)
+        if BOOTSTRAP_REPOS_KEY in ret:
+            ret[BOOTSTRAP_REPOS_KEY] = self._repos_response(
+                self._repo_from_value(item)
+                for item in ret[BOOTSTRAP_REPOS_KEY])
+        return ret
+
     def check(self, args):
         """Validate that all fields have valid values through sanity checks."""
         self.parent.footer.set_text("Checking data...")
@@ -147,9 +224,23 @@ class BootstrapImage(urwid.WidgetWrap):
         if self.parent.save_only:
             return responses
 
+        # Repositories are fetched, skip it if nothing changed
+        key, cached = self.parent.check_cache.lookup(self.name, responses)
+        if cached is not None:
+            return cached
+
         errors = []
+        to_check = {}
         if not responses.get(BOOTSTRAP_SKIP_BUILD_KEY):
-            errors.extend(self.check_apt_repos(responses))
+            errors, to_check = self._parse_apt_repos(responses)
+
+        # Repositories are probed only once all of them are valid
+        if not errors and to_check:
+            problems = self.parent.probes.run(
+                self.name, lambda: self.probe_apt_repos(responses, to_check))
+            errors = problems or []
+        else:
+            problems = []
 
         if errors:
             log.error("Errors: %s", errors)
@@ -157,26 +248,25 @@ class BootstrapImage(urwid.WidgetWrap):
             return False
         else:
             self.parent.footer.set_text("No errors found.")
+            if problems is not None:
+                self.parent.check_cache.store(self.name, key, responses)
             return responses
 
-    def check_apt_repos(self, responses):
-        errors = []
-
-        http_proxy = responses[BOOTSTRAP_HTTP_PROXY_KEY].strip()
-        https_proxy = responses[BOOTSTRAP_HTTPS_PROXY_KEY].strip()
-        no_proxy = responses[BOOTSTRAP_NO_PROXY_KEY].strip()
+    def _parse_apt_repos(self, responses):
+        """Validates repositories without accessing them.
 
-        # Set up proxy settings
-        os.environ['HTTP_PROXY'] = http_proxy
-        os.environ['HTTPS_PROXY'] = https_proxy
-        os.environ['NO_PROXY'] = no_proxy
-
-        repos = responses.get(BOOTSTRAP_REPOS_KEY)
+        :returns: (errors, to_check) tuple, to_check maps Release file URLs
+                  to names and sections of repositories using them
+        """
+        errors = []
+        apt_repos = responses.get(BOOTSTRAP_REPOS_KEY)
 
-        if not repos:
+        if not apt_repos:
             errors.append("Specify at least one repository.")
 
-        for index, repo in enumerate(repos):
+        # Names and sections of repositories by their Release file URLs
+        to_check = collections.OrderedDict()
+        for index, repo in enumerate(apt_repos):
             name = repo['name']
             priority = repo['priority']
             if priority and not isinstance(priority,
@@ -193,14 +283,250 @@ class BootstrapImage(urwid.WidgetWrap):
                               "'deb uri distribution [component1] [...]'."
                               .format(name))
                 continue
-            if not self._check_repo(repo['uri'], repo['suite']):
-                errors.append("URL for repository {0} is not accessible."
-                              .format(name))
+            url = repos.release_url(repo['uri'], repo['suite'])
+            if not self._skip_repo_check(url):
+                to_check.setdefault(url, []).append(
+                    (name, repo['suite'], repo['section']))
+        return errors, to_check
+
+    def probe_apt_repos(self, responses, to_check):
+        """Returns errors of repositories which can't be fetched."""
+        errors = []
+        checker = self._repo_checker(
+            responses, cache=repos.RepoCache(consts.REPO_CACHE_FILE))
+        to_check = collections.OrderedDict(to_check)
+
+        # A dead proxy fails all its repositories at once
+        errors.extend(self._check_proxies(checker, to_check))
+        for url, configured in self._check_routes(checker, to_check).items():
+            errors.extend("URL for repository {0} is not accessible: no "
+                          "working default gateway.".format(name)
+                          for name, _, _ in configured)
+        results = checker.check(to_check)
+        for url, configured in to_check.items():
+            for name, suite, section in configured:
+                if results[url] is None:
+                    errors.append("URL for repository {0} is not "
+                                  "accessible.".format(name))
+                    continue
+                errors.extend(
+                    "Repository {0}: {1}.".format(name, problem)
+                    for problem in repos.validate_release(
+                        results[url], suite, section))
 
         return errors
 
-    def apply(self, args):
-        responses = self.check(args)
+    def _repo_checker(self, responses, **kwargs):
+        """Returns RepoChecker using proxies from responses."""
+        proxies = {
+            'http': responses[BOOTSTRAP_HTTP_PROXY_KEY].strip(),
+            'https': responses[BOOTSTRAP_HTTPS_PROXY_KEY].strip(),
+        }
+        return repos.RepoChecker(
+            proxies=proxies,
+            no_proxy=responses[BOOTSTRAP_NO_PROXY_KEY].strip(),
+            **kwargs)
+
+    def _proxy_probe_urls(self, checker, urls):
+        """Returns URL to probe configured proxy of every scheme with."""
+        targets = {}
+        for url in urls:
+            scheme = urlparse.urlparse(url).scheme
+            if checker.proxy_for(url):
+                targets.setdefault(scheme, url)
+        return targets
+
+    def _check_proxies(self, checker, to_check):
+        """Probes proxies, URLs behind unusable ones are not checked."""
+        targets = self._proxy_probe_urls(checker, to_check)
+        if not targets:
+            return []
+        errors = []
+        for (scheme, proxy), result in \
+                checker.probe_proxies(targets).items():
+            if proxy is None or not result['error']:
+                continue
+            errors.append("{0} proxy {1} is not usable: {2}."
+                          .format(scheme.upper(), proxy, result['error']))
+            for url in list(to_check):
+                if checker.proxy_for(url) == proxy:
+                    del to_check[url]
+        return errors
+
+    def _check_routes(self, checker, to_check):
+        """Drops URLs accessed directly through unreachable gateway.
+
+        :returns: OrderedDict with the dropped items of to_check
+        """
+        unrouted = collections.OrderedDict()
+        for url, configured in list(to_check.items()):
+            host = urlparse.urlparse(url).hostname
+            if checker.proxy_for(url) or \
+                    self.parent.gateway_check.can_reach(host):
+                continue
+            unrouted[url] = configured
+            del to_check[url]
+        return unrouted
+
+    def probe_proxies(self, button):
+        """Compare configured proxies with direct access."""
+        responses = self.responses
+        checker = self._repo_checker(responses)
+        urls = [repos.release_url(repo['uri'], repo['suite'])
+                for repo in responses.get(BOOTSTRAP_REPOS_KEY, [])
+                if repo['uri'] and repo['suite']]
+        targets = self._proxy_probe_urls(
+            checker, [url for url in urls if not self._skip_repo_check(url)])
+        if not targets:
+            self.parent.footer.set_text("No proxies are used by "
+                                        "repositories.")
+            return
+
+        self.parent.footer.set_text("Probing proxies. Please wait...")
+        self.parent.refreshScreen()
+        self.parent.flushScreen()
+        results = checker.probe_proxies(targets)
+
+        msg = []
+        for scheme in sorted(targets):
+            proxy = checker.proxies[scheme]
+            for name, result in (
+                    ("{0} proxy {1}".format(scheme.upper(), proxy),
+                     results[(scheme, proxy)]),
+                    ("Direct {0} access".format(scheme.upper()),
+                     results[(scheme, None)])):
+                if result['error']:
+                    msg.append("{0}: failed ({1})".format(
+                        name, result['error']))
+                else:
+                    msg.append("{0}: {1:d} ms".format(
+                        name, int(result['latency'] * 1000)))
+            via_proxy = results[(scheme, proxy)]
+            direct = results[(scheme, None)]
+            if not direct['error'] and (
+                    via_proxy['error'] or
+                    direct['latency'] < via_proxy['latency']):
+                msg.append("Direct {0} access is faster, consider removing "
+                           "the {0} proxy.".format(scheme.upper()))
+            msg.append("")
+
+        log.info('\n'.join(msg))
+        dialog.display_dialog(self, widget.TextLabel('\n'.join(msg).strip()),
+                              "Proxy Probe")
+        self.parent.footer.set_text("Proxies probed.")
+
+    def benchmark_mirrors(self, button):
+        """Measure speed of configured and alternate mirrors."""
+        responses = self.responses
+        apt_repos = [repo for repo in responses.get(BOOTSTRAP_REPOS_KEY, [])
+                     if repo['uri'] and repo['suite']]
+        if not apt_repos:
+            self.parent.footer.set_text("No repositories to benchmark.")
+            return
+        # Every distinct URI is measured once
+        mirrors = collections.OrderedDict()
+        for repo in apt_repos:
+            mirrors.setdefault(repo['uri'].rstrip('/'),
+                               (repo['uri'], repo['suite'], repo['section']))
+        # Alternates serve the same content as the first repository
+        main = apt_repos[0]
+        alternates = responses.get(BOOTSTRAP_ALT_MIRRORS_KEY, '').split()
+        for uri in alternates:
+            mirrors.setdefault(uri.rstrip('/'),
+                               (uri, main['suite'], main['section']))
+
+        self.parent.footer.set_text("Benchmarking mirrors. Please wait...")
+        self.parent.refreshScreen()
+        self.parent.flushScreen()
+        ranked = repos.rank_mirrors(
+            self._repo_checker(responses).benchmark_mirrors(
+                mirrors.values()))
+
+        msg = ["Mirrors ordered by speed:"]
+        for result in ranked:
+            if result['error']:
+                msg.append("%s: failed (%s)" % (result['uri'],
+                                                result['error']))
+                continue
+            msg.append("%s: connect %d ms, first byte %d ms, %.2f MB/s"
+                       % (result['uri'], result['connect'] * 1000,
+                          result['ttfb'] * 1000,
+                          result['throughput'] / (1024 * 1024)))
+
+        candidates = [main['uri'].rstrip('/')] + \
+            [uri.rstrip('/') for uri in alternates]
+        fastest = [result['uri'].rstrip('/') for result in ranked
+                   if not result['error'] and
+                   result['uri'].rstrip('/') in candidates]
+        if fastest and fastest[0] != candidates[0]:
+            msg.append("")
+            msg.append("Suggested mirror for repository %s: %s"
+                       % (main['name'], fastest[0]))
+        if len(fastest) > 1:
+            msg.append("")
+            msg.append("Suggested priority order: %s" % ', '.join(fastest))
+
+        log.info('\n'.join(msg))
+        dialog.display_dialog(self, widget.TextLabel('\n'.join(msg)),
+                              "Mirrors Benchmark")
+        self.parent.footer.set_text("Mirrors benchmarked.")
+
+    def _required_packages(self):
+        try:
+            with open(consts.BOOTSTRAP_CLI_CONFIG) as config:
+                packages = yaml.safe_load(config).get('packages')
+        except (IOError, AttributeError, yaml.YAMLError) as e:
+            log.warning("Unable to read bootstrap packages from %s: %s",
+                        consts.BOOTSTRAP_CLI_CONFIG, e)
+            packages = None
+        return packages or list(BOOTSTRAP_PACKAGES)
+
+    def verify_packages(self, button):
+        """Check that packages of the bootstrap image can be installed."""
+        responses = self.responses
+        apt_repos = []
+        skipped = []
+        for repo in responses.get(BOOTSTRAP_REPOS_KEY, []):
+            if not (repo['uri'] and repo['suite']):
+                continue
+            url = repos.release_url(repo['uri'], repo['suite'])
+            if self._skip_repo_check(url):
+                skipped.append(repo['name'])
+            else:
+                apt_repos.append(repo)
+        if not apt_repos:
+            self.parent.footer.set_text("No repositories to verify.")
+            return
+        self.parent.footer.set_text("Reading package indexes. "
+                                    "Please wait...")
+        self.parent.refreshScreen()
+        self.parent.flushScreen()
+        indexes, msg = self._repo_checker(responses).scan_packages(
+            apt_repos)
+        resolved, missing = repos.resolve_packages(
+            self._required_packages(), indexes)
+
+        if missing:
+            msg.append("Packages not found in any repository: {0}"
+                       .format(', '.join(missing)))
+        if skipped:
+            msg.append("Not verified local repositories: {0}"
+                       .format(', '.join(skipped)))
+        msg.append("")
+        msg.append("Packages will be installed from:")
+        for package in sorted(resolved):
+            msg.append("{0} {1} ({2})".format(
+                package, resolved[package][1], resolved[package][0]))
+
+        log.info('\n'.join(msg))
+        dialog.display_dialog(self, widget.TextLabel('\n'.join(msg)),
+                              "Bootstrap Packages")
+        self.parent.footer.set_text(
+            "{0} packages missing.".format(len(missing)) if missing
+            else "All bootstrap packages are available.")
+
+    def apply(self, args, responses=None):
+        responses = self.check(args) if responses is None else responses
         if responses is False:
             log.error("Check failed. Not applying")
             log.error("%s" % (responses))
@@ -221,27 +547,35 @@ class BootstrapImage(urwid.WidgetWrap):
         # on UI we have labels, but not keys...
         label_to_key_mapping = dict((v['label'], k) for k, v in
                                     self.repo_value_scheme.items())
-        result = []
-        for lb in external_lw:
-            repo = {}
+        repos = []
+        for pos, item in enumerate(external_lw.contents):
+            lb = external_lw.cached(pos)
+            if lb is None:
+                # Entry was never scrolled into view, so it wasn't edited
+                repos.append(self._repo_from_value(item))
+                continue
             internal_lw = getattr(lb, 'list_walker', None)
             if not internal_lw:
                 continue
 
+            repo = {}
             for edit in internal_lw:
                 if not hasattr(edit, 'caption'):
                     continue
                 key = label_to_key_mapping[edit.caption.strip()]
                 repo[key] = edit.edit_text
+            repos.append(repo)
+        return self._repos_response(repos)
 
-            if any(repo.values()):  # skip empty entries
-                result.append(self._parse_ui_repo_entry(repo))
-        return result
+    def _repo_from_value(self, item):
+        return dict((k, item.get(k, "")) for k in self.repo_value_scheme)
 
-    def _parse_ui_repo_entry(self, repo_from_ui):
-        regexp = r"(?P<type>\w+) (?P<uri>[^\s]+) (?P<suite>[^\s]+)( " \
-                 r"(?P<section>[\w\s]*))?"
+    def _repos_response(self, repos):
+        # skip empty entries
+        return [self._parse_ui_repo_entry(repo) for repo in repos
+                if any(repo.values())]
 
+    def _parse_ui_repo_entry(self, repo_from_ui):
         priority = repo_from_ui.get('priority')
         name = repo_from_ui.get('name')
         uri = repo_from_ui.get('uri', '')
@@ -251,7 +585,7 @@ class BootstrapImage(urwid.WidgetWrap):
             log.debug("Wrong priority value for repository '{0}': "
                       "'{1}'.".format(name, priority))
 
-        match = re.match(regexp, uri)
+        match = repo_entry_pattern.match(uri)
 
         repo_type = match.group('type') if match else ''
         repo_suite = match.group('suite') if match else ''
@@ -312,15 +646,140 @@ class BootstrapImage(urwid.WidgetWrap):
         return repos_for_ui
 
     def add_repo(self, data=None):
-        defaults = self._get_fresh_defaults()
-        repo_list = defaults[BOOTSTRAP_REPOS_KEY]['value']
-        repo_list.append(
-            dict((k, "") for k in self.repo_value_scheme))
-        button_position = self._calculate_field_position(ADD_REPO_BUTTON_KEY)
-        self._redraw_screen(defaults, button_position)
+        modulehelper.ModuleHelper.append_list_item(
+            self.edits[self.fields.index(BOOTSTRAP_REPOS_KEY)],
+            dict((k, "") for k in self.repo_value_scheme),
+            self.repo_value_scheme, self.parent.footer)
+
+    def _iter_apt_sources(self, path):
+        """Yields repositories from sources.list file or directory."""
+        if os.path.isdir(path):
+            filenames = [os.path.join(path, name)
+                         for name in sorted(os.listdir(path))
+                         if name.endswith('.list')]
+        else:
+            filenames = [path]
+        for filename in filenames:
+            with open(filename) as sources:
+                for line in sources:
+                    line = apt_options_pattern.sub('', line.split('#', 1)[0])
+                    line = ' '.join(line.split())
+                    # deb-src entries are not used by the image builder
+                    if not line.startswith('deb '):
+                        continue
+                    repo = self._parse_ui_repo_entry({'uri': line})
+                    if repo['suite']:
+                        yield repo
+
+    @staticmethod
+    def _repo_identity(repo):
+        return (repo['uri'].rstrip('/'), repo['suite'],
+                ' '.join((repo['section'] or '').split()))
+
+    @staticmethod
+    def _unique_repo_name(repo, names):
+        base = "{0}-{1}".format(
+            urlparse.urlparse(repo['uri']).hostname or 'repo', repo['suite'])
+        name = base
+        index = 1
+        while name in names:
+            index += 1
+            name = "{0}-{1}".format(base, index)
+        names.add(name)
+        return name
+
+    def _validate_imported(self, responses, imported):
+        """Returns imported repositories passing the checks and errors."""
+        checker = self._repo_checker(
+            responses, cache=repos.RepoCache(consts.REPO_CACHE_FILE))
+        to_check = collections.OrderedDict()
+        for repo in imported:
+            url = repos.release_url(repo['uri'], repo['suite'])
+            if not self._skip_repo_check(url):
+                to_check.setdefault(url, []).append(repo)
+        # Checks below drop URLs behind unusable proxies or unreachable
+        # gateway from to_check, the same way as checks of the screen do
+        configured = collections.OrderedDict(to_check)
+
+        errors = self._check_proxies(checker, to_check)
+        unrouted = self._check_routes(checker, to_check)
+        results = checker.check(to_check)
+        rejected = set()
+        for url, url_repos in configured.items():
+            for repo in url_repos:
+                if url in unrouted:
+                    problems = ["URL is not accessible: no working default "
+                                "gateway"]
+                elif url not in to_check:
+                    # The proxy error is already reported
+                    rejected.add(id(repo))
+                    continue
+                elif results[url] is None:
+                    problems = ["URL is not accessible"]
+                else:
+                    problems = repos.validate_release(
+                        results[url], repo['suite'], repo['section'])
+                errors.extend("Repository {0} {1}: {2}.".format(
+                    repo['uri'], repo['suite'], problem)
+                    for problem in problems)
+                if problems:
+                    rejected.add(id(repo))
+        return [repo for repo in imported if id(repo) not in rejected], errors
+
+    def import_repos(self, button):
+        """Add repositories from APT sources to the list."""
+        path = self.edits[self.fields.index(IMPORT_SOURCES_KEY)] \
+            .get_edit_text().strip()
+        responses = self.responses
+        existing = responses.get(BOOTSTRAP_REPOS_KEY, [])
+        seen = set(self._repo_identity(repo) for repo in existing)
+        imported = []
+        duplicates = 0
+        try:
+            for repo in self._iter_apt_sources(path):
+                identity = self._repo_identity(repo)
+                if identity in seen:
+                    duplicates += 1
+                    continue
+                seen.add(identity)
+                imported.append(repo)
+        except (IOError, OSError) as e:
+            log.error("Unable to read APT sources from %s: %s", path, e)
+            self.parent.footer.set_text("Unable to read {0}: {1}".format(
+                path, e.strerror or e))
+            return
+        if not imported:
+            self.parent.footer.set_text("No new repositories found in "
+                                        "{0}.".format(path))
+            return
+
+        self.parent.footer.set_text("Checking {0} repositories. Please "
+                                    "wait...".format(len(imported)))
+        self.parent.refreshScreen()
+        self.parent.flushScreen()
+        accepted, errors = self._validate_imported(responses, imported)
+
+        names = set(repo['name'] for repo in existing)
+        for repo in accepted:
+            repo['name'] = self._unique_repo_name(repo, names)
+        modulehelper.ModuleHelper.extend_list_items(
+            self.edits[self.fields.index(BOOTSTRAP_REPOS_KEY)],
+            [self._parse_config_repo_entry(repo) for repo in accepted],
+            self.repo_value_scheme, self.parent.footer)
+
+        msg = ["Imported {0} of {1} repositories from {2}.".format(
+            len(accepted), len(imported), path)]
+        if duplicates:
+            msg.append("Skipped {0} already listed.".format(duplicates))
+        msg.extend(errors)
+        self.parent.footer.set_text(msg[0])
+        dialog.display_dialog(self, widget.TextLabel("\n".join(msg)),
+                              "Import Repositories")
 
     def _update_defaults(self, defaults, new_settings):
         for setting in defaults:
+            if setting in SCREEN_ONLY_KEYS:
+                continue
             try:
                 new_value = modulehelper.ModuleHelper.get_setting(
                     new_settings, setting)
@@ -337,12 +796,15 @@ class BootstrapImage(urwid.WidgetWrap):
 
     def load(self):
         settings = self.parent.settings
-        modulehelper.ModuleHelper.load_to_defaults(settings, self.defaults)
+        modulehelper.ModuleHelper.load_to_defaults(
+            settings, self.defaults, ignoredparams=SCREEN_ONLY_KEYS)
 
         self._update_defaults(self.defaults, settings)
         self._select_fields_to_show(self.defaults)
 
     def save(self, responses):
+        responses = dict((key, value) for key, value in responses.items()
+                         if key not in SCREEN_ONLY_KEYS)
         newsettings = modulehelper.ModuleHelper.make_settings_from_responses(
             responses)
         self.parent.settings.merge(newsettings)
@@ -350,18 +812,7 @@ class BootstrapImage(urwid.WidgetWrap):
         # Update self.defaults
         self._update_defaults(self.defaults, self.parent.settings)
 
-    def check_url(self, url):
-        try:
-            resp = requests.get(url, verify=False)
-        except (requests.exceptions.RequestException,
-                requests.exceptions.BaseHTTPError) as e:
-            log.error(e)
-            return False
-        return resp.ok
-
-    def _check_repo(self, base_url, suite):
-        release_url = '{base_url}/dists/{suite}/Release'.format(
-            base_url=base_url, suite=suite)
+    def _skip_repo_check(self, release_url):
         host = urlparse.urlparse(release_url).netloc.split(':')[0]
         if (localhost_pattern.search(host) and
                 utils.is_pre_deployment()):
@@ -372,8 +823,7 @@ class BootstrapImage(urwid.WidgetWrap):
             log.warning('Accessibility check is skipped for local '
                         'repository: {}'.format(release_url))
             return True
-
-        return self.check_url(release_url)
+        return False
 
     def refresh(self):
         pass
@@ -381,37 +831,10 @@ class BootstrapImage(urwid.WidgetWrap):
     def _generate_screen_by_defaults(self, defaults):
         screen = modulehelper.ModuleHelper.screenUI(self, self.header_content,
                                                     self.fields, defaults)
+        # Widgets of hidden repository fields, kept to restore user input
+        self._repo_edits = None
         return screen
 
-    def _get_fresh_defaults(self):
-        defaults = copy.copy(self.defaults)
-        self._update_defaults(
-            defaults,
-            modulehelper.ModuleHelper.make_settings_from_responses(
-                self.responses))
-        return defaults
-
-    def _redraw_screen(self, defaults=None, focus_position=None):
-        if not defaults:
-            defaults = self.defaults
-        self.screen = self._generate_screen_by_defaults(defaults)
-        if focus_position:
-            self.walker.set_focus(focus_position)
-        self.parent.draw_child_screen(self.screen, focus_on_child=True)
-
-    def _calculate_field_position(self, field_name):
-        return self._calculate_edits_offset() + self.fields.index(field_name)
-
-    def _calculate_edits_offset(self):
-        """Returns position of first widget."""
-        first_edit = self.edits[0] if self.edits else None
-        result = 0
-        for widget in self.walker.lst:
-            if widget == first_edit:
-                break
-            result += 1
-        return result
-
     def _select_fields_to_show(self, defaults):
         skip_build = defaults[BOOTSTRAP_SKIP_BUILD_KEY].get('value')
         if skip_build:
@@ -422,12 +845,25 @@ class BootstrapImage(urwid.WidgetWrap):
             self._repo_related_fields
 
     def skip_build_callback(self, widget, new_state):
-        defaults = self._get_fresh_defaults()
-        defaults[BOOTSTRAP_SKIP_BUILD_KEY]['value'] = new_state
-        self._select_fields_to_show(defaults)
-        self._redraw_screen(
-            defaults,
-            self._calculate_field_position(BOOTSTRAP_SKIP_BUILD_KEY))
+        # Repository fields follow common ones, only they are shown or
+        # hidden, other widgets are left intact. Blank dividers are shared,
+        # so position is found by the checkbox which is the last common one
+        common_count = len(self._common_fields)
+        position = self.walker.lst.index(self.edits[common_count - 1]) + 1
+        showing = self.fields != self._common_fields
+        if new_state and showing:
+            self._repo_edits = self.edits[common_count:]
+            self.walker.remove(position, len(self._repo_edits))
+            self.edits = self.edits[:common_count]
+            self.fields = self._common_fields
+        elif not new_state and not showing:
+            if self._repo_edits is None:
+                self._repo_edits = modulehelper.ModuleHelper.setup_widgets(
+                    self.parent.footer, self._repo_related_fields,
+                    self.defaults)
+            self.walker.insert(position, self._repo_edits)
+            self.edits = self.edits + self._repo_edits
+            self.fields = self._common_fields + self._repo_related_fields
 
     def screenUI(self):
         return self._generate_screen_by_defaults(self.defaults)
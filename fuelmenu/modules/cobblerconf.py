@@ -81,6 +81,8 @@ to advertise via DHCP to nodes",
                                   "tooltip": "",
                                   "type": modulehelper.WidgetType.LABEL},
             }
+        # Settings read by load, the interface is not in defaults
+        self.settings_keys = ["ADMIN_NETWORK"]
 
         self.load()
         self.extdhcp = True
@@ -105,63 +107,55 @@ to advertise via DHCP to nodes",
             if fieldname != "blank" and "label" not in fieldname:
                 responses[fieldname] = self.edits[index].get_edit_text()
 
-        # Validate each field
-        errors = []
+        # Scans below take long, skip them if nothing changed
+        key, cached = self.parent.check_cache.lookup(
+            self.name, [responses, self.activeiface,
+                        self.parent.settings.get("ADMIN_NETWORK")])
+        if cached is not None:
+            return cached
 
         # Set internal_{ipaddress,netmask,interface}
-        responses["ADMIN_NETWORK/interface"] = self.activeiface
-        responses["ADMIN_NETWORK/netmask"] = self.netsettings[
-            self.activeiface]["netmask"]
-        responses["ADMIN_NETWORK/mac"] = self.netsettings[
-            self.activeiface]["mac"]
-        responses["ADMIN_NETWORK/ipaddress"] = self.netsettings[
-            self.activeiface]["addr"]
+        responses.update(self._interface_responses())
+
+        errors = self.check_responses(responses)
+
+        # The network is scanned only once the values are valid
+        if len(errors) == 0:
+            self.parent.footer.set_text("Scanning for DHCP servers and "
+                                        "duplicate IP addresses. Please "
+                                        "wait...")
+            self.parent.refreshScreen()
+            problems = self.parent.probes.run(
+                self.name, lambda: self.probe_network(responses),
+                describe=self._describe_probe)
+            if problems is not None:
+                dhcp_servers, errors = problems
+                if dhcp_servers:
+                    self._display_dhcp_servers(dhcp_servers)
+        else:
+            problems = []
+
+        if len(errors) > 0:
+            log.error("Errors: %s %s" % (len(errors), errors))
+            modulehelper.ModuleHelper.display_failed_check_dialog(self, errors)
+            return False
+        else:
+            self.parent.footer.set_text("No errors found.")
+            if problems is not None:
+                self.parent.check_cache.store(self.name, key, responses)
+            return responses
+
+    def check_responses(self, responses):
+        """Validates responses without accessing the network.
+
+        :returns: list of errors
+        """
+        errors = []
 
         # ensure management interface is valid
         if responses["ADMIN_NETWORK/interface"] not in self.netsettings.keys():
             errors.append("Management interface not valid")
         else:
-            self.parent.footer.set_text("Scanning for DHCP servers. \
-Please wait...")
-            self.parent.refreshScreen()
-
-            try:
-                dhcptimeout = 5
-                dhcp_server_data = network.search_external_dhcp(
-                    self.activeiface, dhcptimeout)
-            except network.NetworkException:
-                log.warning('DHCP scan failed.')
-                dhcp_server_data = []
-
-            num_dhcp = len(dhcp_server_data)
-            if num_dhcp == 0:
-                log.debug("No DHCP servers found")
-            else:
-                # Problem exists, but permit user to continue
-                log.error("%s foreign DHCP server(s) found: %s" %
-                          (num_dhcp, dhcp_server_data))
-
-                # Build dialog elements
-                dhcp_info = []
-                dhcp_info.append(urwid.Padding(
-                                 urwid.Text(("header", "!!! WARNING !!!")),
-                                 "center"))
-                dhcp_info.append(widget.TextLabel("You have selected an \
-interface that contains one or more DHCP servers. This will impact \
-provisioning. You should disable these DHCP servers before you continue, or \
-else deployment will likely fail."))
-                dhcp_info.append(widget.TextLabel(""))
-                for index, dhcp_server in enumerate(dhcp_server_data):
-                    dhcp_info.append(widget.TextLabel("DHCP Server #%s:" %
-                                     (index + 1)))
-                    dhcp_info.append(widget.TextLabel("IP address: %-10s" %
-                                     dhcp_server['server_ip']))
-                    dhcp_info.append(widget.TextLabel("MAC address: %-10s" %
-                                     dhcp_server['mac']))
-                    dhcp_info.append(widget.TextLabel(""))
-                dialog.display_dialog(self, urwid.Pile(dhcp_info),
-                                      "DHCP Servers Found on %s"
-                                      % self.activeiface)
             # Ensure pool start and end are on the same subnet as mgmt_if
             # Ensure mgmt_if has an IP first
             if len(self.netsettings[responses[
@@ -246,17 +240,6 @@ interface first.")
                     errors.append("DHCP Gateway does not match management "
                                   "network.")
 
-                self.parent.footer.set_text("Scanning for duplicate IP address"
-                                            "es. Please wait...")
-                # Bind arping to mgmt_if_ipaddr if it assigned
-                assigned_ips = [v.get('addr') for v in
-                                self.netsettings.itervalues()]
-                arping_bind = mgmt_if_ipaddr in assigned_ips
-                if network.duplicateIPExists(mgmt_if_ipaddr, self.activeiface,
-                                             arping_bind):
-                    errors.append("Duplicate host found with IP {0}.".format(
-                        mgmt_if_ipaddr))
-
         # Extra checks for post-deployment changes
         if utils.is_post_deployment():
             settings = self.parent.settings
@@ -277,30 +260,128 @@ interface first.")
             if old_range[-1] not in new_range:
                 errors.append("DHCP range can only be increased after "
                               "deployment.")
+        return errors
 
-        if len(errors) > 0:
-            log.error("Errors: %s %s" % (len(errors), errors))
-            modulehelper.ModuleHelper.display_failed_check_dialog(self, errors)
-            return False
+    def probe_network(self, responses):
+        """Scans the admin network for DHCP servers and duplicate IPs.
+
+        It may run in the background, so it doesn't touch the screen.
+        :returns: (dhcp_servers, errors) tuple. Foreign DHCP servers are
+                  only warned about.
+        """
+        errors = []
+        try:
+            dhcptimeout = 5
+            dhcp_server_data = network.search_external_dhcp(
+                self.activeiface, dhcptimeout)
+        except network.NetworkException:
+            log.warning('DHCP scan failed.')
+            dhcp_server_data = []
+
+        num_dhcp = len(dhcp_server_data)
+        if num_dhcp == 0:
+            log.debug("No DHCP servers found")
         else:
-            self.parent.footer.set_text("No errors found.")
-            return responses
+            # Problem exists, but permit user to continue
+            log.error("%s foreign DHCP server(s) found: %s" %
+                      (num_dhcp, dhcp_server_data))
+
+        # Bind arping to mgmt_if_ipaddr if it assigned
+        mgmt_if_ipaddr = self.netsettings[responses[
+            "ADMIN_NETWORK/interface"]]["addr"]
+        assigned_ips = [v.get('addr') for v in
+                        self.netsettings.itervalues()]
+        arping_bind = mgmt_if_ipaddr in assigned_ips
+        if network.duplicateIPExists(mgmt_if_ipaddr, self.activeiface,
+                                     arping_bind):
+            errors.append("Duplicate host found with IP {0}.".format(
+                mgmt_if_ipaddr))
+        return dhcp_server_data, errors
+
+    def _describe_probe(self, result):
+        """Lists findings of the background probe_network."""
+        dhcp_servers, errors = result
+        return ["Foreign DHCP server found on {0}: IP address {1}, "
+                "MAC address {2}.".format(self.activeiface,
+                                          server['server_ip'],
+                                          server['mac'])
+                for server in dhcp_servers] + errors
+
+    def _display_dhcp_servers(self, dhcp_server_data):
+        """Warns about foreign DHCP servers found on the interface."""
+        # Build dialog elements
+        dhcp_info = []
+        dhcp_info.append(urwid.Padding(
+                         urwid.Text(("header", "!!! WARNING !!!")),
+                         "center"))
+        dhcp_info.append(widget.TextLabel("You have selected an \
+interface that contains one or more DHCP servers. This will impact \
+provisioning. You should disable these DHCP servers before you continue, or \
+else deployment will likely fail."))
+        dhcp_info.append(widget.TextLabel(""))
+        for index, dhcp_server in enumerate(dhcp_server_data):
+            dhcp_info.append(widget.TextLabel("DHCP Server #%s:" %
+                             (index + 1)))
+            dhcp_info.append(widget.TextLabel("IP address: %-10s" %
+                             dhcp_server['server_ip']))
+            dhcp_info.append(widget.TextLabel("MAC address: %-10s" %
+                             dhcp_server['mac']))
+            dhcp_info.append(widget.TextLabel(""))
+        dialog.display_dialog(self, urwid.Pile(dhcp_info),
+                              "DHCP Servers Found on %s"
+                              % self.activeiface)
+
+    def _interface_responses(self):
+        iface = self.netsettings[self.activeiface]
+        return {
+            "ADMIN_NETWORK/interface": self.activeiface,
+            "ADMIN_NETWORK/netmask": iface["netmask"],
+            "ADMIN_NETWORK/mac": iface["mac"],
+            "ADMIN_NETWORK/ipaddress": iface["addr"],
+        }
 
-    def apply(self, args):
-        responses = self.check(args)
+    def default_responses(self):
+        """Returns responses without building the screen, see check."""
+        self.getNetwork()
+        responses = modulehelper.ModuleHelper.default_responses(
+            self.fields, self.defaults)
+        if not self._pool_matches_network(
+                responses["ADMIN_NETWORK/dhcp_pool_start"]):
+            responses.update(self._generate_pool()[1])
+        responses.update(self._interface_responses())
+        return responses
+
+    def apply(self, args, responses=None):
+        responses = self.check(args) if responses is None else responses
         if responses is False:
             log.error("Check failed. Not applying")
             log.error("%s" % (responses))
             return False
         self.save(responses)
         if utils.is_post_deployment():
-            self.parent.apply_tasks.add(self.update_dhcp)
+            # Nailgun manifest is applied by puppet scheduler
+            self.parent.puppet_scheduler.add_manifest(consts.PUPPET_NAILGUN)
+            self.parent.apply_tasks.add(self.update_nailgun,
+                                        requires=(consts.PUPPET_NAILGUN,))
+            if os.path.exists(consts.HIERA_NET_SETTINGS):
+                self.parent.apply_tasks.add(self.update_dhcp,
+                                            requires=(self.update_nailgun,))
+                synced_after = (self.update_dhcp,)
+            else:
+                # DHCP range is merged with classes requested by others
+                self.parent.puppet_scheduler.add_classes(
+                    self._dnsmasq_classes(
+                        self.parent.settings.get("ADMIN_NETWORK")))
+                synced_after = (self.update_nailgun, puppet.CLASSES_JOB)
+            self.parent.apply_tasks.add(self.cobbler_sync,
+                                        requires=synced_after)
         return True
 
+    def update_nailgun(self):
+        return self._update_nailgun(self.parent.settings.get("ADMIN_NETWORK"))
+
     def update_dhcp(self):
         settings = self.parent.settings.get("ADMIN_NETWORK")
-        if not self._update_nailgun(settings):
-            return False
         if os.path.exists(consts.HIERA_NET_SETTINGS):
             result, msg = self._update_hiera_dnsmasq(settings)
         else:
@@ -310,6 +391,9 @@ interface first.")
                 self, error_msg=self.apply_dialog_message["message"],
                 title=self.apply_dialog_message["title"])
             return False
+        return True
+
+    def cobbler_sync(self):
         cobbler_sync = ["cobbler", "sync"]
         code, out, err = utils.execute(cobbler_sync)
         if code != 0:
@@ -326,15 +410,6 @@ interface first.")
         self.parent.footer.set_text(msg)
         self.parent.refreshScreen()
 
-        # TODO(mzhnichkov) this manifest apply twice(here and in feature
-        # groups). Need to combine this calls
-        result, msg = puppet.puppetApplyManifest(consts.PUPPET_NAILGUN)
-        if not result:
-            modulehelper.ModuleHelper.display_dialog(
-                self, error_msg=self.apply_dialog_message["message"],
-                title=self.apply_dialog_message["title"])
-            return False
-
         data = {
             "gateway": settings["dhcp_gateway"],
             "ip_ranges": [
@@ -378,10 +453,18 @@ interface first.")
                 admin_net["gateway"] = settings["dhcp_gateway"]
         with open(consts.HIERA_NET_SETTINGS, "w") as hiera_settings:
             yaml.safe_dump(networks, hiera_settings)
-        return puppet.puppetApplyManifest(consts.PUPPET_DHCP_RANGES)
+        return puppet.puppetApplyManifest(consts.PUPPET_DHCP_RANGES,
+                                          progress=self.parent.set_footer)
 
     def _update_dnsmasq(self, settings):
-        puppet_classes = [{
+        puppet_classes = self._dnsmasq_classes(settings)
+        log.debug("Start puppet with data {0}".format(puppet_classes))
+        return puppet.puppetApply(puppet_classes,
+                                  progress=self.parent.set_footer)
+
+    @staticmethod
+    def _dnsmasq_classes(settings):
+        return [{
             "type": "resource",
             "class": "fuel::dnsmasq::dhcp_range",
             "name": "default",
@@ -393,8 +476,6 @@ interface first.")
                 "next_server": settings["ipaddress"]
             }
         }]
-        log.debug("Start puppet with data {0}".format(puppet_classes))
-        return puppet.puppetApply(puppet_classes)
 
     def cancel(self, button):
         modulehelper.ModuleHelper.cancel(self, button)
@@ -482,17 +563,30 @@ interface first.")
             if key == "ADMIN_NETWORK/dhcp_pool_start":
                 dhcp_start = self.edits[index].get_edit_text()
                 break
+        if self._pool_matches_network(dhcp_start):
+            return
+
+        dhcp_pool, pool_fields = self._generate_pool()
+        if dhcp_pool and self.net_text4.get_text() == "":
+            self.net_text4.set_text("This network configuration can "
+                                    "support %s nodes." % len(dhcp_pool))
+        for index, key in enumerate(self.fields):
+            if key in pool_fields:
+                self.edits[index].set_edit_text(pool_fields[key])
+
+    def _pool_matches_network(self, dhcp_start):
         if network.inSameSubnet(dhcp_start,
                                 self.netsettings[self.activeiface]['addr'],
                                 self.netsettings[self.activeiface]['netmask']):
             log.debug("Valid network settings configured. Skipping "
                       "generation.")
-            return
-        else:
-            log.debug("Existing network settings missing or invalid. "
-                      "Updating...")
+            return True
+        log.debug("Existing network settings missing or invalid. "
+                  "Updating...")
+        return False
 
-        # Calculate and set Static/DHCP pool fields
+    def _generate_pool(self):
+        # Calculate Static/DHCP pool fields
         # Max IPs = net size - 2 (master node + bcast)
         # Add gateway so we exclude it
         net_ip_list = network.getNetwork(
@@ -503,21 +597,17 @@ interface first.")
             dhcp_pool = net_ip_list[1:]
             dynamic_start = str(dhcp_pool[0])
             dynamic_end = str(dhcp_pool[-1])
-            if self.net_text4.get_text() == "":
-                self.net_text4.set_text("This network configuration can "
-                                        "support %s nodes." % len(dhcp_pool))
         except Exception:
             # We don't have valid values, so mark all fields empty
+            dhcp_pool = []
             dynamic_start = ""
             dynamic_end = ""
-        for index, key in enumerate(self.fields):
-            if key == "ADMIN_NETWORK/dhcp_pool_start":
-                self.edits[index].set_edit_text(dynamic_start)
-            elif key == "ADMIN_NETWORK/dhcp_pool_end":
-                self.edits[index].set_edit_text(dynamic_end)
-            elif key == "ADMIN_NETWORK/dhcp_gateway":
-                self.edits[index].set_edit_text(self.netsettings[
-                    self.activeiface]['addr'])
+        return dhcp_pool, {
+            "ADMIN_NETWORK/dhcp_pool_start": dynamic_start,
+            "ADMIN_NETWORK/dhcp_pool_end": dynamic_end,
+            "ADMIN_NETWORK/dhcp_gateway":
+                self.netsettings[self.activeiface]['addr'],
+        }
 
     def refresh(self):
         self.getNetwork()
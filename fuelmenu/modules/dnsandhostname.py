@@ -114,6 +114,11 @@ is accessible"}
         if self.parent.save_only:
             return responses
 
+        # DNS servers are probed, skip it if nothing changed
+        key, cached = self.parent.check_cache.lookup(self.name, responses)
+        if cached is not None:
+            return cached
+
         # Validate each field
         errors = []
 
@@ -182,32 +187,53 @@ is accessible"}
                     errors.append("Not a valid IP address for DNS server:"
                                   " {0}".format(nameserver))
 
-            # Try to resolve with first address
-            if not self.checkDNS(upstream_nameservers[0]):
-                # Warn user that DNS resolution failed, but continue
-                msg = "Unable to resolve %s.\n\n" % responses['TEST_DNS']\
-                      + "Possible causes for DNS failure include:\n"\
-                      + "* Invalid DNS server\n"\
-                      + "* Invalid gateway\n"\
-                      + "* Other networking issue\n\n"\
-                      + "Fuel Setup can save this configuration, but "\
-                      + "you may want to correct your settings."
-                dialog.display_dialog(self, widget.TextLabel(msg),
-                                      "DNS Failure Warning")
-                self.parent.refreshScreen()
-
         if len(errors) > 0:
             log.error("Errors: %s %s" % (len(errors), errors))
             modulehelper.ModuleHelper.display_failed_check_dialog(self, errors)
             return False
         else:
+            # Servers are probed only once the values are valid
+            warnings = self.parent.probes.run(
+                self.name, lambda: self.probe_dns(responses))
+            if warnings:
+                # Warn user that DNS resolution failed, but continue
+                dialog.display_dialog(
+                    self, widget.TextLabel('\n'.join(warnings)),
+                    "DNS Failure Warning")
+                self.parent.refreshScreen()
             self.parent.footer.set_text("No errors found.")
+            if warnings is not None:
+                self.parent.check_cache.store(self.name, key, responses)
             return responses
 
-    def apply(self, args):
+    def probe_dns(self, responses):
+        """Returns warnings if the first upstream DNS doesn't resolve."""
+        if len(responses["DNS_UPSTREAM"]) == 0:
+            return []
+        nameserver = responses["DNS_UPSTREAM"].split(',')[0]
+        # The warning about unreachable gateway is already shown
+        if not self.parent.gateway_check.can_reach(nameserver):
+            log.warning("Skipping DNS check, %s is not reachable",
+                        nameserver)
+            return []
+        if self.checkDNS(nameserver):
+            return []
+        return ["Unable to resolve %s.\n" % responses['TEST_DNS'],
+                "Possible causes for DNS failure include:",
+                "* Invalid DNS server",
+                "* Invalid gateway",
+                "* Other networking issue\n",
+                "Fuel Setup can save this configuration, but "
+                "you may want to correct your settings."]
+
+    def default_responses(self):
+        return modulehelper.ModuleHelper.default_responses(self.fields,
+                                                           self.defaults)
+
+    def apply(self, args, responses=None):
         self.fixEtcHosts()
 
-        responses = self.check(args)
+        responses = self.check(args) if responses is None else responses
         if responses is False:
             log.error("Check failed. Not applying")
             log.error("%s" % (responses))
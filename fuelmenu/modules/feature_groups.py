@@ -18,7 +18,6 @@ import logging
 import urwid
 
 from fuelmenu.common import modulehelper
-from fuelmenu.common import puppet
 from fuelmenu.common import utils
 from fuelmenu import consts
 
@@ -70,8 +69,12 @@ class FeatureGroups(urwid.WidgetWrap):
         self.parent.footer.set_text("No errors found.")
         return self.responses
 
-    def apply(self, args):
-        responses = self.check(args)
+    def default_responses(self):
+        return modulehelper.ModuleHelper.default_responses(self.fields,
+                                                           self.defaults)
+
+    def apply(self, args, responses=None):
+        responses = self.check(args) if responses is None else responses
         if responses is False:
             log.error("Check failed. Not applying")
             log.error("%s", responses)
@@ -80,25 +83,8 @@ class FeatureGroups(urwid.WidgetWrap):
         newsettings = self.save(responses).get('FEATURE_GROUPS')
 
         if utils.is_post_deployment() and oldsettings != newsettings:
-            self.parent.apply_tasks.add(self.apply_to_nailgun)
-
-        return True
-
-    def apply_to_nailgun(self):
-        """Apply changes to the Nailgun"""
-
-        msg = "Apply settings to Nailgun."
-        log.info(msg)
-        self.parent.footer.set_text(msg)
-        self.parent.refreshScreen()
-
-        result, msg = puppet.puppetApplyManifest(consts.PUPPET_NAILGUN)
-
-        if not result:
-            self.parent.footer.set_text(msg)
-            return False
+            self.parent.puppet_scheduler.add_manifest(consts.PUPPET_NAILGUN)
 
-        self.parent.footer.set_text(msg)
         return True
 
     def load(self):
@@ -121,8 +121,14 @@ class FuelUser(urwid.WidgetWrap):
 
         return responses
 
-    def apply(self, args):
-        responses = self.check(args)
+    def default_responses(self):
+        responses = modulehelper.ModuleHelper.default_responses(
+            self.fields, self.defaults)
+        del responses["CONFIRM_PASSWORD"]
+        return responses
+
+    def apply(self, args, responses=None):
+        responses = self.check(args) if responses is None else responses
         if responses is False:
             log.error("Check failed. Not applying")
             log.error("%s" % (responses))
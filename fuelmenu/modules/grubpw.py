@@ -82,8 +82,8 @@ class GrubPassword(urwid.WidgetWrap):
             self.parent.footer.set_text("No errors found.")
         return password
 
-    def apply(self, args):
-        password = self.check(args)
+    def apply(self, args, responses=None):
+        password = self.check(args) if responses is None else responses
         if password is False:
             log.error("Check failed. Not applying")
             return False
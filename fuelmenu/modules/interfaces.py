@@ -155,6 +155,7 @@ class Interfaces(urwid.WidgetWrap):
             self.parent.footer.set_text("Scanning for DHCP servers. "
                                         "Please wait...")
             self.parent.refreshScreen()
+            self.parent.flushScreen()
             try:
                 dhcptimeout = 5
                 dhcp_server_data = network.search_external_dhcp(
@@ -243,15 +244,15 @@ class Interfaces(urwid.WidgetWrap):
                      self.netsettings[name]['netmask'])}}
                 for name in self.netsettings if include_interface(name)]
 
-    def apply(self, args):
-        responses = self.check(args)
+    def apply(self, args, responses=None):
+        responses = self.check(args) if responses is None else responses
         if responses is False:
             self.log.error("Check failed. Not applying")
             self.parent.footer.set_text("Check failed. Not applying.")
             self.log.error("%s" % (responses))
             return False
 
-        self.parent.footer.set_text("Applying changes... (May take up to 20s)")
+        self.parent.footer.set_text("Applying changes...")
 
         # Build puppet resources to apply l23network puppet module to enable
         # network changes
@@ -304,7 +305,9 @@ class Interfaces(urwid.WidgetWrap):
 
         try:
             self.parent.refreshScreen()
-            result = puppet.puppetApply(puppetclasses)
+            self.parent.flushScreen()
+            result = puppet.puppetApply(puppetclasses,
+                                        progress=self.parent.set_footer)
             if not result:
                 raise Exception("Puppet apply failed")
             modulehelper.ModuleHelper.getNetwork(self)
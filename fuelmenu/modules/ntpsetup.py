@@ -15,6 +15,7 @@
 
 from fuelmenu.common import dialog
 from fuelmenu.common import modulehelper
+from fuelmenu.common import network
 import fuelmenu.common.urwidwrapper as widget
 from fuelmenu.common import utils
 import logging
@@ -23,6 +24,12 @@ import urwid
 log = logging.getLogger('fuelmenu.mirrors')
 blank = urwid.Divider()
 
+NTP_FIELDS = ("NTP1", "NTP2", "NTP3")
+# Number of queries sent to every server while ranking
+NTP_SAMPLES = 4
+# Servers with higher jitter (in seconds) are not used as the first one
+NTP_MAX_JITTER = 0.1
+
 
 class NtpSetup(urwid.WidgetWrap):
     def __init__(self, parent):
@@ -39,7 +46,8 @@ class NtpSetup(urwid.WidgetWrap):
                                "Deployed nodes will use Fuel Master as time "
                                "source if NTP is disabled."]
 
-        self.fields = ["ntpenabled", "NTP1", "NTP2", "NTP3"]
+        self.fields = ["ntpenabled", "NTP1", "NTP2", "NTP3", "blank",
+                       "rank_servers_button"]
         self.defaults = \
             {
                 "ntpenabled": {"label": "Enable NTP:",
@@ -55,6 +63,10 @@ class NtpSetup(urwid.WidgetWrap):
                 "NTP3": {"label": "NTP Server 3:",
                          "tooltip": "NTP Server for time synchronization",
                          "value": "time-b.nist.gov"},
+                "rank_servers_button": {
+                    "label": "Rank servers",
+                    "type": modulehelper.WidgetType.BUTTON,
+                    "callback": self.rank_servers},
             }
 
         # Load info
@@ -72,7 +84,7 @@ class NtpSetup(urwid.WidgetWrap):
         ntp_enabled = False
 
         for index, fieldname in enumerate(self.fields):
-            if fieldname == "blank":
+            if fieldname == "blank" or "button" in fieldname:
                 pass
             elif fieldname == "ntpenabled":
                 rb_group = self.edits[index].rb_group
@@ -86,7 +98,6 @@ class NtpSetup(urwid.WidgetWrap):
 
         # Validate each field
         errors = []
-        warnings = []
         if not ntp_enabled:
             # Disabled NTP means passing no NTP servers to save method
             # Even though nodes will use Fuel Master, NTP[1,2,3] are empty so
@@ -99,6 +110,11 @@ class NtpSetup(urwid.WidgetWrap):
             log.info("No errors found")
             return responses
 
+        # NTP servers are probed, skip it if nothing changed
+        key, cached = self.parent.check_cache.lookup(self.name, responses)
+        if cached is not None:
+            return cached
+
         for ntpfield, ntpvalue in responses.iteritems():
             # NTP must be under 255 chars
             if len(ntpvalue) >= 255:
@@ -110,23 +126,15 @@ class NtpSetup(urwid.WidgetWrap):
                 errors.append("%s contains illegal characters." %
                               self.defaults[ntpfield]['label'])
 
-            # ensure external NTP is valid
-            if len(ntpvalue) > 0:
-                # Validate first NTP address
-                try:
-                    # Try to test NTP via ntpdate
-                    if not self.checkNTP(ntpvalue):
-                        warnings.append("%s unable to perform NTP."
-                                        % self.defaults[ntpfield]['label'])
-                except Exception:
-                    warnings.append("%s unable to sync time with server.: %s"
-                                    % self.defaults[ntpfield]['label'])
         if len(errors) > 0:
             log.error("Errors: %s %s" % (len(errors), errors))
             modulehelper.ModuleHelper.display_failed_check_dialog(self, errors)
             return False
         else:
-            if len(warnings) > 0:
+            # Servers are probed only once the values are valid
+            warnings = self.parent.probes.run(
+                self.name, lambda: self.probe_servers(responses))
+            if warnings:
                 msg = ["NTP configuration has the following warnings:"]
                 msg.extend(warnings)
                 msg.append("You may see errors during provisioning and "
@@ -137,10 +145,35 @@ class NtpSetup(urwid.WidgetWrap):
                 log.warning(warning_msg)
             self.parent.footer.set_text("No errors found.")
             log.info("No errors found")
+            if warnings is not None:
+                self.parent.check_cache.store(self.name, key, responses)
             return responses
 
-    def apply(self, args):
-        responses = self.check(args)
+    def probe_servers(self, responses):
+        """Returns warnings about NTP servers which don't answer."""
+        warnings = []
+        for ntpfield, ntpvalue in sorted(responses.iteritems()):
+            # Servers behind unreachable gateway are not probed to avoid
+            # waiting for ntpdate timeouts
+            if len(ntpvalue) == 0 or \
+                    not self.parent.gateway_check.can_reach(ntpvalue):
+                continue
+            try:
+                # Try to test NTP via ntpdate
+                if not self.checkNTP(ntpvalue):
+                    warnings.append("%s unable to perform NTP."
+                                    % self.defaults[ntpfield]['label'])
+            except Exception:
+                warnings.append("%s unable to sync time with server."
+                                % self.defaults[ntpfield]['label'])
+        return warnings
+
+    def default_responses(self):
+        return modulehelper.ModuleHelper.default_responses(self.fields,
+                                                           self.defaults)
+
+    def apply(self, args, responses=None):
+        responses = self.check(args) if responses is None else responses
         if responses is False:
             log.error("Check failed. Not applying")
             log.error("%s" % (responses))
@@ -185,6 +218,63 @@ class NtpSetup(urwid.WidgetWrap):
         code, _, _ = utils.execute(command)
         return (code == 0)
 
+    def rank_servers(self, button):
+        """Reorder NTP servers so the most stable one is used first."""
+        servers = []
+        for fieldname in NTP_FIELDS:
+            server = self.edits[self.fields.index(fieldname)].get_edit_text()
+            if server:
+                servers.append(server)
+        if not servers:
+            self.parent.footer.set_text("No NTP servers to rank.")
+            return
+
+        self.parent.footer.set_text("Sampling NTP servers. Please wait...")
+        self.parent.refreshScreen()
+        self.parent.flushScreen()
+        measurements = utils.parallel_map(
+            lambda server: network.measure_ntp(server, samples=NTP_SAMPLES),
+            servers)
+        ranked = self.rank_measurements(zip(servers, measurements))
+
+        for index, fieldname in enumerate(NTP_FIELDS):
+            server = ranked[index][0] if index < len(ranked) else ""
+            self.edits[self.fields.index(fieldname)].set_edit_text(server)
+
+        msg = ["NTP servers ordered by quality:"]
+        for server, measurement in ranked:
+            if measurement is None:
+                msg.append("%s: no response" % server)
+                continue
+            line = ("%s: offset %.1f ms, jitter %.1f ms, delay %.1f ms"
+                    % (server, measurement['offset'] * 1000,
+                       measurement['jitter'] * 1000,
+                       measurement['delay'] * 1000))
+            if measurement['jitter'] > NTP_MAX_JITTER:
+                line += " (high jitter)"
+            msg.append(line)
+        log.info('\n'.join(msg))
+        dialog.display_dialog(self, widget.TextLabel('\n'.join(msg)),
+                              "NTP Servers Ranking")
+        self.parent.footer.set_text("NTP servers ranked.")
+
+    @staticmethod
+    def rank_measurements(measurements):
+        """Sort (server, measurement) pairs from the best to the worst.
+
+        Servers which answered with acceptable jitter go first, ordered by
+        jitter and then delay. They are followed by high-jitter servers and
+        then by servers which did not answer at all.
+        """
+        def quality(item):
+            measurement = item[1]
+            if measurement is None:
+                return (2, 0, 0)
+            return (int(measurement['jitter'] > NTP_MAX_JITTER),
+                    measurement['jitter'], measurement['delay'])
+
+        return sorted(measurements, key=quality)
+
     def refresh(self):
         self.gateway = self.get_default_gateway_linux()
         # If gateway is empty, disable NTP
@@ -162,8 +162,8 @@ class Restore(urwid.WidgetWrap):
         self.parent.footer.set_text("No errors found.")
         return responses
 
-    def apply(self, args):
-        responses = self.check(args)
+    def apply(self, args, responses=None):
+        responses = self.check(args) if responses is None else responses
         if responses is None:
             self.parent.footer.set_text("Nothing to restore, skipping.")
             return True
@@ -173,11 +173,26 @@ class Restore(urwid.WidgetWrap):
             self.parent.footer.set_text(msg)
             return False
         self.parent.footer.set_text("Applying changes...")
+        changed_keys = self.changed_keys(responses)
         self.save(responses)
-        self.parent.reload_modules()
+        self.parent.reload_modules(changed_keys)
         self.parent.footer.set_text("Setings restored successfully.")
         return True
 
+    def changed_keys(self, responses):
+        """Returns keys of responses differing from current settings."""
+        changed = []
+        for key, value in responses.items():
+            try:
+                current = helper.ModuleHelper.get_setting(
+                    self.parent.settings, key)
+            except (KeyError, TypeError):
+                changed.append(key)
+                continue
+            if current != value:
+                changed.append(key)
+        return changed
+
     def load(self):
         helper.ModuleHelper.load_to_defaults(
             self.parent.settings, self.defaults, ignoredparams=('PATH',))
@@ -186,7 +201,9 @@ class Restore(urwid.WidgetWrap):
         if self.parent.save_only:
             return
 
-        self.parent.settings.merge(responses)
+        # Responses are keyed like "ADMIN_NETWORK/interface"
+        self.parent.settings.merge(
+            helper.ModuleHelper.make_settings_from_responses(responses))
 
     def screenUI(self):
         return helper.ModuleHelper.screenUI(
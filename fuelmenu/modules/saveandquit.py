@@ -33,11 +33,13 @@ class SaveAndQuit(object):
         saveandcontinue_button = widget.Button("Save and Continue",
                                                self.save_and_continue)
         saveandquit_button = widget.Button("Save and Quit", self.save_and_quit)
+        quicksave_button = widget.Button("Save without network checks",
+                                         self.quick_save)
         quitwithoutsaving_button = widget.Button("Quit without saving",
                                                  self.quit_without_saving)
         self.header_content = ["Save configuration before quitting?", blank,
                                saveandcontinue_button, saveandquit_button,
-                               quitwithoutsaving_button]
+                               quicksave_button, quitwithoutsaving_button]
 
         self.fields = []
         self.defaults = dict()
@@ -48,11 +50,16 @@ class SaveAndQuit(object):
     def save_and_quit(self, args):
         if self.save():
             self.parent.refreshScreen()
+            self.parent.flushScreen()
             time.sleep(1.5)
             self.parent.exit(None)
 
-    def save(self):
-        results, modulename = self.parent.global_save()
+    def quick_save(self, args):
+        # Only local checks run, e.g. when the network is known to be down
+        self.save(quick=True)
+
+    def save(self, quick=False):
+        results, modulename = self.parent.global_save(quick=quick)
         if results:
             self.parent.footer.set_text("All changes saved successfully!")
             return True
@@ -19,7 +19,6 @@ import urwid
 from fuelmenu.common import dialog
 from fuelmenu.common import modulehelper as helper
 from fuelmenu.common import network
-from fuelmenu.common import puppet
 from fuelmenu.common import urwidwrapper as widget
 from fuelmenu.common import utils
 from fuelmenu import consts
@@ -60,7 +59,7 @@ class Security(urwid.WidgetWrap):
                 responses[fieldname] = self.edits[index].get_edit_text()
 
         ssh_network = responses[SSH_NETWORK]
-        errors = []
+        errors = self.check_responses(responses)
 
         if len(ssh_network) == 0:
             self.parent.footer.set_text("Address is empty, "
@@ -76,11 +75,6 @@ class Security(urwid.WidgetWrap):
             dialog.display_dialog(
                 self, widget.TextLabel(msg), "Empty Address Warning")
 
-        else:
-            if not network.getCidrSize(ssh_network):
-                errors.append("Incorrect network address format: {0}."
-                              .format(ssh_network))
-
         if len(errors) > 0:
             log.error("Errors: %s %s", len(errors), errors)
             helper.ModuleHelper.display_failed_check_dialog(self, errors)
@@ -89,31 +83,38 @@ class Security(urwid.WidgetWrap):
         self.parent.footer.set_text("No errors found.")
         return responses
 
-    def apply(self, args):
-        responses = self.check(args)
+    def check_responses(self, responses):
+        """Validates responses, empty address means any network.
+
+        :returns: list of errors
+        """
+        ssh_network = responses[SSH_NETWORK]
+        if ssh_network and not network.getCidrSize(ssh_network):
+            return ["Incorrect network address format: {0}."
+                    .format(ssh_network)]
+        return []
+
+    def default_responses(self):
+        responses = helper.ModuleHelper.default_responses(self.fields,
+                                                          self.defaults)
+        if len(responses[SSH_NETWORK]) == 0:
+            log.warning("Empty address, changed to 0.0.0.0/0")
+            responses[SSH_NETWORK] = "0.0.0.0/0"
+        return responses
+
+    def apply(self, args, responses=None):
+        responses = self.check(args) if responses is None else responses
         if responses is False:
             log.error("Check failed. Not applying")
             return False
 
         if utils.is_post_deployment():
-            self.parent.apply_tasks.add(self.apply_to_master)
+            self.parent.puppet_scheduler.add_manifest(
+                consts.PUPPET_FUEL_MASTER)
 
         self.save(responses)
         return True
 
-    def apply_to_master(self):
-        """Apply changes to the Fuel master"""
-
-        msg = "Apply settings to Fuel master."
-        log.info(msg)
-        self.parent.footer.set_text(msg)
-        self.parent.refreshScreen()
-
-        result, msg = puppet.puppetApplyManifest(consts.PUPPET_FUEL_MASTER)
-
-        self.parent.footer.set_text(msg)
-        return result
-
     def save(self, responses):
         newsettings = helper.ModuleHelper.make_settings_from_responses(
             responses)
@@ -128,9 +128,13 @@ class ServicePasswords(urwid.WidgetWrap):
                 responses[fieldname] = self.edits[index].get_edit_text()
         return responses
 
-    def apply(self, args):
+    def default_responses(self):
+        return modulehelper.ModuleHelper.default_responses(self.fields,
+                                                           self.defaults)
+
+    def apply(self, args, responses=None):
         log.debug('start saving servicepws')
-        responses = self.check(args)
+        responses = self.check(args) if responses is None else responses
         if responses is False:
             log.error("Check failed. Not applying")
             log.error("%s" % (responses))
@@ -18,6 +18,10 @@ import unittest
 
 import mock
 
+from fuelmenu.common import checkcache
+from fuelmenu.common import probes
+from fuelmenu.common import puppet
+from fuelmenu.common import tasks
 from fuelmenu import settings
 
 
@@ -25,5 +29,9 @@ class BaseModuleTests(unittest.TestCase):
 
     def setUp(self):
         super(BaseModuleTests, self).setUp()
-        self.parent = mock.Mock(apply_tasks=set(),
+        self.parent = mock.Mock(apply_tasks=tasks.TaskPipeline(),
+                                check_cache=checkcache.CheckCache(
+                                    state=lambda: None),
+                                probes=probes.ProbeRunner(),
+                                puppet_scheduler=puppet.ApplyScheduler(),
                                 settings=settings.Settings({}))
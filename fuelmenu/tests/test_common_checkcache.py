@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2016 Mirantis, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import unittest
+
+import mock
+
+from fuelmenu.common import checkcache
+
+
+class TestCheckCache(unittest.TestCase):
+
+    def setUp(self):
+        super(TestCheckCache, self).setUp()
+        self.state = {'eth0': '10.20.0.2'}
+        self.notify = mock.Mock()
+        self.cache = checkcache.CheckCache(state=lambda: dict(self.state),
+                                           notify=self.notify)
+        self.responses = {'HOSTNAME': 'fuel', 'DNS_UPSTREAM': '8.8.8.8'}
+
+    def _store(self):
+        key, result = self.cache.lookup("DNS", self.responses)
+        self.assertIsNone(result)
+        self.cache.store("DNS", key, self.responses)
+
+    def test_reuses_result(self):
+        self._store()
+        _, result = self.cache.lookup("DNS", dict(self.responses))
+
+        self.assertEqual(self.responses, result)
+        self.assertIsNot(self.responses, result)
+        self.assertEqual(1, self.notify.call_count)
+
+    def test_changed_inputs(self):
+        self._store()
+        self.assertIsNone(self.cache.lookup(
+            "DNS", dict(self.responses, HOSTNAME='master'))[1])
+        self.assertIsNone(self.cache.lookup("NTP", self.responses)[1])
+
+    def test_changed_state(self):
+        self._store()
+        self.state['eth0'] = '10.20.0.3'
+        self.assertIsNone(self.cache.lookup("DNS", self.responses)[1])
+        self.assertFalse(self.notify.called)
+
+    @mock.patch('time.time')
+    def test_expired(self, m_time):
+        m_time.return_value = 1000.0
+        self._store()
+        m_time.return_value += checkcache.CHECK_TTL
+        self.assertIsNone(self.cache.lookup("DNS", self.responses)[1])
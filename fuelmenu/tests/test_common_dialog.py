@@ -73,3 +73,25 @@ class TestDisplayDialog(TestModalDialogBase):
             original_widget, self.object.parent.mainloop)
         self.assertEqual(
             self.object.parent.mainloop.widget, m_dialog.return_value)
+
+    @mock.patch('fuelmenu.common.dialog.ModalDialog')
+    @mock.patch('urwid.Pile')
+    def test_deferred(self, m_pile, m_dialog):
+        original_widget = self.object.parent.mainloop.widget
+        with dialog.deferred() as dialogs:
+            self.assertTrue(dialog.deferring())
+            self.assertIsNone(dialog.display_dialog(
+                self.object, self.body, self.title, self.escape_key))
+
+        self.assertFalse(dialog.deferring())
+        self.assertFalse(m_dialog.called)
+        self.assertEqual(original_widget, self.object.parent.mainloop.widget)
+        self.assertEqual(
+            [(self.object, self.body, self.title, self.escape_key)], dialogs)
+
+        dialog.show_deferred(dialogs)
+        m_dialog.assert_called_once_with(
+            self.title, m_pile.return_value, self.escape_key,
+            original_widget, self.object.parent.mainloop)
+        self.assertEqual(
+            self.object.parent.mainloop.widget, m_dialog.return_value)
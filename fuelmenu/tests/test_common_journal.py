@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2016 Mirantis, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import collections
+import os
+import shutil
+import tempfile
+import unittest
+
+from fuelmenu.common import journal
+
+
+class TestSaveJournal(unittest.TestCase):
+
+    def setUp(self):
+        super(TestSaveJournal, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = os.path.join(self.tmpdir, 'lib', 'save-journal.json')
+
+    def test_digest_ignores_order(self):
+        ordered = collections.OrderedDict([('b', 1), ('a', [1, 2])])
+        self.assertEqual(journal.digest({'a': [1, 2], 'b': 1}),
+                         journal.digest(ordered))
+        self.assertNotEqual(journal.digest({'a': [2, 1], 'b': 1}),
+                            journal.digest(ordered))
+
+    def test_record_survives_restart(self):
+        journal.SaveJournal(self.path).record(
+            "save:Network Setup", "digest", tasks=["puppet_classes"])
+
+        restarted = journal.SaveJournal(self.path)
+        self.assertTrue(restarted.completed("save:Network Setup", "digest"))
+        self.assertFalse(restarted.completed("save:Network Setup", "other"))
+        self.assertFalse(restarted.completed("save:Time Sync", "digest"))
+        self.assertEqual(["puppet_classes"],
+                         restarted.details("save:Network Setup")["tasks"])
+
+    def test_clear(self):
+        save_journal = journal.SaveJournal(self.path)
+        save_journal.record("apply:puppet_classes", "digest")
+        save_journal.clear()
+        save_journal.clear()
+
+        self.assertNotIn("apply:puppet_classes", save_journal)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_broken_journal_is_empty(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w') as journal_file:
+            journal_file.write("{broken")
+        self.assertEqual({}, journal.SaveJournal(self.path).steps)
@@ -17,8 +17,10 @@
 import mock
 import netifaces
 import unittest
+import urwid
 
 from fuelmenu.common import modulehelper
+from fuelmenu.common import probes
 from fuelmenu import settings as settings_module
 
 
@@ -186,60 +188,105 @@ class TestModuleHelperCancel(TestModuleHelperBase):
         self._run('cancel', self.modobj)
         self.assertFalse(self.edit.set_edit_text.called)
 
+    def test_cancel_without_screen(self):
+        modobj = mock.Mock(spec=['fields', 'defaults'])
+        modobj.fields = self.modobj.fields
+        modobj.defaults = self.modobj.defaults
+        self._run('cancel', modobj)
 
-@mock.patch('fuelmenu.common.urwidwrapper.SimpleListWalker',
-            return_value=mock.Mock())
-@mock.patch('fuelmenu.common.urwidwrapper.WalkerStoredListBox',
-            return_value=mock.Mock())
-@mock.patch('urwid.BoxAdapter', return_value=mock.Mock())
-@mock.patch('fuelmenu.common.modulehelper.ModuleHelper._create_widget',
-            return_value=mock.Mock(rows=mock.Mock(return_value=0)))
-@mock.patch('urwid.Text',
-            return_value=mock.Mock(rows=mock.Mock(return_value=0)))
+
+@mock.patch('fuelmenu.common.modulehelper.blank', urwid.Divider())
+class TestModuleHelperDefaultResponses(TestModuleHelperBase):
+    def setUp(self):
+        super(TestModuleHelperDefaultResponses, self).setUp()
+        self.fields = [modulehelper.BLANK_KEY, "label", "HOSTNAME",
+                       "DNS_UPSTREAM", "SKIP", "choice", "apply_button"]
+        self.defaults = {
+            "label": {"label": "Label",
+                      "type": modulehelper.WidgetType.LABEL},
+            "HOSTNAME": {"label": "Hostname", "value": "fuel"},
+            "DNS_UPSTREAM": {"label": "DNS", "value": None,
+                             "tooltip": "Upstream DNS"},
+            "SKIP": {"label": "Skip", "value": 1,
+                     "type": modulehelper.WidgetType.CHECKBOX},
+            "choice": {"label": "Choice", "choices": ["Yes", "No"],
+                       "type": modulehelper.WidgetType.RADIO},
+            "apply_button": {"label": "Apply",
+                             "type": modulehelper.WidgetType.BUTTON},
+        }
+
+    def test_default_responses(self):
+        self._check('default_responses',
+                    {"HOSTNAME": "fuel", "DNS_UPSTREAM": "", "SKIP": True},
+                    self.fields, self.defaults)
+
+    def test_default_responses_match_widgets(self):
+        self.defaults["DNS_UPSTREAM"]["value"] = "8.8.8.8"
+        edits = self.helper.setup_widgets(mock.Mock(), self.fields,
+                                          self.defaults)
+        responses = self.helper.default_responses(self.fields,
+                                                  self.defaults)
+
+        self.assertEqual(edits[2].get_edit_text(), responses["HOSTNAME"])
+        self.assertEqual(edits[3].get_edit_text(),
+                         responses["DNS_UPSTREAM"])
+        self.assertEqual(edits[4].get_state(), responses["SKIP"])
+
+
+@mock.patch('fuelmenu.common.modulehelper.blank', urwid.Divider())
 class TestModuleHelperCreateListWidget(TestModuleHelperBase):
     def setUp(self):
         super(TestModuleHelperCreateListWidget, self).setUp()
         self.toolbar = mock.Mock()
-        modulehelper.blank = mock.Mock()
-        modulehelper.blank.rows = mock.Mock(return_value=0)
-
-    def test_create_list_widget(
-            self, m_text, m_create_widget, m_box, m_listbox, m_walker):
+        self.scheme = {'l1': {'label': 'L1'}, 'l2': {'label': 'L2'}}
         self.default_data.update({
-            'value': [{'l1': 'vl1'}, {'l1': 'vl2'}],
-            'value_scheme': {'l1': {'value': ''}}
+            'value': [{'l1': 'vl1', 'l2': ''}, {'l1': 'vl2', 'l2': ''}],
+            'value_scheme': self.scheme
         })
 
-        self._check('_create_list_widget', m_box.return_value,
-                    self.default_data, self.toolbar)
-        m_text.assert_called_once_with(self.default_data['label'])
-        # Called twice for two elements
-        m_create_widget.assert_has_calls([
-            mock.call('l1', {'value': 'vl1'}, self.toolbar),
-            mock.call('l1', {'value': 'vl2'}, self.toolbar)
-        ])
-        # Called twice for two elements and third on exit
-        m_listbox.assert_has_calls(
-            [mock.call(m_walker.return_value)] * 3
-        )
-        # Called twice for two elements and third on exit
-        m_walker.assert_has_calls(
-            [mock.call([m_create_widget.return_value, modulehelper.blank])] * 2
-            + [mock.call([m_text.return_value] + [m_box.return_value] * 2)]
-        )
-        # Called twice for two elements and third on exit
-        m_box.assert_has_calls([mock.call(m_listbox.return_value, 0)] * 3)
-
-    def test_create_list_widget_default(
-            self, m_text, m_create_widget, m_box, m_listbox, m_walker):
-        self._check('_create_list_widget', m_box.return_value,
-                    {}, self.toolbar)
-        self.assertFalse(m_text.called)
-        self.assertFalse(m_create_widget.called)
-        # Called once in the end
-        m_listbox.assert_called_once_with(m_walker.return_value)
-        m_walker.assert_called_once_with([])
-        m_box.assert_called_once_with(m_listbox.return_value, 0)
+    def test_create_list_widget(self):
+        list_widget = self.helper._create_list_widget(self.default_data,
+                                                      self.toolbar)
+        walker = list_widget.original_widget.list_walker
+        self.assertEqual(3, len(walker))
+        self.assertEqual(self.default_data['label'], walker[0].text)
+        # Label and two elements with two fields and blank line each
+        self.assertEqual(1 + 3 * 2, list_widget.height)
+        # Elements are not created until they are shown
+        self.assertIsNone(walker.cached(1))
+
+        item = walker[1]
+        self.assertEqual(3, item.height)
+        fields = item.original_widget.list_walker
+        self.assertEqual(['vl1', ''], [f.get_edit_text() for f in fields[:2]])
+        self.assertIs(modulehelper.blank, fields[2])
+        self.assertIs(item, walker.cached(1))
+        self.assertIsNone(walker.cached(2))
+
+    def test_create_list_widget_default(self):
+        list_widget = self.helper._create_list_widget({}, self.toolbar)
+        self.assertEqual(0, len(list_widget.original_widget.list_walker))
+        self.assertEqual(0, list_widget.height)
+
+    def test_create_list_widget_height_limited(self):
+        self.default_data['value'] *= 20
+        list_widget = self.helper._create_list_widget(self.default_data,
+                                                      self.toolbar)
+        self.assertEqual(modulehelper.LIST_MAX_ROWS, list_widget.height)
+        self.assertEqual(41, len(list_widget.original_widget.list_walker))
+
+    def test_append_list_item(self):
+        list_widget = self.helper._create_list_widget(self.default_data,
+                                                      self.toolbar)
+        self.helper.append_list_item(list_widget, {'l1': 'new'},
+                                     self.scheme, self.toolbar)
+        walker = list_widget.original_widget.list_walker
+        self.assertEqual(4, len(walker))
+        self.assertEqual(1 + 3 * 3, list_widget.height)
+        self.assertEqual(3, walker.get_focus()[1])
+        self.assertEqual(
+            'new',
+            walker[3].original_widget.list_walker[0].get_edit_text())
 
 
 @mock.patch('fuelmenu.common.urwidwrapper.TextLabel',
@@ -373,7 +420,7 @@ class TestModuleHelperCheckColumns(TestModuleHelperBase):
                     self.modobj, True)
         m_button.assert_has_calls(
             [
-                mock.call("Check", self.modobj.check),
+                mock.call("Check", mock.ANY),
                 mock.call("Cancel", self.modobj.cancel),
                 mock.call("Apply", self.modobj.apply)
             ],
@@ -383,14 +430,27 @@ class TestModuleHelperCheckColumns(TestModuleHelperBase):
             [m_button.return_value] * 3 +
             [('weight', 2, modulehelper.blank)]
         )
+        self._check_in_background(m_button.call_args_list[0][0][1])
 
     def test_get_check_column_global_save_true(
             self, m_button, m_columns):
         self.modobj.parent.globalsave = True
         self._check('_get_check_column', m_columns.return_value,
                     self.modobj, False)
-        m_button.assert_called_once_with("Check", self.modobj.check)
+        m_button.assert_called_once_with("Check", mock.ANY)
         m_columns.assert_called_once_with([m_button.return_value])
+        self._check_in_background(m_button.call_args[0][1])
+
+    def _check_in_background(self, callback):
+        runner = probes.ProbeRunner()
+        self.modobj.parent.probes = runner
+        self.modobj.check.side_effect = \
+            lambda button: runner.local.background
+        button = mock.Mock()
+
+        self.assertTrue(callback(button))
+        self.modobj.check.assert_called_once_with(button)
+        self.assertFalse(runner.local.background)
 
 
 class TestModuleHelper(TestModuleHelperBase):
@@ -71,6 +71,21 @@ class TestUtils(unittest.TestCase):
         netifaces_mock.interfaces.assert_called_once_with()
         self.assertEqual(['eth0'], data)
 
+    @mock.patch('fuelmenu.common.network.get_physical_ifaces',
+                return_value=['eth0'])
+    @mock.patch('fuelmenu.common.network.netifaces')
+    def test_get_state(self, netifaces_mock, _):
+        addresses = {netifaces.AF_INET: [{'addr': '10.20.0.2'}]}
+        netifaces_mock.ifaddresses.return_value = addresses
+        netifaces_mock.gateways.return_value = {
+            'default': {netifaces.AF_INET: ('10.20.0.1', 'eth0')}}
+
+        self.assertEqual(
+            ({'eth0': addresses},
+             {netifaces.AF_INET: ('10.20.0.1', 'eth0')}),
+            network.get_state())
+        netifaces_mock.ifaddresses.assert_called_once_with('eth0')
+
     @mock.patch('fuelmenu.common.network.netifaces')
     def test_list_host_ip_addresses(self, netifaces_mock):
         all_ifaces = ['eth0', 'lo', 'veth0']
@@ -150,3 +165,110 @@ class TestUtils(unittest.TestCase):
             self.assertRaises(errors.NetworkException,
                               network.search_external_dhcp,
                               interface, timeout)
+
+    def test_parse_ntpdate(self):
+        output = (
+            "server 192.0.2.1, stratum 2, offset -0.001234, delay 0.02571\n"
+            "server 192.0.2.2, stratum 16, offset 0.000000, delay 0.00000\n"
+            "19 Oct 10:00:00 ntpdate[42]: adjust time server 192.0.2.1 "
+            "offset -0.001234 sec\n")
+        self.assertEqual([(2, -0.001234, 0.02571), (16, 0.0, 0.0)],
+                         network.parse_ntpdate(output))
+
+    @mock.patch('fuelmenu.common.network.execute')
+    def test_measure_ntp(self, execute_mock):
+        line = "server 192.0.2.1, stratum 2, offset {0}, delay {1}\n"
+        execute_mock.side_effect = [
+            (0, line.format("0.010", "0.050"), ""),
+            (1, "", "no server suitable for synchronization found"),
+            (0, line.format("0.004", "0.020"), ""),
+            (0, line.format("0.001", "0.030"), ""),
+        ]
+        data = network.measure_ntp("ntp.example.com", samples=4, timeout=1)
+
+        execute_mock.assert_called_with(
+            ["ntpdate", "-q", "-p1", "-t1", "ntp.example.com"])
+        self.assertEqual(4, execute_mock.call_count)
+        self.assertEqual("ntp.example.com", data["server"])
+        self.assertEqual(3, data["samples"])
+        self.assertEqual(0.004, data["offset"])
+        self.assertEqual(0.020, data["delay"])
+        self.assertAlmostEqual(0.003873, data["jitter"], places=6)
+
+    @mock.patch('fuelmenu.common.network.execute',
+                return_value=(1, "", ""))
+    def test_measure_ntp_no_answer(self, execute_mock):
+        self.assertIsNone(network.measure_ntp("ntp.example.com", samples=2))
+        self.assertEqual(2, execute_mock.call_count)
+
+    @mock.patch('fuelmenu.common.network.open', create=True)
+    def test_get_default_route(self, open_mock):
+        open_mock.return_value.__enter__.return_value = [
+            "Iface\tDestination\tGateway\tFlags\n",
+            "eth0\t0014A8C0\t00000000\t0001\n",
+            "eth1\t00000000\t010014AC\t0003\n"]
+        self.assertEqual(('172.20.0.1', 'eth1'), network.get_default_route())
+
+    @mock.patch('fuelmenu.common.network.netifaces')
+    def test_is_on_link(self, netifaces_mock):
+        netifaces_mock.AF_INET = netifaces.AF_INET
+        netifaces_mock.interfaces.return_value = ['eth0', 'eth1']
+        netifaces_mock.ifaddresses.side_effect = [
+            {},
+            {netifaces.AF_INET: [{'addr': '10.20.0.2',
+                                  'netmask': '255.255.255.0'}]}]
+        self.assertTrue(network.is_on_link('10.20.0.5'))
+        self.assertTrue(network.is_on_link('127.0.0.1'))
+        self.assertFalse(network.is_on_link('ntp.example.com'))
+
+    @mock.patch('fuelmenu.common.network.execute')
+    @mock.patch('fuelmenu.common.network.get_default_route',
+                return_value=None)
+    def test_gateway_reachable_without_route(self, _, execute_mock):
+        self.assertFalse(network.gateway_reachable())
+        self.assertFalse(execute_mock.called)
+
+    @mock.patch('fuelmenu.common.network.execute', return_value=(0, "", ""))
+    @mock.patch('fuelmenu.common.network.get_default_route',
+                return_value=('10.20.0.1', 'eth0'))
+    def test_gateway_reachable(self, _, execute_mock):
+        self.assertTrue(network.gateway_reachable())
+        execute_mock.assert_called_once_with(
+            ["arping", "-c1", "-w1", "-I", "eth0", "10.20.0.1"])
+
+
+@mock.patch('fuelmenu.common.network.is_on_link', return_value=False)
+@mock.patch('fuelmenu.common.network.gateway_reachable', return_value=False)
+class TestGatewayCheck(unittest.TestCase):
+
+    def test_result_is_shared(self, reachable_mock, _):
+        warn = mock.Mock()
+        check = network.GatewayCheck(warn=warn, state=lambda: None)
+
+        self.assertFalse(check.can_reach('ntp.example.com'))
+        self.assertFalse(check.can_reach('8.8.8.8'))
+        reachable_mock.assert_called_once_with()
+        self.assertEqual(1, warn.call_count)
+
+    def test_result_expires(self, reachable_mock, _):
+        check = network.GatewayCheck(ttl=0, state=lambda: None)
+        check.reachable()
+        check.reachable()
+        self.assertEqual(2, reachable_mock.call_count)
+
+    def test_state_change_resets_result(self, reachable_mock, _):
+        state = mock.Mock(return_value='eth0 down')
+        check = network.GatewayCheck(state=state)
+        self.assertFalse(check.reachable())
+
+        state.return_value = 'eth0 up'
+        reachable_mock.return_value = True
+        self.assertTrue(check.reachable())
+        self.assertTrue(check.reachable())
+        self.assertEqual(2, reachable_mock.call_count)
+
+    def test_on_link_host_skips_check(self, reachable_mock, on_link_mock):
+        on_link_mock.return_value = True
+        check = network.GatewayCheck(state=lambda: None)
+        self.assertTrue(check.can_reach('10.20.0.5'))
+        self.assertFalse(reachable_mock.called)
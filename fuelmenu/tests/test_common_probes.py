@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2016 Mirantis, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import threading
+import unittest
+
+import mock
+
+from fuelmenu.common import probes
+
+
+class TestProbeRunner(unittest.TestCase):
+
+    def setUp(self):
+        super(TestProbeRunner, self).setUp()
+        self.report = mock.Mock()
+        self.runner = probes.ProbeRunner(report=self.report)
+
+    def test_run_waits_for_probe(self):
+        self.assertEqual(["DNS failed"],
+                         self.runner.run("DNS", lambda: ["DNS failed"]))
+        self.assertFalse(self.report.called)
+
+    def test_quick_skips_probe(self):
+        probe = mock.Mock()
+        self.runner.quick = True
+        self.assertIsNone(self.runner.run("DNS", probe))
+        self.assertFalse(probe.called)
+
+    def test_background(self):
+        with self.runner.background():
+            self.assertIsNone(self.runner.run("DNS", lambda: []))
+        self.runner.wait("DNS")
+
+        self.report.assert_called_once_with("DNS", [])
+        self.assertEqual(["NTP failed"],
+                         self.runner.run("NTP", lambda: ["NTP failed"]))
+
+    def test_background_describe(self):
+        with self.runner.background():
+            self.runner.run("DHCP", lambda: (["10.20.0.3"], []),
+                            describe=lambda found: found[0] + found[1])
+        self.runner.wait_all()
+
+        self.report.assert_called_once_with("DHCP", ["10.20.0.3"])
+        self.assertEqual({}, self.runner.running)
+
+    def test_background_failure(self):
+        def probe():
+            raise ValueError("no dig")
+
+        with self.runner.background():
+            self.runner.run("DNS", probe)
+        self.runner.wait("DNS")
+
+        self.report.assert_called_once_with(
+            "DNS", ["Network checks failed: no dig"])
+
+    def test_outdated_result_is_dropped(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_probe():
+            started.set()
+            release.wait()
+            return ["outdated"]
+
+        with self.runner.background():
+            self.runner.run("DNS", slow_probe)
+            started.wait()
+            first = self.runner.running["DNS"][1]
+            self.runner.run("DNS", lambda: ["current"])
+        self.runner.wait("DNS")
+        release.set()
+        first.join()
+
+        self.report.assert_called_once_with("DNS", ["current"])
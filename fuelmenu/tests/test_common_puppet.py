@@ -15,9 +15,13 @@
 #    under the License.
 
 import mock
+import os
+import shutil
+import tempfile
 import unittest
 
 from fuelmenu.common import puppet
+from fuelmenu import consts
 
 
 @mock.patch('fuelmenu.common.puppet.logging')
@@ -80,3 +84,133 @@ class TestPuppetApply(unittest.TestCase):
         self.assertEqual(puppet.puppetApply(self.classes), False)
         m_log.error.assert_called_once_with(
             'Exit code: %d. Error: %s Stdout: %s', res[0], res[2], res[1])
+
+
+@mock.patch('fuelmenu.common.puppet.puppetApply', return_value=True)
+@mock.patch('fuelmenu.common.puppet.puppetApplyManifest',
+            return_value=(True, 'Puppet apply successfully executed.'))
+class TestApplyScheduler(unittest.TestCase):
+    def setUp(self):
+        super(TestApplyScheduler, self).setUp()
+        self.scheduler = puppet.ApplyScheduler()
+        self.resource = {
+            'type': 'resource',
+            'class': 'fuel::dnsmasq::dhcp_range',
+            'name': 'default',
+            'params': {'dhcp_start_address': '10.20.0.3'}
+        }
+
+    def test_deduplicates_manifests(self, m_manifest, m_apply):
+        self.scheduler.add_manifest(consts.PUPPET_NAILGUN)
+        self.scheduler.add_manifest(consts.PUPPET_FUEL_MASTER)
+        self.scheduler.add_manifest(consts.PUPPET_NAILGUN)
+
+        jobs = self.scheduler.jobs()
+        self.assertEqual([consts.PUPPET_NAILGUN, consts.PUPPET_FUEL_MASTER],
+                         [name for name, _ in jobs])
+        self.assertTrue(all(job() for _, job in jobs))
+        self.assertEqual([mock.call(consts.PUPPET_NAILGUN, progress=None),
+                          mock.call(consts.PUPPET_FUEL_MASTER,
+                                    progress=None)],
+                         m_manifest.call_args_list)
+        self.assertFalse(m_apply.called)
+        self.assertFalse(self.scheduler)
+
+    def test_merges_classes(self, m_manifest, m_apply):
+        literal = {'type': 'literal', 'name': 'literal_1'}
+        updated = dict(self.resource,
+                       params={'dhcp_start_address': '10.0.0.5'})
+        self.scheduler.add_classes([literal, self.resource])
+        self.scheduler.add_classes([literal, updated])
+
+        self.assertEqual(1, len(self.scheduler))
+        [(name, job)] = self.scheduler.jobs()
+        self.assertEqual(puppet.CLASSES_JOB, name)
+        self.assertTrue(job())
+        m_apply.assert_called_once_with([literal, updated], progress=None)
+        self.assertFalse(self.scheduler)
+        self.assertFalse(m_manifest.called)
+
+    def test_failure_keeps_requests(self, m_manifest, m_apply):
+        m_manifest.return_value = (False, 'Puppet apply failed.')
+        self.scheduler.add_manifest(consts.PUPPET_NAILGUN)
+        self.scheduler.add_classes([self.resource])
+
+        m_apply.return_value = False
+        self.assertEqual([False, False],
+                         [job() for _, job in self.scheduler.jobs()])
+        self.assertEqual(2, len(self.scheduler))
+
+    def test_discard(self, m_manifest, m_apply):
+        self.scheduler.add_manifest(consts.PUPPET_NAILGUN)
+        self.scheduler.add_manifest(consts.PUPPET_FUEL_MASTER)
+        self.scheduler.add_classes([self.resource])
+
+        self.scheduler.discard(consts.PUPPET_NAILGUN)
+        self.scheduler.discard(puppet.CLASSES_JOB)
+        self.assertEqual([consts.PUPPET_FUEL_MASTER],
+                         [name for name, _ in self.scheduler.jobs()])
+
+
+class TestPuppetProgress(unittest.TestCase):
+    def setUp(self):
+        super(TestPuppetProgress, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.logfile = os.path.join(self.tmpdir, 'puppet.log')
+        self.write("2016-06-01 10:00:00 +0000 Puppet (notice): old run\n")
+        self.report = mock.Mock()
+        self.progress = puppet.PuppetProgress(
+            "Applying nailgun.pp", self.report, logfile=self.logfile)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        super(TestPuppetProgress, self).tearDown()
+
+    def write(self, data, mode='a'):
+        with open(self.logfile, mode) as logfile:
+            logfile.write(data)
+
+    def test_reads_only_new_lines(self):
+        self.assertEqual([], self.progress.read_lines())
+        self.write("2016-06-01 10:01:00 +0000 Puppet (notice): "
+                   "Compiled catalog\n2016-06-01")
+        self.assertEqual(
+            ["2016-06-01 10:01:00 +0000 Puppet (notice): Compiled catalog"],
+            self.progress.read_lines())
+        self.write(" 10:01:01 +0000 Puppet (notice): Finished\n")
+        self.assertEqual(
+            ["2016-06-01 10:01:01 +0000 Puppet (notice): Finished"],
+            self.progress.read_lines())
+
+    def test_reads_truncated_log(self):
+        self.write("2016-06-01 10:01:00 +0000 Puppet (notice): new\n",
+                   mode='w')
+        self.assertEqual(
+            ["2016-06-01 10:01:00 +0000 Puppet (notice): new"],
+            self.progress.read_lines())
+
+    def test_reports_progress(self):
+        self.write(
+            "2016-06-01 10:01:00 +0000 Puppet (notice): Compiled catalog "
+            "for master in environment production in 2.10 seconds\n"
+            "2016-06-01 10:01:01 +0000 /Stage[main]/Fuel::Nailgun::Server/"
+            "Service[nailgun] (debug): Starting to evaluate the resource\n"
+            "2016-06-01 10:01:02 +0000 /Stage[main]/Fuel::Nailgun::Server/"
+            "Exec[syncdb] (err): Failed to call refresh\n")
+        self.progress()
+
+        self.assertEqual("Exec[syncdb]", self.progress.resource)
+        self.assertEqual("catalog compiled", self.progress.phase)
+        self.assertEqual(["Failed to call refresh"], self.progress.errors)
+        self.report.assert_called_once_with(
+            "Applying nailgun.pp: Exec[syncdb] [0s] - 1 error(s), last: "
+            "Failed to call refresh")
+
+    def test_finished(self):
+        self.write("2016-06-01 10:01:00 +0000 /Stage[main]/Service[nailgun] "
+                   "(notice): ensure changed 'stopped' to 'running'\n"
+                   "2016-06-01 10:01:01 +0000 Puppet (notice): Finished "
+                   "catalog run in 12.34 seconds\n")
+        self.progress()
+        self.report.assert_called_once_with("Applying nailgun.pp: "
+                                            "finished [0s]")
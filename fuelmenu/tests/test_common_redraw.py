@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2016 Mirantis, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import threading
+import unittest
+
+import mock
+
+from fuelmenu.common import redraw
+
+
+@mock.patch('fuelmenu.common.redraw.time.time')
+class TestRedrawScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = mock.Mock()
+        self.draw = mock.Mock()
+
+    def make_scheduler(self, m_time, now=100.0):
+        m_time.return_value = now
+        return redraw.RedrawScheduler(self.loop, self.draw, interval=0.1)
+
+    def test_first_request_draws_immediately(self, m_time):
+        scheduler = self.make_scheduler(m_time)
+        scheduler.request()
+        self.draw.assert_called_once_with()
+        self.assertFalse(self.loop.set_alarm_in.called)
+
+    def test_requests_coalesced(self, m_time):
+        scheduler = self.make_scheduler(m_time)
+        scheduler.request()
+        m_time.return_value = 100.04
+        for _ in range(5):
+            scheduler.request()
+
+        self.assertEqual(1, self.draw.call_count)
+        self.loop.set_alarm_in.assert_called_once_with(
+            mock.ANY, scheduler._on_alarm)
+        self.assertAlmostEqual(0.06,
+                               self.loop.set_alarm_in.call_args[0][0])
+
+        scheduler._on_alarm(self.loop, None)
+        self.assertEqual(2, self.draw.call_count)
+        self.assertIsNone(scheduler.alarm)
+
+    def test_request_after_interval_cancels_alarm(self, m_time):
+        scheduler = self.make_scheduler(m_time)
+        scheduler.request()
+        m_time.return_value = 100.05
+        scheduler.request()
+        # UI thread was busy and alarm couldn't fire
+        m_time.return_value = 100.5
+        scheduler.request()
+
+        self.assertEqual(2, self.draw.call_count)
+        self.loop.remove_alarm.assert_called_once_with(
+            self.loop.set_alarm_in.return_value)
+
+    def test_flush_draws_pending_redraw(self, m_time):
+        scheduler = self.make_scheduler(m_time)
+        scheduler.request()
+        scheduler.flush()
+        self.assertEqual(1, self.draw.call_count)
+
+        m_time.return_value = 100.04
+        scheduler.request()
+        self.assertTrue(scheduler.pending())
+        scheduler.flush()
+        self.assertEqual(2, self.draw.call_count)
+        self.assertFalse(scheduler.pending())
+        self.loop.remove_alarm.assert_called_once_with(
+            self.loop.set_alarm_in.return_value)
+
+    def test_render_rate(self, m_time):
+        scheduler = self.make_scheduler(m_time)
+        for now in (100.0, 100.05, 100.5, 101.0, 101.02):
+            m_time.return_value = now
+            scheduler.request()
+
+        self.assertEqual(3.0, scheduler.rate)
+        # The last request is deferred and counted for the next interval
+        self.assertEqual(0, scheduler.renders)
+        self.assertEqual(1, scheduler.requests)
+
+
+class TestFooter(unittest.TestCase):
+
+    def setUp(self):
+        self.footer = redraw.Footer(u"Status messages go here.")
+
+    def post(self, text):
+        thread = threading.Thread(target=self.footer.set_text, args=(text,))
+        thread.start()
+        thread.join()
+
+    def test_other_threads_are_queued(self):
+        self.post("Applying nailgun.pp")
+        self.assertEqual(u"Status messages go here.", self.footer.text)
+
+        self.footer.show_queued()
+        self.assertEqual("Applying nailgun.pp", self.footer.text)
+
+    @mock.patch('fuelmenu.common.redraw.time.time', return_value=100.0)
+    def test_deferred_redraw_keeps_direct_text(self, m_time):
+        loop = mock.Mock()
+        scheduler = redraw.RedrawScheduler(loop, self.footer.show_queued,
+                                           interval=0.1)
+        scheduler.request()
+        self.post("Applying nailgun.pp: finished [42s]")
+        m_time.return_value = 100.05
+        scheduler.request()
+        self.footer.set_text("All changes saved successfully!")
+
+        scheduler._on_alarm(loop, None)
+        self.assertEqual("All changes saved successfully!", self.footer.text)
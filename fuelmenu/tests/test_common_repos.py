@@ -0,0 +1,430 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import gzip
+import io
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import unittest
+
+import mock
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+
+from fuelmenu.common import repos
+
+
+class RepoHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        delay = self.server.delays.get(self.path)
+        if delay:
+            time.sleep(delay)
+        body = self.server.files.get(self.path)
+        etag = '"{0}"'.format(hash(body))
+        if body is None:
+            self.send_response(404)
+            body = b''
+        elif self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            body = b''
+        else:
+            self.send_response(200)
+            self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_CONNECT(self):
+        self.server.requests.append('CONNECT ' + self.path)
+        self.send_response(200 if self.server.tunnel else 403)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class RepoServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """Local stand-in for a mirror serving files from a dict."""
+
+    daemon_threads = True
+
+    def __init__(self, files=None):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0),
+                                           RepoHandler)
+        self.files = files or {}
+        self.delays = {}
+        self.requests = []
+        # Whether CONNECT requests are allowed when acting as a proxy
+        self.tunnel = True
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{0}'.format(self.server_address[1])
+
+    def handle_error(self, request, client_address):
+        # Clients giving up on slow responses are expected
+        pass
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def unused_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class TestRepoChecker(unittest.TestCase):
+
+    def setUp(self):
+        super(TestRepoChecker, self).setUp()
+        self.server = RepoServer({
+            '/ubuntu/dists/trusty/Release': b'Suite: trusty\n',
+            '/ubuntu/dists/trusty-updates/Release': b'Suite: trusty-updates\n',
+        })
+        self.addCleanup(self.server.stop)
+        self.checker = repos.RepoChecker(request_timeout=(1, 1))
+        # Don't route requests to the stand-in through a proxy
+        self.checker.session.trust_env = False
+
+    def test_release_url(self):
+        self.assertEqual('http://mirror/ubuntu/dists/trusty/Release',
+                         repos.release_url('http://mirror/ubuntu/', 'trusty'))
+
+    def test_check(self):
+        urls = [repos.release_url(self.server.url + '/ubuntu', suite)
+                for suite in ('trusty', 'trusty-updates', 'trusty-missing')]
+
+        self.assertEqual(dict(zip(urls, ({'Suite': 'trusty'},
+                                         {'Suite': 'trusty-updates'},
+                                         None))),
+                         self.checker.check(urls))
+
+    def test_check_unreachable_host(self):
+        base = 'http://127.0.0.1:{0}/ubuntu'.format(unused_port())
+        urls = [repos.release_url(base, suite)
+                for suite in ('trusty', 'trusty-updates')]
+        good = repos.release_url(self.server.url + '/ubuntu', 'trusty')
+
+        self.assertEqual({urls[0]: None, urls[1]: None,
+                          good: {'Suite': 'trusty'}},
+                         self.checker.check(urls + [good]))
+
+    def test_check_deadline(self):
+        self.server.delays['/ubuntu/dists/trusty/Release'] = 2
+        self.checker.deadline = 0.3
+        urls = [repos.release_url(self.server.url + '/ubuntu', suite)
+                for suite in ('trusty', 'trusty-updates')]
+
+        started = time.time()
+        self.assertEqual({urls[0]: None, urls[1]: None},
+                         self.checker.check(urls))
+        self.assertLess(time.time() - started, 1)
+        self.assertEqual(['/ubuntu/dists/trusty/Release'],
+                         self.server.requests)
+
+
+class TestRelease(unittest.TestCase):
+    release = [
+        "Origin: Ubuntu",
+        "Suite: trusty-updates",
+        "Codename: trusty",
+        "Architectures: amd64 arm64 i386",
+        "Components: main restricted universe multiverse",
+        "MD5Sum:",
+        " 0123 1024 main/binary-amd64/Packages",
+    ]
+
+    def test_parse_release_header(self):
+        self.assertEqual(
+            {'Suite': 'trusty-updates', 'Codename': 'trusty',
+             'Architectures': 'amd64 arm64 i386',
+             'Components': 'main restricted universe multiverse'},
+            repos.parse_release_header(self.release))
+
+    def test_parse_release_header_stops_early(self):
+        lines = iter(self.release[:5] + ['Date: never read'])
+        repos.parse_release_header(lines)
+        self.assertEqual(['Date: never read'], list(lines))
+
+    def test_parse_inrelease_header(self):
+        lines = ["-----BEGIN PGP SIGNED MESSAGE-----", "Hash: SHA256",
+                 ""] + self.release[1:3] + ["SHA256:", " 0123 1 Packages"]
+        self.assertEqual({'Suite': 'trusty-updates', 'Codename': 'trusty'},
+                         repos.parse_release_header(lines))
+
+    def test_validate_release(self):
+        fields = repos.parse_release_header(self.release)
+        self.assertEqual([], repos.validate_release(
+            fields, 'trusty-updates', 'main universe'))
+        self.assertEqual(
+            ["suite xenial is not served, Release file is for trusty",
+             "component mian does not exist",
+             "architecture ppc64el is not supported"],
+            repos.validate_release(fields, 'xenial', 'mian', 'ppc64el'))
+
+    def test_validate_release_nested_components(self):
+        fields = {'Suite': 'stable', 'Components': 'updates/main'}
+        self.assertEqual([], repos.validate_release(fields, 'stable',
+                                                    'main'))
+
+
+def gzipped(data):
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb') as gz:
+        gz.write(data)
+    return buf.getvalue()
+
+
+class TestPackages(unittest.TestCase):
+    packages = (b"Package: ntp\nVersion: 1:4.2.6.p5+dfsg-3ubuntu2\n"
+                b"Depends: libc6\n\n"
+                b"Package: puppet\nArchitecture: all\nVersion: 3.4.3-1\n\n"
+                b"Package: puppet\nVersion: 3.8.5-1\n")
+
+    def setUp(self):
+        super(TestPackages, self).setUp()
+        self.server = RepoServer({
+            '/ubuntu/dists/trusty/main/binary-amd64/Packages.gz':
+                gzipped(self.packages),
+            '/mos/dists/mos/main/binary-amd64/Packages': b'',
+        })
+        self.addCleanup(self.server.stop)
+        self.checker = repos.RepoChecker(request_timeout=(1, 1))
+        self.checker.session.trust_env = False
+
+    def test_compare_versions(self):
+        for older, newer in (('1.0', '1.1'), ('1.0~rc1', '1.0'),
+                             ('1.0-1', '1.0-2'), ('2.0', '1:1.0'),
+                             ('1.0a', '1.0b'), ('1.9', '1.10'),
+                             ('1.0', '1.0+dfsg'), ('1.0-1~u14', '1.0-1')):
+            self.assertLess(repos.compare_versions(older, newer), 0,
+                            (older, newer))
+            self.assertGreater(repos.compare_versions(newer, older), 0,
+                               (newer, older))
+        self.assertEqual(0, repos.compare_versions('0:1.0-1', '1.0-1'))
+
+    def test_iter_lines_gzip(self):
+        data = gzipped(self.packages)
+        chunks = [data[i:i + 7] for i in range(0, len(data), 7)]
+        self.assertEqual(
+            self.packages.split(b'\n')[:-1],
+            list(repos.iter_lines(chunks, repos.packages_indexes()[-2][1]())))
+
+    def test_parse_packages(self):
+        self.assertEqual(
+            {'ntp': '1:4.2.6.p5+dfsg-3ubuntu2', 'puppet': '3.8.5-1'},
+            repos.parse_packages(self.packages.split(b'\n')))
+
+    def test_resolve_packages(self):
+        indexes = [
+            ('ubuntu', None, {'puppet': '3.8.5-1', 'ntp': '4.2'}),
+            ('mos', 1050, {'puppet': '3.8.4-1'}),
+            ('updates', None, {'ntp': '4.3'}),
+        ]
+        self.assertEqual(
+            ({'puppet': ('mos', '3.8.4-1'), 'ntp': ('updates', '4.3')},
+             ['nailgun-agent']),
+            repos.resolve_packages(['puppet', 'ntp', 'nailgun-agent'],
+                                   indexes))
+
+    def test_scan_packages(self):
+        apt_repos = [
+            {'name': 'ubuntu', 'uri': self.server.url + '/ubuntu',
+             'suite': 'trusty', 'section': 'main universe',
+             'priority': None},
+            {'name': 'mos', 'uri': self.server.url + '/mos',
+             'suite': 'mos', 'section': 'main', 'priority': 1050},
+        ]
+        indexes, errors = self.checker.scan_packages(apt_repos)
+        self.assertEqual(
+            [('ubuntu', None,
+              {'ntp': '1:4.2.6.p5+dfsg-3ubuntu2', 'puppet': '3.8.5-1'}),
+             ('mos', 1050, {})],
+            indexes)
+        self.assertEqual(["Repository ubuntu has no packages index for "
+                          "universe"], errors)
+
+
+class TestMirrorBenchmark(unittest.TestCase):
+
+    def setUp(self):
+        super(TestMirrorBenchmark, self).setUp()
+        self.server = RepoServer({
+            '/ubuntu/dists/trusty/Release': b'Suite: trusty\n',
+            '/ubuntu/dists/trusty/main/binary-amd64/Packages.gz':
+                b'x' * 300000,
+        })
+        self.addCleanup(self.server.stop)
+        self.checker = repos.RepoChecker(request_timeout=(1, 1))
+        self.checker.session.trust_env = False
+
+    def test_sample_url(self):
+        self.assertEqual(
+            'http://mirror/ubuntu/dists/trusty/universe/binary-amd64/'
+            'Packages.gz',
+            repos.sample_url('http://mirror/ubuntu', 'trusty',
+                             'universe multiverse'))
+
+    def test_benchmark(self):
+        result = self.checker.benchmark(self.server.url + '/ubuntu',
+                                        'trusty', 'main universe')
+        self.assertIsNone(result['error'])
+        self.assertGreater(result['throughput'], 0)
+        self.assertGreaterEqual(result['ttfb'], 0)
+        self.assertGreaterEqual(result['connect'], 0)
+        self.assertEqual(
+            ['/ubuntu/dists/trusty/main/binary-amd64/Packages.gz'],
+            self.server.requests)
+
+    def test_benchmark_release_fallback(self):
+        result = self.checker.benchmark(self.server.url + '/ubuntu',
+                                        'trusty', 'restricted')
+        self.assertIsNone(result['error'])
+        self.assertEqual(
+            '/ubuntu/dists/trusty/Release', self.server.requests[-1])
+
+    def test_benchmark_unreachable(self):
+        uri = 'http://127.0.0.1:{0}/ubuntu'.format(unused_port())
+        result = self.checker.benchmark(uri, 'trusty')
+        self.assertEqual(uri, result['uri'])
+        self.assertTrue(result['error'])
+
+    def test_rank_mirrors(self):
+        slow = {'uri': 'slow', 'ttfb': 0.1, 'throughput': 10, 'error': None}
+        fast = {'uri': 'fast', 'ttfb': 0.2, 'throughput': 90, 'error': None}
+        failed = {'uri': 'failed', 'ttfb': None, 'throughput': None,
+                  'error': 'timeout'}
+        self.assertEqual([fast, slow, failed],
+                         repos.rank_mirrors([failed, slow, fast]))
+
+
+class TestProxies(unittest.TestCase):
+    release = 'http://mirror.invalid/ubuntu/dists/trusty/Release'
+
+    def setUp(self):
+        super(TestProxies, self).setUp()
+        # The stand-in acts as a proxy, it gets absolute URLs as paths
+        self.proxy = RepoServer({self.release: b'Suite: trusty\n'})
+        self.addCleanup(self.proxy.stop)
+
+    def test_bypass_proxy(self):
+        no_proxy = repos.split_no_proxy('localhost, .example.com,10.0.0.0/8')
+        self.assertTrue(repos.bypass_proxy('http://localhost:8080/', no_proxy))
+        self.assertTrue(repos.bypass_proxy('http://a.example.com/', no_proxy))
+        self.assertTrue(repos.bypass_proxy('http://10.1.2.3/', no_proxy))
+        self.assertFalse(repos.bypass_proxy('http://example.org/', no_proxy))
+        self.assertFalse(repos.bypass_proxy('http://11.1.2.3/', no_proxy))
+        self.assertTrue(repos.bypass_proxy('http://any/', ['*']))
+
+    @mock.patch.dict(os.environ, {'HTTP_PROXY': 'http://127.0.0.1:1'})
+    def test_session_proxies(self):
+        checker = repos.RepoChecker(request_timeout=(1, 1),
+                                    proxies={'http': self.proxy.url})
+        self.assertEqual({self.release: {'Suite': 'trusty'}},
+                         checker.check([self.release]))
+        self.assertEqual([self.release], self.proxy.requests)
+
+    def test_no_proxy(self):
+        checker = repos.RepoChecker(proxies={'http': 'http://127.0.0.1:1'},
+                                    no_proxy='127.0.0.1')
+        url = self.proxy.url + '/dists/trusty/Release'
+        self.assertIsNone(checker.proxy_for(url))
+        self.assertEqual({url: None}, checker.check([url]))
+        self.assertEqual(['/dists/trusty/Release'], self.proxy.requests)
+
+    def test_probe_connect(self):
+        checker = repos.RepoChecker(request_timeout=(1, 1))
+        result = checker.probe('https://mirror.invalid/ubuntu/',
+                               self.proxy.url)
+        self.assertIsNone(result['error'])
+        self.assertGreaterEqual(result['latency'], 0)
+        self.assertEqual(['CONNECT mirror.invalid:443'], self.proxy.requests)
+
+        self.proxy.tunnel = False
+        result = checker.probe('https://mirror.invalid/ubuntu/',
+                               self.proxy.url)
+        self.assertIn('403', result['error'])
+
+    def test_probe_proxies(self):
+        dead = 'http://127.0.0.1:{0}'.format(unused_port())
+        checker = repos.RepoChecker(request_timeout=(1, 1),
+                                    proxies={'http': dead})
+        url = self.proxy.url + '/dists/trusty/Release'
+        results = checker.probe_proxies({'http': url})
+
+        self.assertEqual({('http', None), ('http', dead)}, set(results))
+        self.assertIsNone(results[('http', None)]['error'])
+        self.assertTrue(results[('http', dead)]['error'])
+
+
+class TestRepoCache(unittest.TestCase):
+
+    def setUp(self):
+        super(TestRepoCache, self).setUp()
+        self.server = RepoServer({
+            '/ubuntu/dists/trusty/Release': b'Suite: trusty\n',
+        })
+        self.addCleanup(self.server.stop)
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = os.path.join(self.tmpdir, 'cache', 'repos.json')
+        self.url = repos.release_url(self.server.url + '/ubuntu', 'trusty')
+
+    def check(self, ttl=repos.CACHE_TTL):
+        checker = repos.RepoChecker(cache=repos.RepoCache(self.path, ttl))
+        checker.session.trust_env = False
+        return checker.check([self.url])[self.url]
+
+    def test_fresh_entry_skips_request(self):
+        self.assertTrue(self.check())
+        self.assertTrue(self.check())
+        self.assertEqual(1, len(self.server.requests))
+
+    def test_conditional_request(self):
+        self.assertTrue(self.check(ttl=0))
+        self.assertTrue(self.check(ttl=0))
+        self.assertEqual(2, len(self.server.requests))
+        cache = repos.RepoCache(self.path)
+        self.assertEqual({'If-None-Match': cache.entries[self.url]['etag']},
+                         cache.headers(self.url))
+
+    def test_inaccessible_not_cached(self):
+        self.assertTrue(self.check())
+        del self.server.files['/ubuntu/dists/trusty/Release']
+        self.assertFalse(self.check(ttl=0))
+        self.assertEqual({}, repos.RepoCache(self.path).entries)
+
+    def test_broken_cache_file(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w') as cache_file:
+            cache_file.write('{broken')
+        self.assertEqual({}, repos.RepoCache(self.path).entries)
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2016 Mirantis, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import threading
+import unittest
+
+import mock
+
+from fuelmenu.common import dialog
+from fuelmenu.common import tasks
+
+
+class TestTaskPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.pipeline = tasks.TaskPipeline()
+        self.calls = []
+
+    def _task(self, name, result=True):
+        def task():
+            self.calls.append(name)
+            return result
+        task.__name__ = name
+        return task
+
+    def test_task_name(self):
+        self.assertEqual("name", tasks.task_name("name"))
+        self.assertEqual("TestTaskPipeline.setUp",
+                         tasks.task_name(self.setUp))
+
+    def test_run_respects_requirements(self):
+        self.pipeline.add(self._task("second"), requires=("first",))
+        self.pipeline.add(self._task("first"))
+        self.pipeline.add(self._task("third"), requires=("second",))
+
+        self.assertTrue(self.pipeline.run())
+        self.assertEqual(["first", "second", "third"], self.calls)
+        self.assertEqual(0, len(self.pipeline))
+        self.assertEqual(
+            [tasks.SUCCEEDED] * 3,
+            [result.outcome for result in self.pipeline.results])
+
+    def test_run_independent_tasks_concurrently(self):
+        barrier = threading.Event()
+        started = []
+
+        def waiting():
+            started.append("waiting")
+            return barrier.wait(5)
+
+        def releasing():
+            started.append("releasing")
+            barrier.set()
+            return True
+
+        self.pipeline.add(waiting)
+        self.pipeline.add(releasing)
+
+        self.assertTrue(self.pipeline.run())
+        self.assertEqual({"waiting", "releasing"}, set(started))
+
+    def test_run_stops_after_failure(self):
+        self.pipeline.add(self._task("broken", result=False))
+        self.pipeline.add(self._task("dependent"), requires=("broken",))
+
+        self.assertFalse(self.pipeline.run())
+        self.assertEqual(["broken"], self.calls)
+        self.assertEqual(2, len(self.pipeline))
+        self.assertEqual(
+            [("broken", tasks.FAILED), ("dependent", tasks.SKIPPED)],
+            [(r.name, r.outcome) for r in self.pipeline.results])
+
+    def test_run_exception_is_failure(self):
+        self.pipeline.add(mock.Mock(side_effect=ValueError), name="raising")
+        self.assertFalse(self.pipeline.run())
+        self.assertIn("raising", self.pipeline)
+
+    def test_run_unsatisfiable_requirements(self):
+        self.pipeline.add(self._task("one"), requires=("two",))
+        self.pipeline.add(self._task("two"), requires=("one",))
+
+        self.assertFalse(self.pipeline.run())
+        self.assertEqual([], self.calls)
+        self.assertEqual(
+            [tasks.SKIPPED] * 2,
+            [result.outcome for result in self.pipeline.results])
+
+    def test_run_retries_only_failed(self):
+        flaky = mock.Mock(side_effect=[False, True])
+        self.pipeline.add(self._task("stable"))
+        self.pipeline.add(flaky, name="flaky", requires=("stable",))
+
+        self.assertFalse(self.pipeline.run())
+        self.assertTrue(self.pipeline.run())
+        self.assertEqual(["stable"], self.calls)
+        self.assertEqual(2, flaky.call_count)
+
+    def test_discard_satisfies_requirement(self):
+        self.pipeline.add(self._task("done"))
+        self.pipeline.add(self._task("next"), requires=("done",))
+        self.pipeline.discard("done")
+        self.pipeline.discard("missing")
+
+        self.assertTrue(self.pipeline.run())
+        self.assertEqual(["next"], self.calls)
+
+    def test_run_calls_wait(self):
+        wait = mock.Mock()
+        self.pipeline.add(self._task("task"))
+        self.assertTrue(self.pipeline.run(wait=wait))
+        self.assertTrue(wait.called)
+
+    @mock.patch('fuelmenu.common.dialog.ModalDialog')
+    @mock.patch('urwid.Pile')
+    def test_run_shows_dialogs_of_failed_tasks(self, m_pile, m_dialog):
+        modobj = mock.Mock()
+        started = {"first": threading.Event(), "second": threading.Event()}
+        shown_by = []
+        m_dialog.side_effect = \
+            lambda *args: shown_by.append(threading.current_thread())
+
+        def failing(name, other):
+            def task():
+                # Both tasks fail at the same time
+                started[name].set()
+                started[other].wait(5)
+                dialog.display_dialog(modobj, "body", name)
+                return False
+            return task
+
+        self.pipeline.add(failing("first", "second"), name="first")
+        self.pipeline.add(failing("second", "first"), name="second")
+
+        self.assertFalse(self.pipeline.run())
+        self.assertEqual(
+            set(["first", "second"]),
+            set(args[0][0] for args in m_dialog.call_args_list))
+        self.assertEqual([threading.current_thread()] * 2, shown_by)
@@ -13,6 +13,7 @@
 #    under the License.
 
 import mock
+import threading
 import time
 import unittest
 
@@ -39,3 +40,69 @@ class TestRunWithTimeout(unittest.TestCase):
         method = mock.Mock(return_value='result')
         self.assertEqual('result', timeout.run_with_timeout(method, timeout=0))
         method.assert_called_once_with()
+
+    def test_run_with_timeout_reraises(self):
+        method = mock.Mock(side_effect=ValueError)
+        with self.assertRaises(ValueError):
+            timeout.run_with_timeout(method, timeout=1)
+
+    def test_run_with_timeout_cancels_deadline(self):
+        deadlines = []
+
+        def method():
+            deadlines.append(timeout.current())
+            time.sleep(1)
+
+        with self.assertRaises(timeout.TimeoutError):
+            timeout.run_with_timeout(method, timeout=0.05)
+        self.assertTrue(deadlines[0].cancelled())
+
+    def test_run_with_timeout_nested(self):
+        inner = mock.Mock(side_effect=lambda: timeout.remaining())
+        left = timeout.run_with_timeout(
+            timeout.run_with_timeout, (inner,), {'timeout': 60}, timeout=5)
+        self.assertLessEqual(left, 5)
+
+
+class TestDeadline(unittest.TestCase):
+    def test_no_deadline(self):
+        self.assertIsNone(timeout.current())
+        self.assertIsNone(timeout.remaining())
+        self.assertEqual(7, timeout.remaining(7))
+        timeout.check()
+
+    def test_nested(self):
+        with timeout.Deadline(60) as outer:
+            with timeout.Deadline(5) as inner:
+                self.assertIs(inner, timeout.current())
+                self.assertLessEqual(timeout.remaining(), 5)
+            with timeout.Deadline(120):
+                self.assertLessEqual(timeout.remaining(), 60)
+            self.assertIs(outer, timeout.current())
+        self.assertIsNone(timeout.current())
+
+    def test_expired(self):
+        with timeout.Deadline(0) as deadline:
+            self.assertTrue(deadline.expired())
+            self.assertRaises(timeout.TimeoutError, timeout.check)
+
+    def test_cancel_propagates_to_nested(self):
+        with timeout.Deadline() as outer:
+            with timeout.Deadline(60) as inner:
+                self.assertFalse(inner.expired())
+                outer.cancel()
+                self.assertTrue(inner.expired())
+                self.assertRaises(timeout.TimeoutError, inner.check)
+
+    def test_inherit(self):
+        seen = []
+        with timeout.Deadline(5) as deadline:
+            func = timeout.inherit(lambda: seen.append(timeout.current()))
+        thread = threading.Thread(target=func)
+        thread.start()
+        thread.join()
+        self.assertEqual([deadline], seen)
+
+    def test_inherit_without_deadline(self):
+        func = mock.Mock()
+        self.assertIs(func, timeout.inherit(func))
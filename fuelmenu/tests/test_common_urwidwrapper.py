@@ -14,11 +14,200 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-from fuelmenu.common import urwidwrapper
+import mock
 import unittest
+import urwid
+
+from fuelmenu.common import urwidwrapper
 
 
 class TestUtils(unittest.TestCase):
 
     def test_urwidwrapper_correctly_maps_checkbox_object(self):
         urwidwrapper.CheckBox('Label')
+
+
+class TestTabbedListWalker(unittest.TestCase):
+
+    def setUp(self):
+        self.walker = urwidwrapper.TabbedListWalker(['a', 'b', 'c', 'd'])
+
+    def test_insert_before_focus(self):
+        self.walker.set_focus(2)
+        self.walker.insert(1, ['x', 'y'])
+        self.assertEqual(['a', 'x', 'y', 'b', 'c', 'd'], self.walker.lst)
+        self.assertEqual(('c', 4), self.walker.get_focus())
+
+    def test_insert_after_focus(self):
+        self.walker.insert(1, ['x'])
+        self.assertEqual(('a', 0), self.walker.get_focus())
+
+    def test_remove(self):
+        self.walker.set_focus(3)
+        self.walker.remove(1, 2)
+        self.assertEqual(['a', 'd'], self.walker.lst)
+        self.assertEqual(('d', 1), self.walker.get_focus())
+
+    def test_remove_focused(self):
+        self.walker.set_focus(2)
+        self.walker.remove(1, 2)
+        self.assertEqual(('a', 0), self.walker.get_focus())
+
+
+class TestLazyListWalker(unittest.TestCase):
+
+    def setUp(self):
+        self.label = urwidwrapper.TextLabel('label')
+        self.factory = mock.Mock(side_effect=urwidwrapper.TextLabel)
+        self.walker = urwidwrapper.LazyListWalker([self.label, 'a', 'b'],
+                                                  self.factory)
+
+    def test_widgets_created_on_demand(self):
+        self.assertEqual((self.label, 0), self.walker.get_focus())
+        self.assertFalse(self.factory.called)
+        self.assertIsNone(self.walker.cached(1))
+
+        item, pos = self.walker.get_next(0)
+        self.assertEqual(1, pos)
+        self.assertEqual('a', item.text)
+        self.factory.assert_called_once_with('a')
+        self.assertIs(item, self.walker.cached(1))
+        self.assertIsNone(self.walker.cached(2))
+
+    def test_widgets_cached(self):
+        self.assertIs(self.walker[-1], self.walker.get_prev(3)[0])
+        self.assertEqual(1, self.factory.call_count)
+        self.assertEqual((None, None), self.walker.get_next(2))
+
+    def test_append(self):
+        self.walker.append('c')
+        self.assertEqual(4, len(self.walker))
+        self.assertFalse(self.factory.called)
+        self.assertEqual('c', self.walker[3].text)
+        self.assertRaises(IndexError, self.walker.__getitem__, 4)
+
+
+class CountingText(urwid.Text):
+    """Text counting renders which were not served from canvas cache."""
+
+    def __init__(self, *args, **kwargs):
+        super(CountingText, self).__init__(*args, **kwargs)
+        self.renders = 0
+
+    def render(self, size, focus=False):
+        self.renders += 1
+        return super(CountingText, self).render(size, focus)
+
+
+class TestTooltips(unittest.TestCase):
+
+    def setUp(self):
+        self.toolbar = CountingText('')
+        self.fields = [
+            urwidwrapper.TextField(name, name, 10, default_value=name,
+                                   tooltip='tip ' + name,
+                                   toolbar=self.toolbar)
+            for name in ('a', 'b', 'c')]
+
+    def test_focus_change_shows_tooltip(self):
+        walker = urwidwrapper.TabbedListWalker(list(self.fields))
+        listbox = urwid.ListBox(walker)
+        listbox.keypress((30, 5), 'down')
+        self.assertEqual('tip b', self.toolbar.text)
+        walker.tab_next()
+        self.assertEqual('tip c', self.toolbar.text)
+        walker.tab_prev()
+        self.assertEqual('tip b', self.toolbar.text)
+
+    def test_new_screen_shows_tooltip(self):
+        walker = urwidwrapper.TabbedListWalker(list(self.fields))
+        urwidwrapper.show_tooltip(urwid.ListBox(walker))
+        self.assertEqual('tip a', self.toolbar.text)
+
+    def test_column_focus_change_shows_tooltip(self):
+        row = urwidwrapper.Columns(self.fields[:2])
+        row.keypress((61,), 'right')
+        self.assertEqual('tip b', self.toolbar.text)
+        row.keypress((61,), 'shift tab')
+        self.assertEqual('tip a', self.toolbar.text)
+
+    def test_nested_list_focus_change_shows_tooltip(self):
+        nested = urwidwrapper.WalkerStoredListBox(
+            urwidwrapper.SimpleListWalker(list(self.fields)))
+        nested.keypress((30, 5), 'down')
+        self.assertEqual('tip b', self.toolbar.text)
+
+    def test_typing_does_not_rebuild_toolbar(self):
+        walker = urwidwrapper.TabbedListWalker(list(self.fields))
+        frame = urwid.Frame(urwid.ListBox(walker), footer=self.toolbar)
+        size = (30, 10)
+        walker.tab_next()
+        # Cached canvases are kept only while the last one is referenced,
+        # as the screen does
+        self.canvas = frame.render(size, focus=True)
+        renders = self.toolbar.renders
+
+        for key in 'keystrokes':
+            frame.keypress(size, key)
+            self.canvas = frame.render(size, focus=True)
+
+        self.assertEqual('tip b', self.toolbar.text)
+        self.assertEqual('bkeystrokes', self.fields[1].get_edit_text())
+        # Every keystroke used to set the text again and rebuild the canvas
+        self.assertEqual(renders, self.toolbar.renders)
+
+
+class TestSelectableIndex(unittest.TestCase):
+
+    def make_widgets(self, pattern):
+        return [mock.Mock(**{'selectable.return_value': char == 's'})
+                for char in pattern]
+
+    def test_index(self):
+        index = urwidwrapper.SelectableIndex(self.make_widgets('-s--s-'))
+        self.assertEqual((1, 4), (index.first, index.last))
+        self.assertEqual([1, 4, 4, 4, 1, 1], index.next)
+        self.assertEqual([4, 4, 1, 1, 1, 4], index.prev)
+
+    def test_index_nothing_selectable(self):
+        index = urwidwrapper.SelectableIndex(self.make_widgets('--'))
+        self.assertIsNone(index.first)
+        self.assertEqual([None, None], index.next)
+
+    def test_walker_tab_uses_index(self):
+        widgets = self.make_widgets('-s-s--')
+        walker = urwidwrapper.TabbedListWalker(widgets)
+        walker.tab_next()
+        self.assertEqual(1, walker.focus)
+        calls = sum(w.selectable.call_count for w in widgets)
+        walker.tab_next()
+        self.assertEqual(3, walker.focus)
+        walker.tab_next()
+        self.assertEqual(1, walker.focus)
+        walker.tab_prev()
+        self.assertEqual(3, walker.focus)
+        # Tab doesn't ask widgets again until the contents change
+        self.assertEqual(calls, sum(w.selectable.call_count for w in widgets))
+
+        walker.insert(2, self.make_widgets('s'))
+        self.assertEqual(4, walker.focus)
+        walker.tab_prev()
+        self.assertEqual(2, walker.focus)
+
+    def test_columns_tab(self):
+        columns = urwidwrapper.TabbedColumns(
+            [urwid.Button('a'), urwid.Divider(), urwid.Button('b')])
+        size = (40,)
+        self.assertIsNone(columns.keypress(size, 'tab'))
+        self.assertEqual(2, columns.focus_position)
+        # Passed on instead of wrapping around
+        self.assertEqual('tab', columns.keypress(size, 'tab'))
+        self.assertIsNone(columns.keypress(size, 'shift tab'))
+        self.assertEqual(0, columns.focus_position)
+
+        columns.contents.append((urwid.Button('c'),
+                                 columns.options('weight', 1)))
+        columns.focus_position = 2
+        self.assertIsNone(columns.keypress(size, 'tab'))
+        self.assertEqual(3, columns.focus_position)
+        self.assertEqual(0, columns.first_selectable())
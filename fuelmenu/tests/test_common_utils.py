@@ -14,10 +14,14 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import json
 import os
+import shutil
 import signal
 import tempfile
+import time
 
+from fuelmenu.common import timeout
 from fuelmenu.common import utils
 
 import mock
@@ -78,6 +82,57 @@ class TestUtils(unittest.TestCase):
             data = utils.get_fuel_version()
             self.assertEqual("", data)
 
+    @mock.patch('fuelmenu.common.utils.subprocess.Popen')
+    def test_execute_progress(self, m_popen):
+        process = self.make_process_mock()
+        process.poll.return_value = 0
+        m_popen.return_value = process
+        progress = mock.Mock()
+
+        self.assertEqual((0, 'stdout', 'stderr'),
+                         utils.execute(['ls'], progress=progress))
+        process.communicate.assert_called_once_with(input=None)
+        self.assertTrue(progress.called)
+
+    def test_execute_killed_on_deadline(self):
+        started = time.time()
+        with timeout.Deadline(0.2):
+            self.assertRaises(timeout.TimeoutError,
+                              utils.execute, ['sleep', '10'])
+        self.assertLess(time.time() - started, 5)
+
+    def test_parallel_map_inherits_deadline(self):
+        with timeout.Deadline(5) as deadline:
+            self.assertEqual(
+                [deadline] * 3,
+                utils.parallel_map(lambda _: timeout.current(), range(3)))
+
+    def test_parallel_map(self):
+        self.assertEqual([1, 4, 9, 16],
+                         utils.parallel_map(lambda x: x * x, [1, 2, 3, 4],
+                                            max_workers=2))
+
+    def test_parallel_map_reraises(self):
+        def func(item):
+            if item == 2:
+                raise ValueError(item)
+            return item
+
+        self.assertRaises(ValueError, utils.parallel_map, func, [1, 2, 3])
+
+    def test_write_json(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'cache', 'state.json')
+
+        utils.write_json(path, {'step': 1})
+        utils.write_json(path, {'step': 2})
+
+        with open(path) as state_file:
+            self.assertEqual({'step': 2}, json.load(state_file))
+        self.assertEqual(['state.json'],
+                         os.listdir(os.path.dirname(path)))
+
     def test_lock_running(self):
         lock_file = tempfile.mktemp()
         self.assertTrue(utils.lock_running(lock_file))
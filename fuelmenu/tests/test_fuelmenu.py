@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2016 Mirantis, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import mock
+import urwid
+
+from fuelmenu.common import dialog
+from fuelmenu.common import redraw
+from fuelmenu import fuelmenu
+from fuelmenu.modules import cobblerconf
+from fuelmenu.modules import restore
+
+
+class FakeModule(object):
+    """Module of the menu checked and saved by FuelSetup."""
+
+    visible = True
+
+    def __init__(self, parent, name, responses=None):
+        self.parent = parent
+        self.name = name
+        self.responses = responses or {name + "/value": "value"}
+        self.checked = 0
+        self.applied = []
+        self.saved = []
+        self.warning = None
+        self.task = None
+        self.loaded = 0
+
+    def refresh(self):
+        pass
+
+    def check(self, args):
+        self.parent.footer.set_text("Checking data...")
+        self.parent.refreshScreen()
+        self.checked += 1
+        if self.warning:
+            dialog.display_dialog(self, urwid.Text(self.warning),
+                                  "Check warning")
+        self.parent.footer.set_text("No errors found.")
+        return self.responses
+
+    def apply(self, args, responses=None):
+        responses = self.check(args) if responses is None else responses
+        if not responses:
+            return False
+        self.parent.footer.set_text("Applying changes...")
+        self.parent.refreshScreen()
+        self.applied.append(responses)
+        if self.task is not None:
+            self.parent.apply_tasks.add(self.task, name=self.name + "-task")
+        self.save(responses)
+        return True
+
+    def save(self, responses):
+        self.saved.append(responses)
+
+    def load(self):
+        self.loaded += 1
+
+    def screenUI(self):
+        return mock.Mock()
+
+
+class FakeDefaultsModule(FakeModule):
+    """Module saving its defaults in save-only mode."""
+
+    def __init__(self, parent, name, errors=()):
+        super(FakeDefaultsModule, self).__init__(parent, name)
+        self.errors = list(errors)
+
+    def default_responses(self):
+        return self.responses
+
+    def check_responses(self, responses):
+        return self.errors
+
+
+class TestFuelSetup(unittest.TestCase):
+
+    def setUp(self):
+        super(TestFuelSetup, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        for target, kwargs in (
+                ('fuelmenu.fuelmenu.FuelSetup.main', {}),
+                ('fuelmenu.common.network.get_physical_ifaces',
+                 {'return_value': ['eth0']}),
+                ('fuelmenu.common.utils.get_fuel_version',
+                 {'return_value': '10.0'}),
+                ('fuelmenu.settings.Settings.load', {}),
+                ('fuelmenu.settings.Settings.write', {}),
+                ('fuelmenu.consts.SAVE_JOURNAL_FILE',
+                 {'new': os.path.join(self.tmpdir, 'journal.yaml')})):
+            patcher = mock.patch(target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+        self.setup = fuelmenu.FuelSetup()
+        self.setup.footer = redraw.Footer(u"Status messages go here.")
+        self.state = mock.Mock(return_value="initial")
+        self.setup._system_state = self.state
+
+    def add_modules(self, *names):
+        modules = [FakeModule(self.setup, name) for name in names]
+        self.setup.children = modules
+        self.setup.choices = list(names)
+        self.setup.child = modules[0]
+        return modules
+
+    def test_save_coalesces_redraws(self):
+        self.add_modules("first", "second", "third")
+        loop = mock.Mock()
+        draw = mock.Mock()
+        self.setup.redraw = redraw.RedrawScheduler(loop, draw)
+
+        with mock.patch.object(redraw, 'time') as m_time:
+            m_time.time.return_value = 100.0
+            self.assertEqual((True, None), self.setup.global_save())
+
+        # The first request is drawn, the rest wait for a single alarm.
+        # Messages of the concurrent checks are drawn once they finish.
+        self.assertEqual(2, draw.call_count)
+        loop.set_alarm_in.assert_called_once_with(
+            mock.ANY, self.setup.redraw._on_alarm)
+
+    @mock.patch('fuelmenu.common.modulehelper.ModuleHelper.'
+                'get_default_gateway_linux', return_value='10.20.0.1')
+    @mock.patch('fuelmenu.common.modulehelper.ModuleHelper.getDHCP',
+                return_value=False)
+    @mock.patch('fuelmenu.common.modulehelper.ModuleHelper._get_net')
+    @mock.patch('fuelmenu.common.network.get_physical_ifaces',
+                return_value=['eth0', 'eth1'])
+    def test_restore_of_interface_reloads_pxe_setup(self, _, m_get_net,
+                                                    *args):
+        m_get_net.side_effect = lambda iface, dhcp: {
+            "addr": {"eth0": "10.20.0.2", "eth1": "10.30.0.2"}[iface],
+            "netmask": "255.255.255.0", "broadcast": "", "mac": "",
+            "link": "up", "bootproto": "none"}
+        admin_network = {
+            "interface": "eth0", "ipaddress": "10.20.0.2",
+            "netmask": "255.255.255.0", "mac": "",
+            "dhcp_pool_start": "10.20.0.3", "dhcp_pool_end": "10.20.0.254",
+            "dhcp_gateway": "10.20.0.2"}
+        self.setup.settings.update({"ADMIN_NETWORK": dict(admin_network)})
+        pxe = cobblerconf.CobblerConfig(self.setup)
+        restorer = restore.Restore(self.setup)
+        self.setup.children = [pxe, restorer]
+        self.setup.choices = [pxe.name, restorer.name]
+        self.setup.child = restorer
+        self.setup.childpage = restorer.screen
+        responses, _ = restorer.check_settings(
+            {"ADMIN_NETWORK": dict(admin_network, interface="eth1")})
+
+        self.assertTrue(restorer.apply(None, responses=responses))
+
+        self.assertEqual("eth1", pxe.activeiface)
+        self.assertIsNotNone(pxe.screen)
+
+    def test_save_defaults(self):
+        modules = [FakeDefaultsModule(self.setup, "first"),
+                   FakeDefaultsModule(self.setup, "second")]
+        self.setup.children = modules
+        self.setup.choices = ["first", "second"]
+
+        self.assertEqual((True, None), self.setup._save_defaults())
+
+        self.assertEqual([[m.responses] for m in modules],
+                         [m.saved for m in modules])
+        self.setup.settings.write.assert_called_once_with(
+            outfn=fuelmenu.consts.SETTINGS_FILE)
+
+    def test_save_defaults_rejects_invalid(self):
+        modules = [FakeDefaultsModule(self.setup, "first"),
+                   FakeDefaultsModule(self.setup, "second",
+                                      errors=["Invalid IP address"])]
+        self.setup.children = modules
+        self.setup.choices = ["first", "second"]
+
+        self.assertEqual((False, "second"), self.setup._save_defaults())
+
+        self.assertEqual([], modules[1].saved)
+        self.assertFalse(self.setup.settings.write.called)
+
+    @mock.patch('fuelmenu.common.dialog.ModalDialog')
+    def test_save_shows_deferred_dialogs_in_module_order(self, m_dialog):
+        first, second, third = self.add_modules("first", "second", "third")
+        self.setup.mainloop = mock.Mock()
+        first.warning = "First is slow"
+        second.warning = "Second is slow"
+        third.responses = False
+        shown = []
+        m_dialog.side_effect = lambda title, body, *args: shown.append(
+            (body.contents[0][0].text, threading.current_thread()))
+        # The second check finishes first, its dialog waits for the first
+        second_checked = threading.Event()
+        first_check = first.check
+
+        def slow_check(args):
+            second_checked.wait(5)
+            return first_check(args)
+        first.check = slow_check
+        second_check = second.check
+
+        def fast_check(args):
+            try:
+                return second_check(args)
+            finally:
+                second_checked.set()
+        second.check = fast_check
+
+        self.assertEqual((False, "third"), self.setup.global_save())
+
+        # Dialogs of the checks are shown by the UI thread in module order
+        main = threading.current_thread()
+        self.assertEqual([("First is slow", main), ("Second is slow", main)],
+                         shown)
+        self.assertEqual([1, 1, 1], [m.checked for m in (first, second,
+                                                         third)])
+        self.assertEqual([], third.applied)
+
+    def test_save_applies_checked_responses(self):
+        modules = self.add_modules("first", "second", "third")
+
+        self.assertEqual((True, None), self.setup.global_save())
+
+        # Modules are checked once, concurrently, and not again on apply
+        self.assertEqual([1, 1, 1], [m.checked for m in modules])
+        self.assertEqual([[m.responses] for m in modules],
+                         [m.applied for m in modules])
+        self.setup.settings.write.assert_called_once_with(
+            outfn=fuelmenu.consts.SETTINGS_FILE)
+
+    def test_save_checks_again_after_system_state_changed(self):
+        first, second, third = self.add_modules("first", "second", "third")
+        self.state.side_effect = lambda: \
+            "changed" if first.applied else "initial"
+
+        self.assertEqual((True, None), self.setup.global_save())
+
+        self.assertEqual([1, 2, 2], [m.checked for m in (first, second,
+                                                         third)])
+        self.assertEqual([[m.responses] for m in (first, second, third)],
+                         [m.applied for m in (first, second, third)])
+
+    def test_save_resumes_modules_applied_by_failed_save(self):
+        first, second = self.add_modules("first", "second")
+        first_task = mock.Mock(return_value=True)
+        second_task = mock.Mock(side_effect=[False, True])
+        first.task = first_task
+        second.task = second_task
+
+        self.assertEqual((False, None), self.setup.global_save())
+        self.assertEqual((True, None), self.setup.global_save())
+
+        # The first module and its task completed in the failed save,
+        # the second module is applied again as its task failed
+        self.assertEqual([[first.responses], [second.responses] * 2],
+                         [first.applied, second.applied])
+        self.assertEqual([first.responses] * 2, first.saved)
+        self.assertEqual(1, first_task.call_count)
+        self.assertEqual(2, second_task.call_count)
+        self.assertNotIn("save:first", self.setup.save_journal)
+
+    def test_save_applies_modules_after_changed_responses(self):
+        first, second = self.add_modules("first", "second")
+        second.task = mock.Mock(side_effect=[False, True])
+
+        self.assertEqual((False, None), self.setup.global_save())
+        first.responses = {"first/value": "changed"}
+        self.assertEqual((True, None), self.setup.global_save())
+
+        # Inputs of later modules chain responses of earlier ones
+        self.assertEqual([2, 2], [len(m.applied) for m in (first, second)])
+
+    def test_reload_modules_of_changed_settings(self):
+        pxe, dns, other = self.add_modules("pxe", "dns", "other")
+        pxe.defaults = {"ADMIN_NETWORK/interface": {}}
+        dns.defaults = {"DNS_DOMAIN": {}, "DNS_SEARCH": {}}
+        self.setup.child = dns
+        self.setup.childpage = dns.screen = mock.Mock()
+
+        self.setup.reload_modules(["ADMIN_NETWORK"])
+
+        # Modules with unknown settings are reloaded to be safe
+        self.assertEqual([1, 0, 1], [m.loaded for m in (pxe, dns, other)])
+        self.assertIs(self.setup.childpage, dns.screen)
+
+    def test_reload_modules_draws_reloaded_child(self):
+        pxe, dns = self.add_modules("pxe", "dns")
+        pxe.defaults = {"ADMIN_NETWORK/interface": {}}
+        dns.defaults = {"DNS_DOMAIN": {}}
+        self.setup.childpage = pxe.screen = mock.Mock()
+        self.setup.draw_child_screen = mock.Mock()
+
+        self.setup.reload_modules(["ADMIN_NETWORK/interface"])
+
+        self.assertEqual([1, 0], [m.loaded for m in (pxe, dns)])
+        self.setup.draw_child_screen.assert_called_once_with(pxe.screen)
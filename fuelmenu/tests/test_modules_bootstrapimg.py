@@ -13,9 +13,13 @@
 #    under the License.
 
 import os
+import shutil
+import tempfile
 
+import mock
 from mock import patch
 from requests import adapters
+import urwid
 
 from fuelmenu.modules import bootstrapimg
 from fuelmenu.tests import base
@@ -33,54 +37,408 @@ class TestBootstrapImg(base.BaseModuleTests):
         os.environ['NO_PROXY'] = ''
         os.environ['HTTPS_PROXY'] = ''
 
-    @patch.object(adapters.HTTPAdapter, 'send')
-    def test_check_url_without_proxies(self, send_mock):
-        self.module.check_url('http://some_url')
-
-        call_args = send_mock.call_args_list
-        self.assertEqual(1, len(call_args))
-        call_args = call_args[0]
+    def probe_repo(self, uri, http_proxy='', https_proxy='', no_proxy=''):
+        responses = {
+            bootstrapimg.BOOTSTRAP_HTTP_PROXY_KEY: http_proxy,
+            bootstrapimg.BOOTSTRAP_HTTPS_PROXY_KEY: https_proxy,
+            bootstrapimg.BOOTSTRAP_NO_PROXY_KEY: no_proxy,
+            bootstrapimg.BOOTSTRAP_REPOS_KEY: [
+                {'name': 'ubuntu', 'type': 'deb', 'priority': None,
+                 'uri': uri, 'suite': 'trusty', 'section': 'main'}],
+        }
+        errors, to_check = self.module._parse_apt_repos(responses)
+        self.assertEqual([], errors)
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        with patch('fuelmenu.consts.REPO_CACHE_FILE',
+                   os.path.join(cache_dir, 'repos.json')), \
+                patch('fuelmenu.common.repos.RepoChecker.probe_proxies',
+                      return_value={}):
+            self.module.probe_apt_repos(responses, to_check)
 
-        args, kwargs = call_args
+    def assert_sent_through(self, send_mock, proxy):
+        self.assertEqual(1, len(send_mock.call_args_list))
+        args, kwargs = send_mock.call_args
         self.assertIn('proxies', kwargs)
-        self.assertNotIn('http', kwargs['proxies'])
-        self.assertNotIn('https', kwargs['proxies'])
+        if proxy is None:
+            self.assertNotIn('http', kwargs['proxies'])
+            self.assertNotIn('https', kwargs['proxies'])
+        else:
+            self.assertEqual(proxy, kwargs['proxies']['http'])
+
+    @patch.object(adapters.HTTPAdapter, 'send')
+    def test_probe_apt_repos_without_proxies(self, send_mock):
+        self.probe_repo('http://some_url')
+        self.assert_sent_through(send_mock, None)
 
     @patch.object(adapters.HTTPAdapter, 'send')
-    def test_check_url_with_proxies(self, send_mock):
+    def test_probe_apt_repos_with_proxies(self, send_mock):
         http_proxy_url = 'http://http_proxy_url'
-        https_proxy_url = 'https://https_proxy_url'
-        os.environ['HTTP_PROXY'] = http_proxy_url
-        os.environ['HTTPS_PROXY'] = https_proxy_url
-        self.module.check_url('http://some_url')
+        # Proxies of the screen are used, not the environment
+        os.environ['HTTP_PROXY'] = 'http://environment_proxy_url'
+        self.probe_repo('http://some_url', http_proxy=http_proxy_url,
+                        https_proxy='https://https_proxy_url')
+        self.assert_sent_through(send_mock, http_proxy_url)
 
-        call_args = send_mock.call_args_list
-        self.assertEqual(1, len(call_args))
-        call_args = call_args[0]
+    @patch.object(adapters.HTTPAdapter, 'send')
+    def test_probe_apt_repos_with_no_proxy(self, send_mock):
+        self.probe_repo('http://direct_url',
+                        http_proxy='http://http_proxy_url',
+                        https_proxy='https://https_proxy_url',
+                        no_proxy='direct_url')
+        self.assert_sent_through(send_mock, None)
 
-        args, kwargs = call_args
-        self.assertIn('proxies', kwargs)
-        self.assertIn('http', kwargs['proxies'])
-        self.assertIn('https', kwargs['proxies'])
-        self.assertEqual(kwargs['proxies']['http'],
-                         http_proxy_url)
-        self.assertEqual(kwargs['proxies']['https'],
-                         https_proxy_url)
+    def check_apt_repos(self, responses):
+        errors, to_check = self.module._parse_apt_repos(responses)
+        return errors + self.module.probe_apt_repos(responses, to_check)
 
-    @patch.object(adapters.HTTPAdapter, 'send')
-    def test_check_url_with_no_proxy(self, send_mock):
-        http_proxy_url = 'http://http_proxy_url'
-        https_proxy_url = 'https://https_proxy_url'
-        os.environ['HTTP_PROXY'] = http_proxy_url
-        os.environ['HTTPS_PROXY'] = https_proxy_url
-        os.environ['NO_PROXY'] = 'direct_url'
-        self.module.check_url('http://direct_url')
+    @patch('fuelmenu.common.repos.RepoChecker.check')
+    def test_check_apt_repos(self, check_mock):
+        repo = {'name': 'ubuntu', 'type': 'deb', 'priority': None,
+                'uri': 'http://mirror/ubuntu', 'suite': 'trusty',
+                'section': 'main'}
+        release = 'http://mirror/ubuntu/dists/trusty/Release'
+        check_mock.return_value = {release: None}
+        responses = {
+            bootstrapimg.BOOTSTRAP_HTTP_PROXY_KEY: '',
+            bootstrapimg.BOOTSTRAP_HTTPS_PROXY_KEY: '',
+            bootstrapimg.BOOTSTRAP_NO_PROXY_KEY: '',
+            bootstrapimg.BOOTSTRAP_REPOS_KEY: [
+                repo, dict(repo, name='ubuntu-main')],
+        }
 
-        call_args = send_mock.call_args_list
-        self.assertEqual(1, len(call_args))
-        call_args = call_args[0]
+        self.assertEqual(
+            ["URL for repository ubuntu is not accessible.",
+             "URL for repository ubuntu-main is not accessible."],
+            self.check_apt_repos(responses))
+        check_mock.assert_called_once_with(
+            {release: [('ubuntu', 'trusty', 'main'),
+                       ('ubuntu-main', 'trusty', 'main')]})
 
-        args, kwargs = call_args
-        self.assertIn('proxies', kwargs)
-        self.assertNotIn('http', kwargs['proxies'])
-        self.assertNotIn('https', kwargs['proxies'])
+    @patch('fuelmenu.common.dialog.display_dialog')
+    @patch('fuelmenu.common.repos.RepoChecker.benchmark_mirrors')
+    def test_benchmark_mirrors(self, benchmark_mock, dialog_mock):
+        repo = {'name': 'ubuntu', 'type': 'deb', 'priority': None,
+                'uri': 'http://archive/ubuntu', 'suite': 'trusty',
+                'section': 'main'}
+        responses = {
+            bootstrapimg.BOOTSTRAP_HTTP_PROXY_KEY: '',
+            bootstrapimg.BOOTSTRAP_HTTPS_PROXY_KEY: '',
+            bootstrapimg.BOOTSTRAP_NO_PROXY_KEY: '',
+            bootstrapimg.BOOTSTRAP_ALT_MIRRORS_KEY: 'http://local/ubuntu/',
+            bootstrapimg.BOOTSTRAP_REPOS_KEY: [
+                repo, dict(repo, name='ubuntu-updates',
+                           suite='trusty-updates')],
+        }
+        benchmark_mock.return_value = [
+            {'uri': 'http://archive/ubuntu', 'connect': 0.1, 'ttfb': 0.3,
+             'throughput': 1024 * 1024, 'error': None},
+            {'uri': 'http://local/ubuntu/', 'connect': 0.001, 'ttfb': 0.01,
+             'throughput': 10 * 1024 * 1024, 'error': None},
+        ]
+
+        with patch.object(bootstrapimg.BootstrapImage, 'responses',
+                          new_callable=mock.PropertyMock,
+                          return_value=responses):
+            self.module.benchmark_mirrors(None)
+
+        benchmark_mock.assert_called_once_with(
+            [('http://archive/ubuntu', 'trusty', 'main'),
+             ('http://local/ubuntu/', 'trusty', 'main')])
+        msg = dialog_mock.call_args[0][1].text
+        self.assertIn("Suggested mirror for repository ubuntu: "
+                      "http://local/ubuntu", msg)
+        self.assertIn("Suggested priority order: http://local/ubuntu, "
+                      "http://archive/ubuntu", msg)
+
+    @patch('fuelmenu.common.dialog.display_dialog')
+    @patch('fuelmenu.common.utils.is_pre_deployment', return_value=True)
+    @patch('fuelmenu.common.repos.RepoChecker.scan_packages')
+    def test_verify_packages(self, scan_mock, pre_mock, dialog_mock):
+        ubuntu = {'name': 'ubuntu', 'type': 'deb', 'priority': None,
+                  'uri': 'http://archive/ubuntu', 'suite': 'trusty',
+                  'section': 'main'}
+        mos = dict(ubuntu, name='mos', uri='http://127.0.0.1:8080/mos',
+                   priority=1050)
+        responses = {
+            bootstrapimg.BOOTSTRAP_HTTP_PROXY_KEY: '',
+            bootstrapimg.BOOTSTRAP_HTTPS_PROXY_KEY: '',
+            bootstrapimg.BOOTSTRAP_NO_PROXY_KEY: '',
+            bootstrapimg.BOOTSTRAP_REPOS_KEY: [ubuntu, mos],
+        }
+        scan_mock.return_value = ([('ubuntu', None, {'ntp': '4.2'})], [])
+
+        with patch.object(bootstrapimg.BootstrapImage, 'responses',
+                          new_callable=mock.PropertyMock,
+                          return_value=responses), \
+                patch.object(bootstrapimg.BootstrapImage,
+                             '_required_packages',
+                             return_value=['ntp', 'fuel-agent']):
+            self.module.verify_packages(None)
+
+        scan_mock.assert_called_once_with([ubuntu])
+        msg = dialog_mock.call_args[0][1].text
+        self.assertIn("Packages not found in any repository: fuel-agent",
+                      msg)
+        self.assertIn("Not verified local repositories: mos", msg)
+        self.assertIn("ntp 4.2 (ubuntu)", msg)
+
+    @patch('fuelmenu.common.repos.RepoChecker.check', return_value={})
+    @patch('fuelmenu.common.repos.RepoChecker.probe_proxies')
+    def test_check_apt_repos_dead_proxy(self, probe_mock, check_mock):
+        proxy = 'http://proxy:3128'
+        repo = {'name': 'ubuntu', 'type': 'deb', 'priority': None,
+                'uri': 'http://mirror/ubuntu', 'suite': 'trusty',
+                'section': 'main'}
+        release = 'http://mirror/ubuntu/dists/trusty/Release'
+        probe_mock.return_value = {
+            ('http', proxy): {'latency': None, 'error': 'refused'},
+            ('http', None): {'latency': 0.1, 'error': None},
+        }
+        responses = {
+            bootstrapimg.BOOTSTRAP_HTTP_PROXY_KEY: proxy,
+            bootstrapimg.BOOTSTRAP_HTTPS_PROXY_KEY: '',
+            bootstrapimg.BOOTSTRAP_NO_PROXY_KEY: '',
+            bootstrapimg.BOOTSTRAP_REPOS_KEY: [repo],
+        }
+
+        self.assertEqual(
+            ["HTTP proxy http://proxy:3128 is not usable: refused."],
+            self.check_apt_repos(responses))
+        probe_mock.assert_called_once_with({'http': release})
+        check_mock.assert_called_once_with({})
+        self.assertEqual('', os.environ['HTTP_PROXY'])
+
+    @patch('fuelmenu.common.repos.RepoChecker.check', return_value={})
+    def test_check_apt_repos_without_gateway(self, check_mock):
+        self.module.parent.gateway_check.can_reach.return_value = False
+        repo = {'name': 'ubuntu', 'type': 'deb', 'priority': None,
+                'uri': 'http://mirror:8080/ubuntu', 'suite': 'trusty',
+                'section': 'main'}
+        responses = {
+            bootstrapimg.BOOTSTRAP_HTTP_PROXY_KEY: '',
+            bootstrapimg.BOOTSTRAP_HTTPS_PROXY_KEY: '',
+            bootstrapimg.BOOTSTRAP_NO_PROXY_KEY: '',
+            bootstrapimg.BOOTSTRAP_REPOS_KEY: [repo],
+        }
+
+        self.assertEqual(
+            ["URL for repository ubuntu is not accessible: no working "
+             "default gateway."],
+            self.check_apt_repos(responses))
+        self.module.parent.gateway_check.can_reach.assert_called_once_with(
+            'mirror')
+        check_mock.assert_called_once_with({})
+
+    def test_save_skips_screen_inputs(self):
+        self.module.save({
+            bootstrapimg.BOOTSTRAP_HTTP_PROXY_KEY: 'http://proxy:3128',
+            bootstrapimg.BOOTSTRAP_ALT_MIRRORS_KEY: 'http://local/ubuntu/',
+        })
+        self.assertEqual({'BOOTSTRAP': {'http_proxy': 'http://proxy:3128'}},
+                         dict(self.module.parent.settings))
+
+    @patch('fuelmenu.common.modulehelper.blank', urwid.Divider())
+    def test_default_responses_match_screen(self):
+        self.module.defaults[bootstrapimg.BOOTSTRAP_REPOS_KEY]['value'] = [
+            {'name': 'ubuntu', 'priority': '',
+             'uri': 'deb http://archive/ubuntu trusty main'},
+            {'name': '', 'priority': '', 'uri': ''}]
+        self.module.defaults[bootstrapimg.BOOTSTRAP_HTTP_PROXY_KEY][
+            'value'] = 'http://proxy:3128'
+        responses = self.module.default_responses()
+
+        self.module.screenUI()
+        self.assertEqual(self.module.responses, responses)
+        self.assertEqual(
+            ['ubuntu'],
+            [repo['name']
+             for repo in responses[bootstrapimg.BOOTSTRAP_REPOS_KEY]])
+
+    # Other tests replace the module level blank widget
+    @patch('fuelmenu.common.modulehelper.blank', urwid.Divider())
+    def test_add_repo(self):
+        self.module.screenUI()
+        repos_widget = self.module.edits[
+            self.module.fields.index(bootstrapimg.BOOTSTRAP_REPOS_KEY)]
+        walker = self.module.walker
+        widgets = list(walker.lst)
+        count = len(repos_widget.original_widget.list_walker)
+        height = repos_widget.height
+
+        self.module.add_repo()
+
+        self.assertEqual(widgets, walker.lst)
+        self.assertEqual(count + 1,
+                         len(repos_widget.original_widget.list_walker))
+        self.assertGreater(repos_widget.height, height)
+
+        new_repo = repos_widget.original_widget.list_walker[-1]
+        for edit in new_repo.original_widget.list_walker:
+            if hasattr(edit, 'caption'):
+                self.assertEqual('', edit.edit_text)
+                if edit.caption.strip() == 'Name':
+                    edit.set_edit_text('extra')
+        self.assertIn('extra', [
+            repo['name'] for repo in
+            self.module._get_repo_list_response(repos_widget)])
+
+    @patch('fuelmenu.common.modulehelper.blank', urwid.Divider())
+    def test_skip_build_toggle(self):
+        self.module.screenUI()
+        fields = self.module.fields
+        edits = list(self.module.edits)
+        widgets = list(self.module.walker.lst)
+
+        self.module.skip_build_callback(None, True)
+        self.assertEqual(self.module._common_fields, self.module.fields)
+        self.assertEqual(edits[:len(self.module.fields)], self.module.edits)
+        self.assertEqual(len(widgets) - len(self.module._repo_related_fields),
+                         len(self.module.walker.lst))
+        self.assertNotIn(bootstrapimg.BOOTSTRAP_REPOS_KEY,
+                         self.module.responses)
+
+        self.module.skip_build_callback(None, False)
+        self.assertEqual(fields, self.module.fields)
+        self.assertEqual(edits, self.module.edits)
+        self.assertEqual(widgets, self.module.walker.lst)
+
+    def test_iter_apt_sources(self):
+        sources = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, sources)
+        with open(os.path.join(sources, 'b.list'), 'w') as f:
+            f.write("# comment\n"
+                    "deb-src http://archive/ubuntu trusty main\n"
+                    "deb [arch=amd64 trusted=yes] http://archive/ubuntu "
+                    "trusty main  universe # inline comment\n"
+                    "deb http://mirror/mos  mos9.0\n"
+                    "broken line\n")
+        with open(os.path.join(sources, 'a.list'), 'w') as f:
+            f.write("deb http://archive/ubuntu trusty-updates main\n")
+        with open(os.path.join(sources, 'c.save'), 'w') as f:
+            f.write("deb http://old/ubuntu precise main\n")
+
+        self.assertEqual(
+            [('http://archive/ubuntu', 'trusty-updates', 'main'),
+             ('http://archive/ubuntu', 'trusty', 'main universe'),
+             ('http://mirror/mos', 'mos9.0', None)],
+            [(repo['uri'], repo['suite'], repo['section'])
+             for repo in self.module._iter_apt_sources(sources)])
+
+    @patch('fuelmenu.common.repos.validate_release', return_value=[])
+    @patch('fuelmenu.common.utils.is_pre_deployment', return_value=True)
+    @patch('fuelmenu.common.repos.RepoChecker.check')
+    def test_validate_imported(self, check_mock, pre_mock, validate_mock):
+        ubuntu = {'uri': 'http://archive/ubuntu', 'suite': 'trusty',
+                  'section': 'main'}
+        dead = dict(ubuntu, uri='http://dead/ubuntu')
+        local = dict(ubuntu, uri='http://127.0.0.1:8080/ubuntu')
+        check_mock.return_value = {
+            'http://archive/ubuntu/dists/trusty/Release': {'Suite': 'trusty'},
+            'http://dead/ubuntu/dists/trusty/Release': None,
+        }
+        responses = {
+            bootstrapimg.BOOTSTRAP_HTTP_PROXY_KEY: '',
+            bootstrapimg.BOOTSTRAP_HTTPS_PROXY_KEY: '',
+            bootstrapimg.BOOTSTRAP_NO_PROXY_KEY: '',
+        }
+
+        with patch('fuelmenu.common.repos.RepoCache'):
+            accepted, errors = self.module._validate_imported(
+                responses, [ubuntu, dead, local])
+
+        self.assertEqual([ubuntu, local], accepted)
+        self.assertEqual(["Repository http://dead/ubuntu trusty: URL is not "
+                          "accessible."], errors)
+        validate_mock.assert_called_once_with({'Suite': 'trusty'}, 'trusty',
+                                              'main')
+
+    @patch('fuelmenu.common.repos.RepoChecker.check', return_value={})
+    @patch('fuelmenu.common.repos.RepoChecker.probe_proxies')
+    def test_validate_imported_dead_proxy(self, probe_mock, check_mock):
+        proxy = 'http://proxy:3128'
+        ubuntu = {'uri': 'http://archive/ubuntu', 'suite': 'trusty',
+                  'section': 'main'}
+        probe_mock.return_value = {
+            ('http', proxy): {'latency': None, 'error': 'refused'},
+        }
+        responses = {
+            bootstrapimg.BOOTSTRAP_HTTP_PROXY_KEY: proxy,
+            bootstrapimg.BOOTSTRAP_HTTPS_PROXY_KEY: '',
+            bootstrapimg.BOOTSTRAP_NO_PROXY_KEY: '',
+        }
+
+        with patch('fuelmenu.common.repos.RepoCache'):
+            accepted, errors = self.module._validate_imported(
+                responses, [ubuntu])
+
+        self.assertEqual([], accepted)
+        self.assertEqual(
+            ["HTTP proxy http://proxy:3128 is not usable: refused."], errors)
+        check_mock.assert_called_once_with({})
+
+    @patch('fuelmenu.common.repos.RepoChecker.check', return_value={})
+    def test_validate_imported_without_gateway(self, check_mock):
+        ubuntu = {'uri': 'http://archive/ubuntu', 'suite': 'trusty',
+                  'section': 'main'}
+        self.module.parent.gateway_check.can_reach.return_value = False
+        responses = {
+            bootstrapimg.BOOTSTRAP_HTTP_PROXY_KEY: '',
+            bootstrapimg.BOOTSTRAP_HTTPS_PROXY_KEY: '',
+            bootstrapimg.BOOTSTRAP_NO_PROXY_KEY: '',
+        }
+
+        with patch('fuelmenu.common.repos.RepoCache'):
+            accepted, errors = self.module._validate_imported(
+                responses, [ubuntu])
+
+        self.assertEqual([], accepted)
+        self.assertEqual(["Repository http://archive/ubuntu trusty: URL is "
+                          "not accessible: no working default gateway."],
+                         errors)
+        self.module.parent.gateway_check.can_reach.assert_called_once_with(
+            'archive')
+        check_mock.assert_called_once_with({})
+
+    @patch('fuelmenu.common.modulehelper.blank', urwid.Divider())
+    @patch('fuelmenu.common.dialog.display_dialog')
+    def test_import_repos(self, dialog_mock):
+        self.module.defaults[bootstrapimg.BOOTSTRAP_REPOS_KEY]['value'] = [{
+            'name': 'ubuntu', 'priority': '',
+            'uri': 'deb http://archive/ubuntu/ trusty main'}]
+        self.module.defaults[bootstrapimg.BOOTSTRAP_SKIP_BUILD_KEY][
+            'value'] = False
+        self.module._select_fields_to_show(self.module.defaults)
+        self.module.screenUI()
+        sources = tempfile.NamedTemporaryFile()
+        sources.write("deb http://archive/ubuntu trusty main\n"
+                      "deb http://archive/ubuntu trusty-updates main\n"
+                      "deb http://archive/ubuntu trusty-security main\n"
+                      "deb http://mirror/ubuntu trusty-updates main\n")
+        sources.flush()
+        self.module.edits[self.module.fields.index(
+            bootstrapimg.IMPORT_SOURCES_KEY)].set_edit_text(sources.name)
+
+        def validate(responses, imported):
+            return imported[:-1], ["Repository broken."]
+
+        with patch.object(bootstrapimg.BootstrapImage, '_validate_imported',
+                          side_effect=validate) as validate_mock:
+            self.module.import_repos(None)
+
+        self.assertEqual(3, len(validate_mock.call_args[0][1]))
+        self.assertEqual(
+            [('ubuntu', 'http://archive/ubuntu/', 'trusty'),
+             ('archive-trusty-updates', 'http://archive/ubuntu',
+              'trusty-updates'),
+             ('archive-trusty-security', 'http://archive/ubuntu',
+              'trusty-security')],
+            [(repo['name'], repo['uri'], repo['suite'])
+             for repo in self.module.responses[
+                 bootstrapimg.BOOTSTRAP_REPOS_KEY]])
+        self.assertNotIn(bootstrapimg.IMPORT_SOURCES_KEY,
+                         self.module.responses)
+        msg = dialog_mock.call_args[0][1].text
+        self.assertIn("Imported 2 of 3 repositories", msg)
+        self.assertIn("Skipped 1 already listed.", msg)
+        self.assertIn("Repository broken.", msg)
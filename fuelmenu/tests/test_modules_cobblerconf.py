@@ -15,8 +15,10 @@
 #    under the License.
 from fuelclient.cli import error
 import mock
+import threading
 import urwid.widget
 
+from fuelmenu.common import puppet
 from fuelmenu.modules import cobblerconf
 from fuelmenu.tests import base
 
@@ -124,6 +126,78 @@ class TestCobblerConfig(base.BaseModuleTests):
         self.m_is_post_d.assert_called_once_with()
         self.m_mh_display_failed.assert_not_called()
 
+    def test_check_reuses_result(self):
+        self.assertEqual(self.responses, self.cobbler.check(None))
+        self.assertEqual(self.responses, self.cobbler.check(None))
+        self.m_search_external_dhcp.assert_called_once_with("eth0", 5)
+
+        self.set_edits_value("dhcp_pool_end", "192.168.133.200")
+        self.assertEqual("192.168.133.200",
+                         self.cobbler.check(None)[
+                             "ADMIN_NETWORK/dhcp_pool_end"])
+        self.assertEqual(2, self.m_search_external_dhcp.call_count)
+
+    def test_check_probes_in_background(self):
+        self.m_duplicateIPExists.return_value = True
+        with self.parent.probes.background():
+            self.assertEqual(self.responses, self.cobbler.check(None))
+        self.parent.probes.wait(self.cobbler.name)
+        self.m_duplicateIPExists.assert_called_once_with("192.168.133.2",
+                                                         "eth0", True)
+        self.m_mh_display_failed.assert_not_called()
+
+        # Incomplete result is not reused, the save probes again
+        self.assertFalse(self.cobbler.check(None))
+        self.assertEqual(2, self.m_duplicateIPExists.call_count)
+
+    @mock.patch('fuelmenu.common.dialog.display_dialog')
+    def test_check_reports_dhcp_servers_from_background(self, m_display):
+        self.m_search_external_dhcp.return_value = [
+            {'server_ip': '192.168.133.5', 'mac': '52:54:00:12:34:56'}]
+        self.m_duplicateIPExists.return_value = True
+        self.parent.probes.report = mock.Mock()
+        writers = set()
+        self.parent.footer.set_text.side_effect = \
+            lambda text: writers.add(threading.current_thread())
+        with self.parent.probes.background():
+            self.assertEqual(self.responses, self.cobbler.check(None))
+        self.parent.probes.wait(self.cobbler.name)
+
+        # The probe thread only passes its findings to the report
+        self.parent.probes.report.assert_called_once_with(
+            self.cobbler.name,
+            ["Foreign DHCP server found on eth0: IP address 192.168.133.5, "
+             "MAC address 52:54:00:12:34:56.",
+             "Duplicate host found with IP 192.168.133.2."])
+        m_display.assert_not_called()
+        self.m_mh_display_failed.assert_not_called()
+        self.assertEqual(set([threading.current_thread()]), writers)
+
+    @mock.patch('fuelmenu.common.dialog.display_dialog')
+    def test_check_shows_dhcp_servers(self, m_display):
+        self.m_search_external_dhcp.return_value = [
+            {'server_ip': '192.168.133.5', 'mac': '52:54:00:12:34:56'}]
+        self.assertEqual(self.responses, self.cobbler.check(None))
+        m_display.assert_called_once_with(
+            self.cobbler, mock.ANY, "DHCP Servers Found on eth0")
+
+    def test_check_responses(self):
+        self.assertEqual([], self.cobbler.check_responses(self.responses))
+        responses = dict(self.responses)
+        responses["ADMIN_NETWORK/dhcp_pool_end"] = "10.20.0.254"
+        self.assertEqual(
+            ["DHCP Pool start and end are not in the same subnet.",
+             "DHCP Pool end does not match management network."],
+            self.cobbler.check_responses(responses))
+        self.m_search_external_dhcp.assert_not_called()
+        self.m_duplicateIPExists.assert_not_called()
+
+    def test_check_quick_save(self):
+        self.parent.probes.quick = True
+        self.assertEqual(self.responses, self.cobbler.check(None))
+        self.m_search_external_dhcp.assert_not_called()
+        self.m_duplicateIPExists.assert_not_called()
+
     def test_check_post_deploy(self):
         self.m_is_post_d.return_value = True
         self.assertEqual(self.cobbler.check(None), self.responses)
@@ -153,7 +227,7 @@ class TestCobblerConfig(base.BaseModuleTests):
         self.m_get_physical_ifaces.assert_called_with()
         self.m_get_net.assert_called_with("eth0", False)
         self.m_duplicateIPExists.assert_not_called()
-        self.m_search_external_dhcp.assert_called_once_with("eth0", 5)
+        self.m_search_external_dhcp.assert_not_called()
         self.m_is_post_d.assert_called_once_with()
 
     def test_check_incorrect_running_dhcp(self):
@@ -168,10 +242,8 @@ class TestCobblerConfig(base.BaseModuleTests):
         self.m_get_default_gateway_linux.assert_called_with()
         self.m_get_physical_ifaces.assert_called_with()
         self.m_get_net.assert_called_with("eth0", False)
-        self.m_duplicateIPExists.assert_called_once_with("192.168.133.2",
-                                                         "eth0",
-                                                         True)
-        self.m_search_external_dhcp.assert_called_once_with("eth0", 5)
+        self.m_duplicateIPExists.assert_not_called()
+        self.m_search_external_dhcp.assert_not_called()
         self.m_is_post_d.assert_called_once_with()
 
     def test_check_incorrect_dhcp_pool_start_ip(self):
@@ -182,10 +254,8 @@ class TestCobblerConfig(base.BaseModuleTests):
         self.m_get_default_gateway_linux.assert_called_with()
         self.m_get_physical_ifaces.assert_called_with()
         self.m_get_net.assert_called_with("eth0", False)
-        self.m_duplicateIPExists.assert_called_once_with("192.168.133.2",
-                                                         "eth0",
-                                                         True)
-        self.m_search_external_dhcp.assert_called_once_with("eth0", 5)
+        self.m_duplicateIPExists.assert_not_called()
+        self.m_search_external_dhcp.assert_not_called()
         self.m_is_post_d.assert_called_once_with()
         self.m_mh_display_failed.assert_called_with(
             self.cobbler,
@@ -204,10 +274,8 @@ class TestCobblerConfig(base.BaseModuleTests):
         self.m_get_default_gateway_linux.assert_called_with()
         self.m_get_physical_ifaces.assert_called_with()
         self.m_get_net.assert_called_with("eth0", False)
-        self.m_duplicateIPExists.assert_called_once_with("192.168.133.2",
-                                                         "eth0",
-                                                         True)
-        self.m_search_external_dhcp.assert_called_once_with("eth0", 5)
+        self.m_duplicateIPExists.assert_not_called()
+        self.m_search_external_dhcp.assert_not_called()
         self.m_is_post_d.assert_called_once_with()
 
     def test_check_incorrect_dhcp_pool_end_ip(self):
@@ -224,10 +292,8 @@ class TestCobblerConfig(base.BaseModuleTests):
         self.m_get_default_gateway_linux.assert_called_with()
         self.m_get_physical_ifaces.assert_called_with()
         self.m_get_net.assert_called_with("eth0", False)
-        self.m_duplicateIPExists.assert_called_once_with("192.168.133.2",
-                                                         "eth0",
-                                                         True)
-        self.m_search_external_dhcp.assert_called_once_with("eth0", 5)
+        self.m_duplicateIPExists.assert_not_called()
+        self.m_search_external_dhcp.assert_not_called()
         self.m_is_post_d.assert_called_once_with()
 
     def test_check_dhcp_gateway_not_in_subnet(self):
@@ -241,10 +307,8 @@ class TestCobblerConfig(base.BaseModuleTests):
         self.m_get_default_gateway_linux.assert_called_with()
         self.m_get_physical_ifaces.assert_called_with()
         self.m_get_net.assert_called_with("eth0", False)
-        self.m_duplicateIPExists.assert_called_once_with("192.168.133.2",
-                                                         "eth0",
-                                                         True)
-        self.m_search_external_dhcp.assert_called_once_with("eth0", 5)
+        self.m_duplicateIPExists.assert_not_called()
+        self.m_search_external_dhcp.assert_not_called()
         self.m_is_post_d.assert_called_once_with()
 
     def test_check_dhcp_pool_start_not_in_netmask(self):
@@ -259,10 +323,8 @@ class TestCobblerConfig(base.BaseModuleTests):
         self.m_get_default_gateway_linux.assert_called_with()
         self.m_get_physical_ifaces.assert_called_with()
         self.m_get_net.assert_called_with("eth0", False)
-        self.m_duplicateIPExists.assert_called_once_with("192.168.133.2",
-                                                         "eth0",
-                                                         True)
-        self.m_search_external_dhcp.assert_called_once_with("eth0", 5)
+        self.m_duplicateIPExists.assert_not_called()
+        self.m_search_external_dhcp.assert_not_called()
         self.m_is_post_d.assert_called_once_with()
 
     def test_check_dhcp_pool_end_not_in_netmask(self):
@@ -281,10 +343,8 @@ class TestCobblerConfig(base.BaseModuleTests):
         self.m_get_default_gateway_linux.assert_called_with()
         self.m_get_physical_ifaces.assert_called_with()
         self.m_get_net.assert_called_with("eth0", False)
-        self.m_duplicateIPExists.assert_called_once_with("192.168.133.2",
-                                                         "eth0",
-                                                         True)
-        self.m_search_external_dhcp.assert_called_once_with("eth0", 5)
+        self.m_duplicateIPExists.assert_not_called()
+        self.m_search_external_dhcp.assert_not_called()
         self.m_is_post_d.assert_called_once_with()
 
     def test_check_duplicate_ip(self):
@@ -321,10 +381,8 @@ class TestCobblerConfig(base.BaseModuleTests):
         self.m_get_default_gateway_linux.assert_called_with()
         self.m_get_physical_ifaces.assert_called_with()
         self.m_get_net.assert_called_with("eth0", False)
-        self.m_duplicateIPExists.assert_called_once_with("192.168.133.2",
-                                                         "eth0",
-                                                         True)
-        self.m_search_external_dhcp.assert_called_once_with("eth0", 5)
+        self.m_duplicateIPExists.assert_not_called()
+        self.m_search_external_dhcp.assert_not_called()
         self.m_is_post_d.assert_called_once_with()
 
     def test_check_incorrect_new_dhcp_start_range(self):
@@ -338,10 +396,8 @@ class TestCobblerConfig(base.BaseModuleTests):
         self.m_get_default_gateway_linux.assert_called_with()
         self.m_get_physical_ifaces.assert_called_with()
         self.m_get_net.assert_called_with("eth0", False)
-        self.m_duplicateIPExists.assert_called_once_with("192.168.133.2",
-                                                         "eth0",
-                                                         True)
-        self.m_search_external_dhcp.assert_called_once_with("eth0", 5)
+        self.m_duplicateIPExists.assert_not_called()
+        self.m_search_external_dhcp.assert_not_called()
         self.m_is_post_d.assert_called_once_with()
 
     def test_check_incorrect_new_dhcp_end_range(self):
@@ -356,15 +412,32 @@ class TestCobblerConfig(base.BaseModuleTests):
         self.m_get_default_gateway_linux.assert_called_with()
         self.m_get_physical_ifaces.assert_called_with()
         self.m_get_net.assert_called_with("eth0", False)
-        self.m_duplicateIPExists.assert_called_once_with("192.168.133.2",
-                                                         "eth0",
-                                                         True)
-        self.m_search_external_dhcp.assert_called_once_with("eth0", 5)
+        self.m_duplicateIPExists.assert_not_called()
+        self.m_search_external_dhcp.assert_not_called()
         self.m_is_post_d.assert_called_once_with()
 
+    def test_default_responses(self):
+        self.assertEqual(self.responses, self.cobbler.default_responses())
+        self.m_search_external_dhcp.assert_not_called()
+        self.m_duplicateIPExists.assert_not_called()
+
+    def test_default_responses_generate_pool(self):
+        self.cobbler.defaults["ADMIN_NETWORK/dhcp_pool_start"]["value"] = \
+            "10.20.0.3"
+        responses = self.cobbler.default_responses()
+
+        self.assertEqual("192.168.133.4",
+                         responses["ADMIN_NETWORK/dhcp_pool_start"])
+        self.assertEqual("192.168.133.254",
+                         responses["ADMIN_NETWORK/dhcp_pool_end"])
+        self.assertEqual("192.168.133.2",
+                         responses["ADMIN_NETWORK/dhcp_gateway"])
+
+    @mock.patch("fuelmenu.modules.cobblerconf.os.path.exists",
+                return_value=True)
     @mock.patch("fuelmenu.modules.cobblerconf.CobblerConfig.save")
     @mock.patch("fuelmenu.modules.cobblerconf.CobblerConfig.check")
-    def test_apply(self, m_check, m_save):
+    def test_apply(self, m_check, m_save, m_p_exists):
         self.m_is_post_d.return_value = True
         m_check.return_value = self.responses
         self.assertTrue(self.cobbler.apply(None))
@@ -372,8 +445,36 @@ class TestCobblerConfig(base.BaseModuleTests):
         m_check.assert_called_once_with(None)
         m_save.assert_called_once_with(self.responses)
         self.m_is_post_d.assert_called_once_with()
-        self.assertIn(self.cobbler.update_dhcp,
-                      self.cobbler.parent.apply_tasks)
+        self.assertEqual(["/etc/puppet/modules/fuel/examples/nailgun.pp"],
+                         self.cobbler.parent.puppet_scheduler.manifests)
+        self.assertEqual(
+            [(self.cobbler.update_nailgun,
+              ("/etc/puppet/modules/fuel/examples/nailgun.pp",)),
+             (self.cobbler.update_dhcp,
+              ("CobblerConfig.update_nailgun",)),
+             (self.cobbler.cobbler_sync,
+              ("CobblerConfig.update_dhcp",))],
+            list(self.cobbler.parent.apply_tasks.tasks.values()))
+
+    @mock.patch("fuelmenu.modules.cobblerconf.os.path.exists",
+                return_value=False)
+    @mock.patch("fuelmenu.modules.cobblerconf.CobblerConfig.save")
+    @mock.patch("fuelmenu.modules.cobblerconf.CobblerConfig.check")
+    def test_apply_merges_dnsmasq_classes(self, m_check, m_save, m_p_exists):
+        self.m_is_post_d.return_value = True
+        m_check.return_value = self.responses
+        self.assertTrue(self.cobbler.apply(None))
+
+        self.assertEqual(
+            self.cobbler._dnsmasq_classes(
+                self.cobbler.parent.settings["ADMIN_NETWORK"]),
+            self.cobbler.parent.puppet_scheduler.classes)
+        self.assertEqual(
+            [(self.cobbler.update_nailgun,
+              ("/etc/puppet/modules/fuel/examples/nailgun.pp",)),
+             (self.cobbler.cobbler_sync,
+              ("CobblerConfig.update_nailgun", puppet.CLASSES_JOB))],
+            list(self.cobbler.parent.apply_tasks.tasks.values()))
 
     @mock.patch("fuelmenu.modules.cobblerconf.CobblerConfig.save")
     @mock.patch("fuelmenu.modules.cobblerconf.CobblerConfig.check",
@@ -385,89 +486,84 @@ class TestCobblerConfig(base.BaseModuleTests):
         m_check.assert_called_once_with(None)
         m_save.assert_not_called()
         self.m_is_post_d.assert_not_called()
+        self.assertFalse(self.cobbler.parent.puppet_scheduler)
 
     @mock.patch(
         "fuelmenu.modules.cobblerconf.CobblerConfig._update_dnsmasq")
-    @mock.patch("fuelmenu.common.utils.execute",
-                return_value=(0, 'Success', 0))
     @mock.patch(
         "fuelmenu.modules.cobblerconf.CobblerConfig._update_hiera_dnsmasq",
         return_value=(True, "Puppet apply successfully executed."))
     @mock.patch("os.path.exists", return_value=True)
-    @mock.patch(
-        "fuelmenu.modules.cobblerconf.CobblerConfig._update_nailgun",
-        return_value=True)
-    def test_update_dhcp_with_hiera(self, m_update_nailgun, m_p_exists,
-                                    m_update_hiera_dnsmasq, m_execute,
+    def test_update_dhcp_with_hiera(self, m_p_exists, m_update_hiera_dnsmasq,
                                     m_update_dnsmasq):
         self.assertTrue(self.cobbler.update_dhcp())
 
-        m_update_nailgun.assert_called_once_with(
-            self.cobbler.parent.settings["ADMIN_NETWORK"])
         m_p_exists.assert_called_once_with("/etc/hiera/networks.yaml")
         m_update_hiera_dnsmasq.assert_called_once_with(
             self.cobbler.parent.settings["ADMIN_NETWORK"])
         m_update_dnsmasq.assert_not_called()
-        m_execute.assert_called_once_with(["cobbler", "sync"])
         self.m_mh_display_failed.assert_not_called()
 
     @mock.patch(
         "fuelmenu.modules.cobblerconf.CobblerConfig._update_hiera_dnsmasq")
-    @mock.patch("fuelmenu.common.utils.execute",
-                return_value=(0, 'Success', 0))
     @mock.patch(
         "fuelmenu.modules.cobblerconf.CobblerConfig._update_dnsmasq",
         return_value=True)
     @mock.patch("os.path.exists", return_value=False)
-    @mock.patch(
-        "fuelmenu.modules.cobblerconf.CobblerConfig._update_nailgun",
-        return_value=True)
-    def test_update_dhcp_dnsmasq(self, m_update_nailgun, m_p_exists,
-                                 m_update_dnsmasq, m_execute,
+    def test_update_dhcp_dnsmasq(self, m_p_exists, m_update_dnsmasq,
                                  m_update_hiera_dnsmasq):
         self.assertTrue(self.cobbler.update_dhcp())
 
-        m_update_nailgun.assert_called_once_with(
-            self.cobbler.parent.settings["ADMIN_NETWORK"])
         m_p_exists.assert_called_once_with("/etc/hiera/networks.yaml")
         m_update_dnsmasq.assert_called_once_with(
             self.cobbler.parent.settings["ADMIN_NETWORK"])
         m_update_hiera_dnsmasq.assert_not_called()
-        m_execute.assert_called_once_with(["cobbler", "sync"])
         self.m_mh_display_failed.assert_not_called()
 
     @mock.patch("fuelmenu.common.modulehelper.ModuleHelper.display_dialog")
-    @mock.patch(
-        "fuelmenu.modules.cobblerconf.CobblerConfig._update_hiera_dnsmasq")
-    @mock.patch("fuelmenu.common.utils.execute",
-                return_value=(1, 'Not Success', 0))
     @mock.patch(
         "fuelmenu.modules.cobblerconf.CobblerConfig._update_dnsmasq",
-        return_value=True)
+        return_value=False)
     @mock.patch("os.path.exists", return_value=False)
-    @mock.patch(
-        "fuelmenu.modules.cobblerconf.CobblerConfig._update_nailgun",
-        return_value=True)
-    def test_update_dhcp_failed(self, m_update_nailgun, m_p_exists,
-                                m_update_dnsmasq, m_execute,
-                                m_update_hiera_dnsmasq, m_display_failed):
+    def test_update_dhcp_failed(self, m_p_exists, m_update_dnsmasq,
+                                m_display_failed):
         self.assertFalse(self.cobbler.update_dhcp())
 
-        m_update_nailgun.assert_called_once_with(
-            self.cobbler.parent.settings["ADMIN_NETWORK"])
-        m_p_exists.assert_called_once_with("/etc/hiera/networks.yaml")
         m_update_dnsmasq.assert_called_once_with(
             self.cobbler.parent.settings["ADMIN_NETWORK"])
-        m_update_hiera_dnsmasq.assert_not_called()
+        m_display_failed.assert_called_once_with(
+            self.cobbler,
+            error_msg=self.cobbler.apply_dialog_message["message"],
+            title=self.cobbler.apply_dialog_message['title'])
+
+    @mock.patch("fuelmenu.common.utils.execute",
+                return_value=(0, 'Success', 0))
+    def test_cobbler_sync(self, m_execute):
+        self.assertTrue(self.cobbler.cobbler_sync())
+        m_execute.assert_called_once_with(["cobbler", "sync"])
+
+    @mock.patch("fuelmenu.common.modulehelper.ModuleHelper.display_dialog")
+    @mock.patch("fuelmenu.common.utils.execute",
+                return_value=(1, 'Not Success', 0))
+    def test_cobbler_sync_failed(self, m_execute, m_display_failed):
+        self.assertFalse(self.cobbler.cobbler_sync())
+
         m_execute.assert_called_once_with(["cobbler", "sync"])
         m_display_failed.assert_called_once_with(
             self.cobbler,
             error_msg=self.cobbler.apply_dialog_message["message"],
             title=self.cobbler.apply_dialog_message['title'])
 
+    @mock.patch(
+        "fuelmenu.modules.cobblerconf.CobblerConfig._update_nailgun",
+        return_value=True)
+    def test_update_nailgun_task(self, m_update_nailgun):
+        self.assertTrue(self.cobbler.update_nailgun())
+        m_update_nailgun.assert_called_once_with(
+            self.cobbler.parent.settings["ADMIN_NETWORK"])
+
     @mock.patch("fuelclient.objects.network_group.NetworkGroup.set")
-    @mock.patch("fuelmenu.common.puppet.puppetApplyManifest",
-                return_value=(True, "Puppet apply successfully executed."))
+    @mock.patch("fuelmenu.common.puppet.puppetApplyManifest")
     def test_update_nailgun(self, m_puppet, m_netgroup):
         data = {
             "gateway": "192.168.133.2",
@@ -477,16 +573,14 @@ class TestCobblerConfig(base.BaseModuleTests):
         }
         self.assertTrue(self.cobbler._update_nailgun(
             self.cobbler.parent.settings["ADMIN_NETWORK"]))
-        m_puppet.assert_called_once_with(
-            "/etc/puppet/modules/fuel/examples/nailgun.pp")
+        # Manifest is applied by puppet scheduler before apply tasks
+        m_puppet.assert_not_called()
         m_netgroup.assert_called_once_with(data)
 
     @mock.patch("fuelmenu.common.modulehelper.ModuleHelper.display_dialog")
     @mock.patch("fuelclient.objects.NetworkGroup.set",
                 side_effect=error.HTTPError(''))
-    @mock.patch("fuelmenu.common.puppet.puppetApplyManifest",
-                return_value=(True, "Puppet apply successfully executed."))
-    def test_update_nailgun_api_failed(self, m_puppet, m_netgroup,
+    def test_update_nailgun_api_failed(self, m_netgroup,
                                        m_mh_display_failed):
         data = {
             "gateway": "192.168.133.5",
@@ -498,34 +592,12 @@ class TestCobblerConfig(base.BaseModuleTests):
             "192.168.133.5"
         self.assertFalse(self.cobbler._update_nailgun(
             self.cobbler.parent.settings["ADMIN_NETWORK"]))
-        m_puppet.assert_called_once_with(
-            "/etc/puppet/modules/fuel/examples/nailgun.pp")
         m_netgroup.assert_called_once_with(data)
         m_mh_display_failed.assert_called_once_with(
             self.cobbler,
             error_msg=self.cobbler.apply_dialog_message["message"],
             title=self.cobbler.apply_dialog_message['title'])
 
-    @mock.patch("fuelmenu.common.modulehelper.ModuleHelper.display_dialog")
-    @mock.patch("fuelclient.objects.NetworkGroup.set",
-                side_effect=error.HTTPError(''))
-    @mock.patch("fuelmenu.modules.cobblerconf.puppet.puppetApplyManifest",
-                return_value=(
-                    False,
-                    "Puppet apply failed. Check logs for more details."
-                ))
-    def test_update_nailgun_puppet_failed(self, m_puppet, m_netgroup,
-                                          m_mh_display_failed):
-        self.assertFalse(self.cobbler._update_nailgun(
-            self.cobbler.parent.settings["ADMIN_NETWORK"]))
-        m_puppet.assert_called_once_with(
-            "/etc/puppet/modules/fuel/examples/nailgun.pp")
-        m_mh_display_failed.assert_called_once_with(
-            self.cobbler,
-            error_msg=self.cobbler.apply_dialog_message["message"],
-            title=self.cobbler.apply_dialog_message['title'])
-        m_netgroup.assert_not_called()
-
     @mock.patch("fuelmenu.common.puppet.puppetApplyManifest",
                 return_value=(True, "Puppet apply successfully executed."))
     @mock.patch("yaml.safe_dump")
@@ -543,7 +615,8 @@ class TestCobblerConfig(base.BaseModuleTests):
         m_yaml_load.assert_called_once_with(mock.ANY)
         m_yaml_dump.assert_called_once_with(mock.ANY, mock.ANY)
         m_puppet.assert_called_once_with(
-            "/etc/puppet/modules/fuel/examples/dhcp-ranges.pp")
+            "/etc/puppet/modules/fuel/examples/dhcp-ranges.pp",
+            progress=self.cobbler.parent.set_footer)
 
     @mock.patch("fuelmenu.common.puppet.puppetApply",
                 return_value=(0, 'Success', 0))
@@ -564,7 +637,8 @@ class TestCobblerConfig(base.BaseModuleTests):
                 self.cobbler.parent.settings["ADMIN_NETWORK"]),
             (0, 'Success', 0)
         )
-        m_puppet.assert_called_once_with(puppetclasses)
+        m_puppet.assert_called_once_with(
+            puppetclasses, progress=self.cobbler.parent.set_footer)
 
     def test_setNetworkDetails(self):
         self.m_get_default_gateway_linux.return_value = "192.168.134.1"
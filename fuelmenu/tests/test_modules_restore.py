@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+#    Copyright 2016 Mirantis, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from fuelmenu.modules import restore
+from fuelmenu import settings
+from fuelmenu.tests import base
+
+
+class TestRestore(base.BaseModuleTests):
+
+    def setUp(self):
+        super(TestRestore, self).setUp()
+        self.parent.settings = settings.Settings({
+            'HOSTNAME': 'fuel',
+            'ADMIN_NETWORK': {'netmask': '255.255.255.0',
+                              'ipaddress': '10.20.0.2'},
+        })
+        self.module = restore.Restore(self.parent)
+        self.responses = {
+            'HOSTNAME': 'fuel',
+            'ADMIN_NETWORK/netmask': '255.255.0.0',
+            'ADMIN_NETWORK/ipaddress': '10.20.0.2',
+            'DNS_DOMAIN': 'example.com',
+        }
+
+    def test_changed_keys(self):
+        self.assertEqual(
+            ['ADMIN_NETWORK/netmask', 'DNS_DOMAIN'],
+            sorted(self.module.changed_keys(self.responses)))
+
+    def test_apply_reloads_changed(self):
+        with mock.patch.object(self.module, 'check',
+                               return_value=self.responses), \
+                mock.patch.object(self.module, 'save') as m_save:
+            self.assertTrue(self.module.apply(None))
+
+        m_save.assert_called_once_with(self.responses)
+        changed = self.parent.reload_modules.call_args[0][0]
+        self.assertEqual(['ADMIN_NETWORK/netmask', 'DNS_DOMAIN'],
+                         sorted(changed))